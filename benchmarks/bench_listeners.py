@@ -0,0 +1,59 @@
+'''
+Compares request latency through GameServer over TCP loopback and a Unix
+domain socket, with both listeners served by one server loop.
+
+Run from the repository root:
+    python -m benchmarks.bench_listeners
+'''
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from common.transport import Transport
+from server import game_server
+from server.game_server import GameServer
+
+
+REQUESTS = 5000
+
+
+def _time_requests(address):
+    '''Returns the round trip time of each help request, in seconds.'''
+    connection = Transport().connect(address)
+    timings = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        connection.send(b'help\n')
+        connection.recv(1024)
+        timings.append(time.perf_counter() - start)
+    connection.close()
+    return timings
+
+
+def main():
+    game_server.print = lambda *args, **kwargs: None  # Keep logging out.
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'game.sock')
+        # Back to back requests are far over the default rate limits.
+        server = GameServer(
+            '127.0.0.1', 0, listeners=f'tcp://127.0.0.1:0, unix://{path}',
+            message_rate=1e9, message_burst=1e9, ip_message_rate=1e9,
+            ip_message_burst=1e9,
+        )
+        tcp_address = server._listeners[0].getsockname()
+        threading.Thread(target=server.server_loop, daemon=True).start()
+
+        for name, address in (('tcp loopback', tcp_address), ('unix', path)):
+            timings = sorted(_time_requests(address))
+            print(
+                f'{name:13} mean {statistics.mean(timings) * 1e6:7.1f} us   '
+                f'p50 {timings[len(timings) // 2] * 1e6:7.1f} us   '
+                f'p99 {timings[int(len(timings) * 0.99)] * 1e6:7.1f} us'
+            )
+        server._shut_down()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+'''
+Measures memory held per idle match and per idle connection.
+
+Run from the repository root:
+    python -m benchmarks.bench_memory
+'''
+import gc
+import queue
+import tracemalloc
+from collections import deque
+
+from server.game_logic import GameBoard
+
+
+COUNT = 10000
+MATCH_TARGET_BYTES = 2048
+
+
+def _bytes_per_object(build, count=COUNT):
+    '''
+    Returns the average bytes allocated per object made by build().
+    '''
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    objects = [build() for _ in range(count)]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    # Take off the list holding the objects.
+    return (after - before) / count - 8
+
+
+def _idle_match():
+    '''A board part way through a game, as held between moves.'''
+    board = GameBoard()
+    for column in (4, 4, 3, 5):
+        board.insert_piece(board.player_pieces[column % 2], column)
+    return board
+
+
+def _idle_connection():
+    '''The per connection state GameServer keeps, one outgoing deque.'''
+    return deque()
+
+
+def main():
+    match_bytes = _bytes_per_object(_idle_match)
+    connection_bytes = _bytes_per_object(_idle_connection)
+    queue_bytes = _bytes_per_object(queue.Queue)
+
+    print(f'Bytes per idle match:      {match_bytes:8.1f}')
+    print(f'Bytes per idle connection: {connection_bytes:8.1f}')
+    print(f'  (with queue.Queue:       {queue_bytes:8.1f})')
+    status = 'OK' if match_bytes < MATCH_TARGET_BYTES else 'OVER'
+    print(f'Match target {MATCH_TARGET_BYTES} bytes: {status}')
+
+
+if __name__ == '__main__':
+    main()
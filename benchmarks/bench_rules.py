@@ -0,0 +1,79 @@
+'''
+Measures every rules engine the same way: moves per second over random
+games played through the RulesEngine interface, and memory held per idle
+match.
+
+Run from the repository root:
+    python -m benchmarks.bench_rules
+'''
+import gc
+import random
+import time
+import tracemalloc
+
+from server.rules import RULES, make_rules
+
+
+GAMES = 2000
+MATCHES = 2000
+
+
+def _play_games(name, games=GAMES, seed=0):
+    '''
+    Plays random games to the end.
+
+    Returns:
+        int: Moves played.
+        float: Seconds taken.
+    '''
+    rng = random.Random(seed)
+    rules = make_rules(name)
+    board = rules.board
+    moves = 0
+    start = time.perf_counter()
+    for _ in range(games):
+        board.reset_game()
+        while not board.is_board_full():
+            piece = board.player_pieces[board.move_count % 2]
+            moves += 1
+            if rules.play(piece, rng.choice(rules.legal_moves()))[0]:
+                break
+    return moves, time.perf_counter() - start
+
+
+def _bytes_per_match(name, count=MATCHES):
+    '''
+    Returns the average bytes allocated per rules engine with a few moves
+    played, as held between moves.
+    '''
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    matches = []
+    for _ in range(count):
+        rules = make_rules(name)
+        for index in range(4):
+            rules.play(
+                rules.board.player_pieces[index % 2], rules.legal_moves()[0]
+            )
+        matches.append(rules)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del matches
+    # Take off the list holding the matches.
+    return (after - before) / count - 8
+
+
+def main():
+    print(f'{"rules":16} {"moves/s":>10} {"games/s":>9} {"bytes/match":>12}')
+    for name in RULES:
+        make_rules(name)  # Build the geometry outside the timings.
+        moves, elapsed = _play_games(name)
+        print(
+            f'{name:16} {moves / elapsed:10.0f} {GAMES / elapsed:9.1f} '
+            f'{_bytes_per_match(name):12.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
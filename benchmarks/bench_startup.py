@@ -0,0 +1,90 @@
+'''
+Measures client and server startup: import time (from -X importtime) and
+the wall time to import and load config, and to run each entry point as
+far as --help, against the old PyYAML path.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup
+'''
+import os
+import subprocess
+import sys
+import time
+
+
+RUNS = 20
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY = (
+    "import runpy, sys; sys.argv = ['{prog}', '--help']; "
+    "runpy.run_path('__main__.py', run_name='__main__')"
+)
+STARTUPS = {
+    'client': (
+        'client', 'import client_utils; client_utils.load_config()'
+    ),
+    'server worker': (
+        'server',
+        'import game_server; import server_utils; server_utils.load_config()'
+    ),
+    # The real entry points, as far as parsing flags: everything the
+    # client and server import at startup.
+    'client entry': ('client', ENTRY.format(prog='client')),
+    'server entry': ('server', ENTRY.format(prog='server')),
+    'PyYAML FullLoader (before)': (
+        'server',
+        "import yaml; yaml.load(open('config.yaml'), yaml.FullLoader)"
+    ),
+}
+
+
+def _run(directory, code, *flags):
+    '''
+    Runs code in a fresh interpreter laid out like `python3 <directory>`.
+
+    Returns:
+        float: Wall time in seconds.
+        str: The interpreters stderr.
+    '''
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, *flags, '-c', code],
+        cwd=os.path.join(ROOT, directory),
+        env=environment,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=True,
+        text=True,
+    )
+    return time.perf_counter() - start, result.stderr
+
+
+def _import_microseconds(importtime_output):
+    '''
+    Sums the cumulative time of top level imports in -X importtime output.
+    '''
+    total = 0
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if not name.startswith('  '):  # Nested imports are already counted.
+            total += int(cumulative)
+    return total
+
+
+def main():
+    _, baseline = _run('server', 'pass', '-X', 'importtime')
+    baseline = _import_microseconds(baseline)
+    for name, (directory, code) in STARTUPS.items():
+        _, importtime_output = _run(directory, code, '-X', 'importtime')
+        imports = _import_microseconds(importtime_output) - baseline
+        wall = min(_run(directory, code)[0] for _ in range(RUNS))
+        print(
+            f'{name:28} imports {imports / 1000:7.2f} ms   '
+            f'best wall {wall * 1000:7.2f} ms'
+        )
+
+
+if __name__ == '__main__':
+    main()
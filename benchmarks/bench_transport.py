@@ -0,0 +1,124 @@
+'''
+Measures handshake cost and per-message round trip for each transport
+mode over localhost, using the self-signed test certificate.
+
+Run from the repository root:
+    python -m benchmarks.bench_transport
+'''
+import os
+import threading
+import time
+
+from common.transport import (
+    TLSTransport, Transport, compress_message
+)
+from server.game_logic import GameBoard
+
+
+CONNECTIONS = 200
+MESSAGES = 2000
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'common', 'tests', 'data'
+)
+CERTFILE = os.path.join(DATA_DIR, 'localhost.pem')
+KEYFILE = os.path.join(DATA_DIR, 'localhost.key')
+MESSAGE = f'Board:\n{GameBoard().game_board}\nYour turn!'.encode()
+
+
+def _modes():
+    '''Pairs of (server transport, client transport factory) by name.'''
+    def tls_client(compression):
+        return lambda: TLSTransport(
+            cafile=CERTFILE, server_hostname='localhost',
+            compression=compression,
+        )
+    return {
+        'tcp': (Transport(), Transport),
+        'tcp+zlib': (
+            Transport(compression=True), lambda: Transport(compression=True)
+        ),
+        'tls': (TLSTransport(CERTFILE, KEYFILE), tls_client(False)),
+        'tls+zlib': (
+            TLSTransport(CERTFILE, KEYFILE, compression=True),
+            tls_client(True),
+        ),
+    }
+
+
+def _echo_server(server_transport, listener, stop):
+    '''Echoes every message on every connection until stop is set.'''
+    listener.settimeout(0.2)
+    while not stop.is_set():
+        try:
+            connection, _ = server_transport.accept(listener)
+        except (TimeoutError, BlockingIOError):
+            continue
+        connection.setblocking(1)
+        try:
+            server_transport.handshake(connection)
+            while True:
+                data = connection.recv(65536)
+                if not data:
+                    break
+                connection.send(data)
+        except OSError:
+            pass
+        connection.close()
+
+
+def _time_handshakes(address, make_client, resume):
+    '''Average seconds to connect and exchange a first message.'''
+    client_transport = make_client()
+    start = time.perf_counter()
+    for _ in range(CONNECTIONS):
+        if not resume:
+            client_transport = make_client()
+        connection = client_transport.connect(address)
+        connection.send(b'hello')
+        connection.recv(65536)
+        client_transport.close(connection)
+    return (time.perf_counter() - start) / CONNECTIONS
+
+
+def _time_messages(address, make_client):
+    '''Average seconds per message round trip on one connection.'''
+    client_transport = make_client()
+    connection = client_transport.connect(address)
+    start = time.perf_counter()
+    for _ in range(MESSAGES):
+        connection.send(MESSAGE)
+        connection.recv(65536)
+    elapsed = time.perf_counter() - start
+    client_transport.close(connection)
+    return elapsed / MESSAGES
+
+
+def main():
+    print(f'Board message: {len(MESSAGE)} bytes, '
+          f'{len(compress_message(MESSAGE))} bytes compressed')
+    print(f'{"mode":10} {"handshake":>12} {"resumed":>12} {"message":>12}')
+    for name, (server_transport, make_client) in _modes().items():
+        listener = server_transport.listen(('127.0.0.1', 0), backlog=64)
+        address = listener.getsockname()
+        stop = threading.Event()
+        server_thread = threading.Thread(
+            target=_echo_server, args=(server_transport, listener, stop)
+        )
+        server_thread.start()
+
+        fresh = _time_handshakes(address, make_client, resume=False)
+        resumed = _time_handshakes(address, make_client, resume=True)
+        message = _time_messages(address, make_client)
+
+        stop.set()
+        server_thread.join()
+        listener.close()
+        print(
+            f'{name:10} {fresh * 1e6:9.1f} us {resumed * 1e6:9.1f} us '
+            f'{message * 1e6:9.1f} us'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,75 @@
-import socket
+import argparse
 
 import client_utils
+from common.config import add_config_arguments
+from common.protocol import RequestPipeline
+from common.transport import create_transport
 
 
 if __name__ == "__main__":
-    config = client_utils.load_config()
-    server_address = (config['host'], config['port'])
+    parser = argparse.ArgumentParser(prog='client')
+    parser.add_argument(
+        '--interactive', action='store_true',
+        help='Show server messages as they arrive, with a live board.'
+    )
+    parser.add_argument(
+        '--resume', metavar='TOKEN',
+        help='Rejoin a game after losing connection, using the resume token.'
+    )
+    parser.add_argument(
+        '--room', metavar='NAME',
+        help='Join a named room, following redirects to the server that '
+        'hosts it.'
+    )
+    parser.add_argument(
+        '--pipeline', action='store_true',
+        help='Use the framed protocol: send several commands at once, '
+        'separated by semicolons, e.g. "board; turn; 4".'
+    )
+    add_config_arguments(parser, client_utils.DEFAULTS)
+    args = parser.parse_args()
+
+    config = client_utils.load_config(vars(args))
+    server_address = client_utils.server_address(config)
     stay_connected = True
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    transport = create_transport(config)
 
     # Connect to server.
-    print(f'connecting to {server_address[0]} port {server_address[1]}')
+    print(f'connecting to {server_address}')
     try:
-        sock.connect(server_address)
+        sock = transport.connect(server_address)
     except ConnectionRefusedError:
         print(
             'Connection refused. '
             'Please make sure the server is live before running the client.'
         )
     else:
-        player_name = input('Enter your name:\t')
-        stay_connected = client_utils.send_name(sock, player_name)
+        for _ in range(client_utils.MAX_REDIRECTS if args.room else 0):
+            redirect = client_utils.join_room(sock, args.room)
+            if redirect is None:
+                break
+            print(f'room {args.room} is on {redirect}, reconnecting')
+            transport.close(sock)
+            sock = transport.connect(redirect)
+
+        pipeline = RequestPipeline(sock) if args.pipeline else None
+        if args.resume:
+            player_name = client_utils.resume_session(sock, args.resume)
+            stay_connected = player_name is not None
+        elif pipeline is not None:
+            player_name = input('Enter your name:\t')
+            stay_connected = client_utils.send_name_pipelined(
+                pipeline, player_name
+            )
+        else:
+            player_name = input('Enter your name:\t')
+            stay_connected = client_utils.send_name(sock, player_name)
 
-        if stay_connected:
+        if stay_connected and pipeline is not None:
+            client_utils.pipelined_loop(pipeline, player_name)
+        elif stay_connected and args.interactive:
+            client_utils.interactive_loop(sock, player_name)
+        elif stay_connected:
             client_utils.client_loop(sock, stay_connected, player_name)
 
-        sock.close()
+        transport.close(sock)
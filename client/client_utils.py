@@ -1,20 +1,76 @@
-import yaml
+import os
+import re
+import sys
 
+from common.config import load_config as load_layered_config
 
-CONFIG_PATH = './client/config.yaml'
 
+CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'config.yaml'
+)
+DEFAULTS = {
+    'host': '127.0.0.1',
+    'port': 8080,
+    'transport': 'tcp',
+    'compression': False,
+    'cafile': None,
+    'server_hostname': None,
+}
+DISCONNECT_RESPONSES = (
+    'Disconnecting...',
+    'Server is full.',
+    'Took too long to respond. Shutting down.',
+    'Server busy, retry later.',
+)
+MAX_REDIRECTS = 3
+CLEAR_SCREEN = '\033[2J\033[H'
+PROMPT = 'Enter command or number to drop piece:\t'
+# Lines of a drawn board: bracketed spaces for drop games, or the column
+# letters and numbered rows of a placement board such as gomoku.
+BOARD_LINE = re.compile(r'\[.*|\s+[a-z]( [a-z])+|\s*\d+( [.a-z])+')
 
-def load_config():
+
+def load_config(overrides=None):
+    '''
+    Loads config from DEFAULTS, then CONFIG_PATH, then FIAR_* environment
+    variables, then CLI flags.
+
+    Args:
+        overrides (dict): Values from CLI flags.
+
+    Returns:
+        dict(): Loaded config.
     '''
-    Loads config from CONFIG_PATH constant
+    return load_layered_config(DEFAULTS, CONFIG_PATH, overrides)
+
+
+def server_address(config):
+    '''
+    Returns the address to connect to from config. A host such as
+    unix:///tmp/game.sock connects to a Unix domain socket.
+
+    Args:
+        config (dict): Loaded config.
 
     Returns:
-        dict(): Loaded yaml.
+        tuple or str: (host, port), or a Unix socket path.
+    '''
+    host = config['host']
+    if host.startswith('unix://'):
+        return host[len('unix://'):]
+    return (host, config['port'])
+
+
+def send_command(sock, command):
     '''
-    with open(CONFIG_PATH) as config_file:
-        config = yaml.load(config_file, yaml.FullLoader)
+    Sends one command to the server. Commands end with a newline, so the
+    server can tell them apart however they are split or joined in transit.
 
-    return config
+    Args:
+        sock (socket.socket): Connection to the server.
+        command (str): Command, e.g. Name,board.
+    '''
+    sock.send(f'{command}\n'.encode())
 
 
 def send_name(sock, player_name):
@@ -28,18 +84,65 @@ def send_name(sock, player_name):
     Returns:
         bool: Whether to stay connected to the server or not.
     '''
-    outgoing_message = player_name.encode()
+    send_command(sock, player_name)
+
+    # Server replies start with a newline, so it is stripped before
+    # matching.
+    response = sock.recv(1024).decode().strip()
 
-    sock.send(outgoing_message)
+    print(response)
+    return not is_disconnect_response(response)
 
-    response = sock.recv(1024)
-    response = response.decode()
 
-    if response == 'Disconnecting...' or response == 'Server is full.':
-        return False
+def join_room(sock, room):
+    '''
+    Asks the server for a room, and returns where to reconnect if another
+    server hosts it.
+
+    Args:
+        sock (socket.socket): Connection to the server.
+        room (str): Room name.
 
+    Returns:
+        tuple(str, int): Address of the server hosting the room, or None if
+            it is this one.
+    '''
+    send_command(sock, f'room {room}')
+
+    # Server replies start with a newline, so it is stripped before
+    # matching.
+    response = sock.recv(1024).decode().strip()
+    redirect = 'Redirect '
+    if not response.startswith(redirect):
+        print(response)
+        return None
+    host, _, port = response[len(redirect):].rpartition(':')
+    return host.strip('[]'), int(port)
+
+
+def resume_session(sock, token):
+    '''
+    Asks the server to resume a dropped session, and returns the players
+    name if it did.
+
+    Args:
+        sock (socket.socket): Connection to the server.
+        token (str): Resume token the server gave when first joining.
+
+    Returns:
+        str: The players name, or None if the session could not be resumed.
+    '''
+    send_command(sock, f'resume {token}')
+
+    # Server replies start with a newline, so it is stripped before
+    # matching.
+    response = sock.recv(1024).decode().strip()
     print(response)
-    return True
+
+    welcome = 'Welcome back '
+    if not response.startswith(welcome):
+        return None
+    return response[len(welcome):].split('\n')[0].rstrip('!')
 
 
 def client_loop(sock, stay_connected, player_name):
@@ -54,17 +157,175 @@ def client_loop(sock, stay_connected, player_name):
     '''
     while stay_connected:
         user_input = input('Enter command or number to drop piece:\t')
-        command = f'{player_name},{user_input}'
-        outgoing_message = command.encode()
-        sock.send(outgoing_message)
+        send_command(sock, f'{player_name},{user_input}')
 
         response = sock.recv(1024)
         response = response.decode()
         print(response)
         if (
-            'Disconnecting...' in response or
-            'Server is full.' in response or
-            'Took too long to respond. Shutting down.' in response or
+            is_disconnect_response(response) or
             'disconnect' in user_input
         ):
             stay_connected = False
+
+
+def send_name_pipelined(pipeline, player_name):
+    '''
+    Like send_name, but over the framed protocol, which the connection
+    then keeps using.
+
+    Args:
+        pipeline (common.protocol.RequestPipeline): Connection to the server.
+        player_name (str): The players name.
+
+    Returns:
+        bool: Whether to stay connected to the server or not.
+    '''
+    response, = pipeline.call(player_name)
+    if response is None or is_disconnect_response(response):
+        return False
+
+    print(response)
+    return True
+
+
+def pipelined_loop(pipeline, player_name):
+    '''
+    Client loop over the framed protocol. Several commands separated by
+    semicolons, e.g. board; turn; 4, are sent in one write, and their
+    replies printed in order once all have arrived. Messages the server
+    pushed meanwhile are printed first.
+
+    Args:
+        pipeline (common.protocol.RequestPipeline): Connection to the server.
+        player_name (str): The players name. Sent with every command.
+    '''
+    stay_connected = True
+    while stay_connected:
+        user_input = input(PROMPT)
+        commands = [
+            command.strip() for command in user_input.split(';')
+            if command.strip()
+        ]
+        if not commands:
+            continue
+        responses = pipeline.wait(pipeline.send(
+            f'{player_name},{command}' for command in commands
+        ))
+        for push in pipeline.pushes:
+            print(push)
+        pipeline.pushes.clear()
+        for command, response in zip(commands, responses):
+            if response is None:
+                print('Server closed the connection.')
+                return
+            print(response)
+            if is_disconnect_response(response) or command == 'disconnect':
+                stay_connected = False
+
+
+def is_disconnect_response(response):
+    '''
+    Checks if a server response means the connection is closing.
+
+    Args:
+        response (str): Decoded response from the server.
+
+    Returns:
+        bool: True if the client should disconnect, False if not.
+    '''
+    return any(message in response for message in DISCONNECT_RESPONSES)
+
+
+def extract_board(response):
+    '''
+    Pulls the rendered game board out of a server response, if it has one.
+
+    Args:
+        response (str): Decoded response from the server.
+
+    Returns:
+        str: The board rows, or None if the response has no board.
+    '''
+    rows = [
+        line for line in response.split('\n')
+        if BOARD_LINE.fullmatch(line.rstrip())
+    ]
+    if not rows:
+        return None
+    return '\n'.join(rows)
+
+
+def render_screen(board, messages):
+    '''
+    Builds the full screen for interactive mode.
+
+    Args:
+        board (str): Last board received from the server.
+        messages (iterable(str)): Recent messages, oldest first.
+
+    Returns:
+        str: Text to write to the terminal, including the prompt.
+    '''
+    board = board or 'Game has not started.'
+    log = '\n'.join(messages)
+    return f'{CLEAR_SCREEN}{board}\n\n{log}\n\n{PROMPT}'
+
+
+def interactive_loop(sock, player_name, stdin=None, stdout=None):
+    '''
+    Non-blocking client loop. Waits on stdin and the server socket at the
+    same time, so messages pushed by the server (e.g. "Your turn!") are
+    shown as soon as they arrive, rather than after the next command.
+
+    Args:
+        sock (socket.socket): Connection to the server.
+        player_name (str): The players name. Sent with every command.
+        stdin (file): Where to read commands from. Defaults to sys.stdin.
+        stdout (file): Where to draw the screen. Defaults to sys.stdout.
+    '''
+    # Only interactive mode needs these, so they stay off the startup path.
+    import selectors
+    from collections import deque
+
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    board = None
+    messages = deque(maxlen=10)
+
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ, 'server')
+    selector.register(stdin, selectors.EVENT_READ, 'stdin')
+
+    stay_connected = True
+    stdout.write(render_screen(board, messages))
+    stdout.flush()
+    try:
+        while stay_connected:
+            for key, _ in selector.select():
+                if key.data == 'server':
+                    response = sock.recv(1024).decode()
+                    if not response:
+                        messages.append('Server closed the connection.')
+                        stay_connected = False
+                        break
+                    board = extract_board(response) or board
+                    messages.extend(
+                        line for line in response.strip().split('\n')
+                        if line and not line.startswith('[')
+                    )
+                    stay_connected = not is_disconnect_response(response)
+                else:
+                    user_input = stdin.readline()
+                    if not user_input:  # EOF, leave cleanly.
+                        selector.unregister(stdin)
+                        user_input = 'disconnect'
+                    user_input = user_input.strip()
+                    if not user_input:
+                        continue
+                    send_command(sock, f'{player_name},{user_input}')
+            stdout.write(render_screen(board, messages))
+            stdout.flush()
+    finally:
+        selector.close()
+    stdout.write('\n')
@@ -1,19 +1,53 @@
+import io
+import os
 import socket
+import threading
 from unittest.mock import patch
 
 from client import client_utils
+from common import protocol
 
 
-@patch('yaml.load', return_value={'host': '0.0.0.0', 'port': 0})
-def test_load_config(_):
+def test_load_config(tmp_path):
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text('host: 0.0.0.0\nport: 0\n')
     expected_value = {'host': '0.0.0.0', 'port': 0}
-    actual_value = client_utils.load_config()
 
-    assert expected_value == actual_value
+    with patch.object(client_utils, 'CONFIG_PATH', str(config_path)):
+        actual_value = client_utils.load_config()
+
+    assert expected_value.items() <= actual_value.items()
+
+
+def test_load_config_flag_overrides_file(tmp_path):
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text('host: 0.0.0.0\nport: 0\n')
+
+    with patch.object(client_utils, 'CONFIG_PATH', str(config_path)):
+        config = client_utils.load_config({'port': '9000', 'host': None})
+
+    assert config['host'] == '0.0.0.0'
+    assert config['port'] == 9000
+
+
+def test_server_address():
+    config = {'host': '127.0.0.1', 'port': 8080}
+
+    assert client_utils.server_address(config) == ('127.0.0.1', 8080)
+
+
+def test_server_address_unix_socket():
+    config = {'host': 'unix:///tmp/game.sock', 'port': 8080}
+
+    assert client_utils.server_address(config) == '/tmp/game.sock'
 
 
 @patch('socket.socket.send')
-@patch('socket.socket.recv', return_value=b'Name')
+@patch(
+    'socket.socket.recv',
+    return_value=b'\nWelcome Name! There are 1 clients connected. Waiting on '
+    b'another player.\nResume token: abc',
+)
 def test_send_name(patched_recv, patched_send):
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
@@ -23,7 +57,7 @@ def test_send_name(patched_recv, patched_send):
 
 
 @patch('socket.socket.send')
-@patch('socket.socket.recv', return_value=b'Disconnecting...')
+@patch('socket.socket.recv', return_value=b'\nDisconnecting...')
 def test_send_name_disconnect(patched_recv, patched_send):
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
@@ -33,7 +67,7 @@ def test_send_name_disconnect(patched_recv, patched_send):
 
 
 @patch('socket.socket.send')
-@patch('socket.socket.recv', return_value=b'Server is full.')
+@patch('socket.socket.recv', return_value=b'\nServer is full.')
 def test_send_name_server_full(patched_recv, patched_send):
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
@@ -42,6 +76,62 @@ def test_send_name_server_full(patched_recv, patched_send):
     patched_recv.assert_called_once()
 
 
+@patch('socket.socket.send')
+@patch('socket.socket.recv', return_value=b'\nServer busy, retry later.')
+def test_send_name_server_busy(patched_recv, patched_send, capsys):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+    assert client_utils.send_name(sock, 'Name') is False
+    assert 'retry later' in capsys.readouterr().out
+
+
+@patch('socket.socket.send')
+@patch('socket.socket.recv', return_value=b'\nRedirect 127.0.0.1:9090')
+def test_join_room_redirect(patched_recv, patched_send):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+    assert client_utils.join_room(sock, 'lobby') == ('127.0.0.1', 9090)
+    patched_send.assert_called_once_with(b'room lobby\n')
+
+
+@patch('socket.socket.send')
+@patch('socket.socket.recv', return_value=b'\nRedirect [::1]:9090')
+def test_join_room_redirect_ipv6(patched_recv, patched_send):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+    assert client_utils.join_room(sock, 'lobby') == ('::1', 9090)
+
+
+@patch('socket.socket.send')
+@patch('socket.socket.recv', return_value=b'\nRoom lobby is here.')
+def test_join_room_here(patched_recv, patched_send):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+    assert client_utils.join_room(sock, 'lobby') is None
+
+
+@patch('socket.socket.send')
+@patch(
+    'socket.socket.recv',
+    return_value=b'\nWelcome back Name!\nBoard:\n\nIt is Names turn.',
+)
+def test_resume_session(patched_recv, patched_send):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+    assert client_utils.resume_session(sock, 'abc') == 'Name'
+    patched_send.assert_called_once_with(b'resume abc\n')
+
+
+@patch('socket.socket.send')
+@patch(
+    'socket.socket.recv', return_value=b'\nUnknown or expired session.'
+)
+def test_resume_session_unknown_token(patched_recv, patched_send):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+    assert client_utils.resume_session(sock, 'abc') is None
+
+
 @patch('builtins.input', return_value='disconnect')
 @patch('socket.socket.send')
 @patch('socket.socket.recv', return_value=b'Disconnecting...')
@@ -66,3 +156,88 @@ def test_client_loop_server_full(patched_recv, patched_send, patched_input):
     client_utils.client_loop(sock, stay_connected, player_name)
 
     assert True
+
+
+def test_extract_board():
+    response = '[ x ] [   ] \n[ o ] [   ] \n\nYour turn!'
+
+    assert client_utils.extract_board(response) == (
+        '[ x ] [   ] \n[ o ] [   ] '
+    )
+
+
+def test_extract_board_placement():
+    response = (
+        'Piece landed in row 0 column 1\nBoard:\n'
+        '   a b c\n 1 . x .\n 2 o . .\n10 . . .\n'
+    )
+
+    assert client_utils.extract_board(response) == (
+        '   a b c\n 1 . x .\n 2 o . .\n10 . . .'
+    )
+
+
+def test_extract_board_no_board():
+    assert client_utils.extract_board('Please wait for your turn.') is None
+
+
+def test_interactive_loop_shows_push_without_input():
+    sock, server_sock = socket.socketpair()
+    stdin_read, stdin_write = os.pipe()
+    stdout = io.StringIO()
+    server_sock.send(b'[ x ] [   ] \nYour turn!\nDisconnecting...')
+
+    with os.fdopen(stdin_read) as stdin:
+        client_utils.interactive_loop(sock, 'Name', stdin, stdout)
+
+    os.close(stdin_write)
+    sock.close()
+    server_sock.close()
+    assert 'Your turn!' in stdout.getvalue()
+    assert '[ x ] [   ] ' in stdout.getvalue()
+
+
+def test_interactive_loop_sends_commands():
+    sock, server_sock = socket.socketpair()
+    stdin_read, stdin_write = os.pipe()
+    stdout = io.StringIO()
+    os.write(stdin_write, b'board\n')
+    os.close(stdin_write)
+    received = []
+
+    def serve():
+        while not b''.join(received).endswith(b'disconnect\n'):
+            received.append(server_sock.recv(1024))
+        server_sock.send(b'Disconnecting...')
+
+    server_thread = threading.Thread(target=serve)
+    server_thread.start()
+    with os.fdopen(stdin_read) as stdin:
+        client_utils.interactive_loop(sock, 'Name', stdin, stdout)
+    server_thread.join()
+
+    sock.close()
+    server_sock.close()
+    assert b''.join(received) == b'Name,board\nName,disconnect\n'
+
+
+@patch('builtins.input', return_value='board; disconnect')
+def test_pipelined_loop_sends_commands_in_one_write(patched_input, capsys):
+    client, server = socket.socketpair()
+    server.send((
+        protocol.encode_push('Your turn!') +
+        protocol.encode_reply(2, 'Disconnecting...') +
+        protocol.encode_reply(1, 'Board:\n')
+    ).encode())
+
+    client_utils.pipelined_loop(protocol.RequestPipeline(client), 'Name')
+
+    sent = server.recv(4096).splitlines()
+    assert [protocol.decode_request(line) for line in sent] == [
+        (1, 'Name,board'), (2, 'Name,disconnect'),
+    ]
+    assert capsys.readouterr().out == (
+        'Your turn!\nBoard:\n\nDisconnecting...\n'
+    )
+    client.close()
+    server.close()
@@ -0,0 +1,191 @@
+import os
+
+
+ENV_PREFIX = 'FIAR_'
+CONFIG_ENV_VAR = f'{ENV_PREFIX}CONFIG'
+TRUE_STRINGS = ('true', 'yes', 'on', '1')
+FALSE_STRINGS = ('false', 'no', 'off', '0')
+NULL_STRINGS = ('null', '~', '')
+YAML_ONLY_STARTS = ('[', '{', '|', '>', '&', '*', '!', '-')
+
+
+class NotFlatConfigError(ValueError):
+    '''
+    Raised if a config file uses more than flat "key: value" lines.
+    '''
+    pass
+
+
+def parse_scalar(value):
+    '''
+    Converts a config string to an int, float, bool, None or str.
+
+    Args:
+        value (str): Value as written in a file or environment variable.
+
+    Returns:
+        The converted value.
+    '''
+    value = value.strip()
+    if value[:1] in ('"', "'") and value[-1:] == value[:1]:
+        return value[1:-1]
+    lowered = value.lower()
+    if lowered in NULL_STRINGS:
+        return None
+    if lowered in ('true', 'yes', 'on'):
+        return True
+    if lowered in ('false', 'no', 'off'):
+        return False
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+def coerce(value, default):
+    '''
+    Converts a string override to the type of the settings default. A
+    setting with an int default also takes a fraction.
+
+    Args:
+        value (str): Value from an environment variable or CLI flag.
+        default: The settings default value.
+
+    Returns:
+        The converted value.
+    '''
+    if not isinstance(value, str):
+        return value
+    if isinstance(default, bool):
+        lowered = value.strip().lower()
+        if lowered in TRUE_STRINGS:
+            return True
+        if lowered in FALSE_STRINGS:
+            return False
+        raise ValueError(f'Expected true or false, got {value!r}')
+    if isinstance(default, (int, float)):
+        try:
+            return type(default)(value)
+        except ValueError:
+            # An int default still takes a fraction, e.g. --turn-time 0.5.
+            number = float(value)
+            return int(number) if number.is_integer() else number
+    return parse_scalar(value)
+
+
+def parse_flat_config(text):
+    '''
+    Parses a config file of flat "key: value" lines without PyYAML.
+
+    Args:
+        text (str): Contents of the config file.
+
+    Returns:
+        dict: Parsed settings.
+
+    Raises:
+        NotFlatConfigError: If the file needs a full YAML parser.
+    '''
+    config = {}
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#') or stripped == '---':
+            continue
+        key, separator, value = stripped.partition(':')
+        value = value.split(' #')[0].strip()
+        if (
+            line[0].isspace() or
+            not separator or
+            not value or
+            value.startswith(YAML_ONLY_STARTS)
+        ):
+            raise NotFlatConfigError(line)
+        config[key.strip()] = parse_scalar(value)
+    return config
+
+
+def parse_yaml_config(text):
+    '''
+    Parses a config file with PyYAML, using the C loader if it is built.
+
+    Args:
+        text (str): Contents of the config file.
+
+    Returns:
+        dict: Parsed settings.
+    '''
+    import yaml  # Only paid for by configs that need it.
+
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    return yaml.load(text, loader) or {}
+
+
+def read_config_file(path):
+    '''
+    Reads a config file, if it exists.
+
+    Args:
+        path (str): Path to the config file.
+
+    Returns:
+        dict: Settings in the file. Empty if there is no file.
+    '''
+    try:
+        with open(path) as config_file:
+            text = config_file.read()
+    except FileNotFoundError:
+        return {}
+
+    try:
+        return parse_flat_config(text)
+    except NotFlatConfigError:
+        return parse_yaml_config(text)
+
+
+def add_config_arguments(parser, defaults):
+    '''
+    Adds --config and a flag for every setting to an argparse parser.
+
+    Args:
+        parser (argparse.ArgumentParser): Parser to add flags to.
+        defaults (dict): Default settings. Keys become flags, e.g.
+            reconnect_grace becomes --reconnect-grace.
+    '''
+    parser.add_argument('--config', help='Path to a config file.')
+    for key in defaults:
+        flag = f'--{key.replace("_", "-")}'
+        parser.add_argument(flag, dest=key, metavar=key.upper())
+
+
+def load_config(defaults, path, overrides=None, environ=None):
+    '''
+    Builds the config from layers, each overriding the last: defaults, the
+    config file, FIAR_* environment variables, then CLI flags.
+
+    Args:
+        defaults (dict): Default settings. Only these keys are read from
+            the environment and flags.
+        path (str): Config file to use if FIAR_CONFIG is not set.
+        overrides (dict): Values from CLI flags. None values are skipped.
+        environ (dict): Environment variables. Defaults to os.environ.
+
+    Returns:
+        dict: The settings.
+    '''
+    environ = os.environ if environ is None else environ
+    overrides = overrides or {}
+
+    config = dict(defaults)
+    path = overrides.get('config') or environ.get(CONFIG_ENV_VAR) or path
+    config.update(read_config_file(path))
+
+    for key, default in defaults.items():
+        env_value = environ.get(f'{ENV_PREFIX}{key.upper()}')
+        if env_value is not None:
+            config[key] = coerce(env_value, default)
+        if overrides.get(key) is not None:
+            config[key] = coerce(overrides[key], default)
+
+    return config
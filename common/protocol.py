@@ -0,0 +1,242 @@
+'''
+Client to server messages are lines. In the plain protocol each line is a
+command, e.g. Ann,board. The framed protocol lets clients pipeline
+commands; every frame is one line of JSON:
+
+    {"id": 1, "command": "Ann,board"}    request, client to server
+    {"id": 1, "reply": "..."}            reply to request 1
+    {"id": 1, "error": "..."}            request 1 failed
+    {"push": "Your turn!"}               message nobody asked for
+
+A client may write several requests at once, and match replies to them by
+id, while pushes arrive on their own channel. A connection switches to this
+protocol with its first frame; clients that never send one get plain text.
+'''
+import itertools
+import json
+
+
+class LineBuffer:
+    '''
+    Collects received bytes, and splits off complete lines. A line longer
+    than max_line is dropped whole, up to its newline, so its tail is never
+    read as lines of its own, and at most max_line bytes are held.
+    '''
+    __slots__ = ('_buffer', '_max_line', '_discarding')
+
+    def __init__(self, max_line=65536):
+        '''
+        Args:
+            max_line (int): Longest line accepted, in bytes.
+        '''
+        self._buffer = bytearray()
+        self._max_line = max_line
+        self._discarding = False
+
+    def feed(self, data):
+        '''
+        Adds received bytes.
+
+        Args:
+            data (bytes): Bytes read from the connection.
+
+        Returns:
+            list(bytes): Complete lines, without their newlines. Each line
+                longer than max_line is None instead, once, when it is
+                found to be too long.
+        '''
+        lines = []
+        if self._discarding:
+            newline = data.find(b'\n')
+            if newline == -1:
+                return lines
+            self._discarding = False
+            data = data[newline + 1:]
+        self._buffer += data
+        *complete, rest = self._buffer.split(b'\n')
+        for line in complete:
+            if len(line) > self._max_line:
+                lines.append(None)
+            elif line.strip():
+                lines.append(bytes(line))
+        if len(rest) > self._max_line:
+            lines.append(None)
+            rest = bytearray()
+            self._discarding = True
+        self._buffer = rest
+        return lines
+
+
+def is_framed(data):
+    '''
+    Returns True if data starts with a frame rather than plain text.
+
+    Args:
+        data (bytes): First bytes of a message.
+    '''
+    return data[:1] == b'{'
+
+
+def encode_request(request_id, command):
+    '''
+    Args:
+        request_id (int): Id the reply will carry.
+        command (str): Command, as in the plain protocol.
+
+    Returns:
+        bytes: Request frame.
+    '''
+    return json.dumps({'id': request_id, 'command': command}).encode() + b'\n'
+
+
+def decode_request(line):
+    '''
+    Args:
+        line (bytes): Request frame, without its newline.
+
+    Returns:
+        tuple(int, str): Request id and command.
+
+    Raises:
+        ValueError: If the line is not a request frame.
+    '''
+    try:
+        request = json.loads(line)
+        request_id, command = request['id'], request['command']
+    except (ValueError, TypeError, KeyError) as err:
+        raise ValueError(f'Invalid request frame: {err}') from None
+    if not isinstance(command, str):
+        raise ValueError('Invalid request frame: command is not a string')
+    return request_id, command
+
+
+def encode_reply(request_id, message):
+    '''
+    Args:
+        request_id (int): Id of the request replied to.
+        message (str): Reply, as in the plain protocol.
+
+    Returns:
+        str: Reply frame, with its newline.
+    '''
+    return json.dumps({'id': request_id, 'reply': message}) + '\n'
+
+
+def encode_error(request_id, message):
+    '''
+    Args:
+        request_id (int): Id of the request that failed.
+        message (str): What went wrong.
+
+    Returns:
+        str: Error frame, with its newline.
+    '''
+    return json.dumps({'id': request_id, 'error': message}) + '\n'
+
+
+def encode_push(message):
+    '''
+    Args:
+        message (str): Message nobody asked for, e.g. "Your turn!".
+
+    Returns:
+        str: Push frame, with its newline.
+    '''
+    return json.dumps({'push': message}) + '\n'
+
+
+class RequestPipeline:
+    '''
+    Client end of the framed protocol. Sends any number of commands in one
+    write, then collects their replies by id in whatever order they come,
+    setting pushes aside.
+
+    Attrs:
+    pushes: list(str)
+        Pushed messages received and not yet taken by the caller.
+    '''
+    def __init__(self, sock, recv_size=4096):
+        '''
+        Args:
+            sock (socket.socket): Connection to the server.
+            recv_size (int): Bytes to read at a time.
+        '''
+        self._sock = sock
+        self._recv_size = recv_size
+        self._ids = itertools.count(1)
+        self._lines = LineBuffer()
+        self._replies = {}
+        self.pushes = []
+
+    def send(self, commands):
+        '''
+        Sends commands in one write, without waiting for replies.
+
+        Args:
+            commands (iterable(str)): Commands to send.
+
+        Returns:
+            list(int): Request id of each command.
+        '''
+        request_ids = []
+        frames = []
+        for command in commands:
+            request_ids.append(next(self._ids))
+            frames.append(encode_request(request_ids[-1], command))
+        self._sock.send(b''.join(frames))
+        return request_ids
+
+    def receive(self):
+        '''
+        Reads once from the connection, and files what arrived.
+
+        Returns:
+            bool: False if the connection closed.
+        '''
+        data = self._sock.recv(self._recv_size)
+        if not data:
+            return False
+        for line in self._lines.feed(data):
+            if line is None:
+                continue  # Too long to be a frame from the server.
+            try:
+                frame = json.loads(line)
+            except ValueError:
+                frame = {'push': line.decode()}  # Plain text from the server.
+            if 'push' in frame:
+                self.pushes.append(frame['push'])
+            elif 'error' in frame:
+                self._replies[frame['id']] = f'Error: {frame["error"]}'
+            else:
+                self._replies[frame['id']] = frame['reply']
+        return True
+
+    def wait(self, request_ids):
+        '''
+        Waits for replies to requests.
+
+        Args:
+            request_ids (list(int)): Ids from send.
+
+        Returns:
+            list(str): Replies in the same order as request_ids. A
+                request that failed gets its error, after "Error: ". If the
+                connection closes first, missing replies are None.
+        '''
+        while not all(
+            request_id in self._replies for request_id in request_ids
+        ):
+            if not self.receive():
+                break
+        return [
+            self._replies.pop(request_id, None) for request_id in request_ids
+        ]
+
+    def call(self, *commands):
+        '''
+        Sends commands in one write, and waits for all their replies.
+
+        Returns:
+            list(str): Reply to each command.
+        '''
+        return self.wait(self.send(commands))
@@ -0,0 +1,85 @@
+import argparse
+import unittest
+from unittest import mock
+
+from common import config
+
+
+class TestConfig(unittest.TestCase):
+
+    def setUp(self):
+        self._defaults = {'host': '127.0.0.1', 'port': 8080, 'debug': False}
+
+    def test_parse_scalar(self):
+        assert config.parse_scalar('8080') == 8080
+        assert config.parse_scalar('0.5') == 0.5
+        assert config.parse_scalar('true') is True
+        assert config.parse_scalar('~') is None
+        assert config.parse_scalar("'8080'") == '8080'
+        assert config.parse_scalar('127.0.0.1') == '127.0.0.1'
+
+    def test_coerce_to_default_type(self):
+        assert config.coerce('9000', 8080) == 9000
+        assert isinstance(config.coerce('9000', 8080), int)
+        assert config.coerce('0.5', 300) == 0.5
+        assert config.coerce('2', 0.5) == 2.0
+        self.assertRaises(ValueError, config.coerce, 'soon', 300)
+        assert config.coerce('yes', False) is True
+        self.assertRaises(ValueError, config.coerce, 'maybe', False)
+
+    def test_parse_flat_config(self):
+        text = '# Server\nhost: 0.0.0.0  # all\nport: 9000\n'
+
+        assert config.parse_flat_config(text) == {
+            'host': '0.0.0.0', 'port': 9000
+        }
+
+    def test_parse_flat_config_nested_raises(self):
+        text = 'server:\n  host: 0.0.0.0\n'
+
+        self.assertRaises(
+            config.NotFlatConfigError, config.parse_flat_config, text
+        )
+
+    @mock.patch('yaml.load', return_value={'server': {}})
+    def test_read_config_file_falls_back_to_yaml(self, patched_load):
+        with mock.patch(
+            'builtins.open',
+            mock.mock_open(read_data='server:\n  port: 1\n')
+        ):
+            assert config.read_config_file('config.yaml') == {'server': {}}
+
+        patched_load.assert_called_once()
+
+    def test_read_config_file_missing(self):
+        assert config.read_config_file('/does/not/exist.yaml') == {}
+
+    def test_load_config_layers(self):
+        environ = {'FIAR_PORT': '9000', 'FIAR_HOST': '0.0.0.0'}
+        overrides = {'host': '::1', 'port': None}
+
+        loaded = config.load_config(
+            self._defaults, '/does/not/exist.yaml', overrides, environ
+        )
+
+        assert loaded == {'host': '::1', 'port': 9000, 'debug': False}
+
+    @mock.patch.object(
+        config, 'read_config_file', return_value={'port': 1}
+    )
+    def test_load_config_path_from_environment(self, patched_read):
+        environ = {'FIAR_CONFIG': 'other.yaml'}
+
+        loaded = config.load_config(self._defaults, 'config.yaml', {}, environ)
+
+        patched_read.assert_called_once_with('other.yaml')
+        assert loaded['port'] == 1
+
+    def test_add_config_arguments(self):
+        parser = argparse.ArgumentParser()
+        config.add_config_arguments(parser, {'reconnect_grace': 10})
+
+        args = parser.parse_args(['--reconnect-grace', '5'])
+
+        assert args.reconnect_grace == '5'
+        assert args.config is None
@@ -0,0 +1,92 @@
+import json
+import socket
+import unittest
+
+from common import protocol
+
+
+class TestLineBuffer(unittest.TestCase):
+
+    def test_splits_complete_lines(self):
+        lines = protocol.LineBuffer()
+
+        assert lines.feed(b'one\ntw') == [b'one']
+        assert lines.feed(b'o\n\nthree') == [b'two']
+        assert lines.feed(b'\n') == [b'three']
+
+    def test_rejects_long_line(self):
+        lines = protocol.LineBuffer(max_line=4)
+
+        assert lines.feed(b'ok\ntoolong') == [b'ok', None]
+        assert lines.feed(b'still') == []
+        assert lines.feed(b'long\nok\n12345\n') == [b'ok', None]
+
+
+class TestFrames(unittest.TestCase):
+
+    def test_request_round_trip(self):
+        frame = protocol.encode_request(7, 'Ann,board')
+
+        assert protocol.is_framed(frame)
+        assert not protocol.is_framed(b'Ann,board')
+        assert protocol.decode_request(frame.rstrip(b'\n')) == (7, 'Ann,board')
+
+    def test_decode_invalid_request(self):
+        for line in (b'{', b'[]', b'{"id": 1}', b'{"id": 1, "command": 2}'):
+            with self.assertRaises(ValueError):
+                protocol.decode_request(line)
+
+    def test_reply_and_push(self):
+        assert json.loads(protocol.encode_reply(3, 'a\nb')) == {
+            'id': 3, 'reply': 'a\nb',
+        }
+        assert json.loads(protocol.encode_push('Your turn!')) == {
+            'push': 'Your turn!',
+        }
+        assert json.loads(protocol.encode_error(4, 'Failed.')) == {
+            'id': 4, 'error': 'Failed.',
+        }
+
+
+class TestRequestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self._client, self._server = socket.socketpair()
+        self._pipeline = protocol.RequestPipeline(self._client)
+
+    def tearDown(self):
+        self._client.close()
+        self._server.close()
+
+    def test_matches_out_of_order_replies(self):
+        request_ids = self._pipeline.send(['board', 'turn'])
+        sent = self._server.recv(4096).splitlines()
+
+        assert [protocol.decode_request(line) for line in sent] == [
+            (request_ids[0], 'board'), (request_ids[1], 'turn'),
+        ]
+        self._server.send((
+            protocol.encode_reply(request_ids[1], 'It is Anns turn.') +
+            protocol.encode_push('Your turn!') +
+            protocol.encode_reply(request_ids[0], 'Board:\n...')
+        ).encode())
+
+        assert self._pipeline.wait(request_ids) == [
+            'Board:\n...', 'It is Anns turn.',
+        ]
+        assert self._pipeline.pushes == ['Your turn!']
+
+    def test_error_frame_answers_request(self):
+        request_id, = self._pipeline.send(['hint'])
+        self._server.recv(4096)
+        frame = protocol.encode_error(request_id, 'Failed.')
+        self._server.send(frame.encode())
+
+        assert self._pipeline.wait([request_id]) == ['Error: Failed.']
+
+    def test_closed_connection(self):
+        request_ids = self._pipeline.send(['board'])
+        self._server.recv(4096)
+        self._server.close()
+
+        assert self._pipeline.wait(request_ids) == [None]
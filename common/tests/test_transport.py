@@ -0,0 +1,245 @@
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+from common import transport
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+CERTFILE = os.path.join(DATA_DIR, 'localhost.pem')
+KEYFILE = os.path.join(DATA_DIR, 'localhost.key')
+BOARD = ('[   ] ' * 9 + '\n') * 6
+
+
+def _serve_echo(server_transport, listener, connections):
+    '''Echoes one message back on each of the next few connections.'''
+    listener.setblocking(1)
+    for _ in range(connections):
+        connection, _ = server_transport.accept(listener)
+        connection.setblocking(1)
+        server_transport.handshake(connection)
+        connection.send(connection.recv(4096))
+        connection.close()
+
+
+class TestTransport(unittest.TestCase):
+
+    def _round_trip(self, server_transport, client_transport, connections=1):
+        listener = server_transport.listen(('127.0.0.1', 0))
+        address = listener.getsockname()
+        server_thread = threading.Thread(
+            target=_serve_echo,
+            args=(server_transport, listener, connections),
+        )
+        server_thread.start()
+        replies = []
+        for _ in range(connections):
+            connection = client_transport.connect(address)
+            connection.send(BOARD.encode())
+            replies.append(
+                (connection.recv(4096), connection.session_reused)
+                if client_transport.needs_handshake
+                else (connection.recv(4096), False)
+            )
+            client_transport.close(connection)
+        server_thread.join()
+        listener.close()
+        return replies
+
+    def test_compress_message_large(self):
+        data = BOARD.encode()
+
+        framed = transport.compress_message(data)
+
+        assert framed.startswith(transport.COMPRESSED_FLAG)
+        assert len(framed) < len(data)
+        assert transport.decompress_message(framed) == data
+
+    def test_compress_message_small(self):
+        framed = transport.compress_message(b'Your turn!')
+
+        assert framed == b'R\x00\x00\x00\nYour turn!'
+        assert transport.decompress_message(framed) == b'Your turn!'
+
+    def test_decompress_message_unknown_flag(self):
+        self.assertRaises(
+            transport.FrameError,
+            transport.decompress_message, b'?\x00\x00\x00\x00'
+        )
+
+    def test_decompress_message_corrupt(self):
+        self.assertRaises(
+            transport.FrameError,
+            transport.decompress_message, b'Z\x00\x00\x00\x02\xff\xff'
+        )
+
+    def test_frame_buffer_split_and_joined_frames(self):
+        frames = (
+            transport.compress_message(BOARD.encode()) +
+            transport.compress_message(b'Your turn!')
+        )
+        buffer = transport.FrameBuffer()
+
+        assert buffer.feed(frames[:3]) == []
+        assert buffer.feed(frames[3:-2]) == [BOARD.encode()]
+        assert buffer.feed(frames[-2:]) == [b'Your turn!']
+
+    def test_frame_buffer_too_large(self):
+        frame = transport.compress_message(b'x' * 100, min_size=1000)
+
+        self.assertRaises(
+            transport.FrameError, transport.FrameBuffer(10).feed, frame
+        )
+
+    def test_message_socket_waits_for_whole_frame(self):
+        one, two = socket.socketpair()
+        one.setblocking(0)
+        connection = transport.MessageSocket(one, 10)
+        frame = connection.frame(BOARD.encode())
+
+        two.send(frame[:5])
+        self.assertRaises(BlockingIOError, connection.recv, 4096)
+        two.send(frame[5:] + connection.frame(b'turn'))
+        assert connection.recv(4096) == BOARD.encode() + b'turn'
+        one.close()
+        two.close()
+
+    def test_tcp_round_trip(self):
+        replies = self._round_trip(transport.Transport(), transport.Transport())
+
+        assert replies[0][0] == BOARD.encode()
+
+    def test_tcp_compressed_round_trip(self):
+        replies = self._round_trip(
+            transport.Transport(compression=True),
+            transport.Transport(compression=True),
+        )
+
+        assert replies[0][0] == BOARD.encode()
+
+    def test_tls_round_trip_resumes_session(self):
+        server_transport = transport.TLSTransport(
+            CERTFILE, KEYFILE, compression=True
+        )
+        client_transport = transport.TLSTransport(
+            cafile=CERTFILE, server_hostname='localhost', compression=True
+        )
+
+        replies = self._round_trip(server_transport, client_transport, 2)
+
+        assert [reply for reply, _ in replies] == [BOARD.encode()] * 2
+        assert [reused for _, reused in replies] == [False, True]
+
+    def test_tls_handshake_non_blocking(self):
+        server_transport = transport.TLSTransport(CERTFILE, KEYFILE)
+        listener = server_transport.listen(('127.0.0.1', 0))
+        client = socket.create_connection(listener.getsockname())
+
+        connection, _ = server_transport.accept(listener)
+
+        # The client has not sent its hello, so the server must not block.
+        assert server_transport.handshake(connection) is False
+        client.close()
+        connection.close()
+        listener.close()
+
+    def test_accept_without_compression(self):
+        server_transport = transport.Transport(compression=True)
+        listener = server_transport.listen(('127.0.0.1', 0))
+        client = socket.create_connection(listener.getsockname())
+
+        connection, _ = server_transport.accept(listener, compression=False)
+
+        assert not isinstance(connection, transport.MessageSocket)
+        client.close()
+        connection.close()
+        listener.close()
+
+    def test_create_transport(self):
+        assert type(transport.create_transport({})) is transport.Transport
+        assert isinstance(
+            transport.create_transport({'transport': 'tls'}),
+            transport.TLSTransport,
+        )
+        self.assertRaises(
+            ValueError, transport.create_transport, {'transport': 'udp'}
+        )
+
+    def test_parse_listener(self):
+        assert transport.parse_listener('tcp://0.0.0.0:8080') == (
+            socket.AF_INET, ('0.0.0.0', 8080)
+        )
+        assert transport.parse_listener('tcp://[::]:8080') == (
+            socket.AF_INET6, ('::', 8080)
+        )
+        assert transport.parse_listener('unix:///tmp/game.sock') == (
+            socket.AF_UNIX, '/tmp/game.sock'
+        )
+        self.assertRaises(ValueError, transport.parse_listener, 'udp://x:1')
+
+    def test_parse_listeners(self):
+        assert transport.parse_listeners(None) == []
+        assert transport.parse_listeners(
+            'tcp://127.0.0.1:1, unix:///tmp/a.sock'
+        ) == [
+            (socket.AF_INET, ('127.0.0.1', 1)),
+            (socket.AF_UNIX, '/tmp/a.sock'),
+        ]
+
+    def test_unix_round_trip_replaces_stale_socket(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'game.sock')
+            stale = transport.Transport().listen(path, family=socket.AF_UNIX)
+            stale.close()
+            server_transport = transport.Transport()
+            listener = server_transport.listen(path, family=socket.AF_UNIX)
+            server_thread = threading.Thread(
+                target=_serve_echo, args=(server_transport, listener, 1)
+            )
+            server_thread.start()
+
+            connection = transport.Transport().connect(path)
+            connection.send(b'board')
+            reply = connection.recv(1024)
+            connection.close()
+            server_thread.join()
+            listener.close()
+
+        assert reply == b'board'
+
+    def test_reuse_port_listeners_share_port(self):
+        server_transport = transport.Transport()
+        first = server_transport.listen(('127.0.0.1', 0), reuse_port=True)
+        second = server_transport.listen(
+            first.getsockname(), reuse_port=True
+        )
+
+        assert second.getsockname() == first.getsockname()
+        first.close()
+        second.close()
+
+    @unittest.skipUnless(socket.has_ipv6, 'IPv6 is not available')
+    def test_ipv6_listener_is_dual_stack(self):
+        server_transport = transport.Transport()
+        try:
+            listener = server_transport.listen(
+                ('::', 0), family=socket.AF_INET6
+            )
+        except OSError:
+            self.skipTest('IPv6 is not configured')
+        port = listener.getsockname()[1]
+        server_thread = threading.Thread(
+            target=_serve_echo, args=(server_transport, listener, 1)
+        )
+        server_thread.start()
+
+        connection = transport.Transport().connect(('127.0.0.1', port))
+        connection.send(b'board')
+        reply = connection.recv(1024)
+        connection.close()
+        server_thread.join()
+        listener.close()
+
+        assert reply == b'board'
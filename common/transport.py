@@ -0,0 +1,546 @@
+import os
+import socket
+import stat
+import struct
+import sys
+import zlib
+
+
+COMPRESS_MIN_SIZE = 256
+# Raw deflate with a 512 byte window. Messages are small, and a small
+# window makes setting up each compression far cheaper.
+COMPRESS_WBITS = -9
+RAW_FLAG = b'R'
+COMPRESSED_FLAG = b'Z'
+# Flag, then payload length.
+FRAME_HEADER = struct.Struct('!cI')
+MAX_FRAME_SIZE = 1 << 20
+
+
+class FrameError(ConnectionError):
+    '''
+    Raised if a peer sends a malformed frame. The stream cannot be trusted
+    after one, so it is a ConnectionError: callers handling a dropped
+    connection close this one too.
+    '''
+
+
+def compress_message(data, min_size=COMPRESS_MIN_SIZE):
+    '''
+    Frames a message for a compressing connection. Messages of min_size
+    bytes or more are zlib compressed, smaller ones are sent as they are.
+
+    Args:
+        data (bytes): Message to send.
+        min_size (int): Smallest message worth compressing.
+
+    Returns:
+        bytes: The framed message.
+    '''
+    flag = RAW_FLAG
+    if len(data) >= min_size:
+        flag, data = COMPRESSED_FLAG, zlib.compress(data, wbits=COMPRESS_WBITS)
+    return FRAME_HEADER.pack(flag, len(data)) + data
+
+
+def _decode_payload(flag, payload, max_size):
+    '''Returns the message in a frames payload.'''
+    if flag == RAW_FLAG:
+        return payload
+    if flag != COMPRESSED_FLAG:
+        raise FrameError(f'Unknown message flag {flag!r}')
+    inflater = zlib.decompressobj(COMPRESS_WBITS)
+    try:
+        message = inflater.decompress(payload, max_size)
+    except zlib.error as err:
+        raise FrameError(f'Corrupt compressed message: {err}') from None
+    if inflater.unconsumed_tail:
+        raise FrameError('Message too large')
+    return message
+
+
+def decompress_message(data, max_size=MAX_FRAME_SIZE):
+    '''
+    Reverses compress_message.
+
+    Args:
+        data (bytes): One whole framed message.
+        max_size (int): Largest message accepted, in bytes.
+
+    Returns:
+        bytes: The original message.
+
+    Raises:
+        FrameError: If data is not one valid frame.
+    '''
+    messages = FrameBuffer(max_size).feed(data)
+    if len(messages) != 1:
+        raise FrameError('Expected exactly one frame')
+    return messages[0]
+
+
+class FrameBuffer:
+    '''
+    Collects bytes from a compressing connection, and decodes the frames
+    that have fully arrived, however the stream was split into reads.
+    '''
+    __slots__ = ('_buffer', '_max_size')
+
+    def __init__(self, max_size=MAX_FRAME_SIZE):
+        '''
+        Args:
+            max_size (int): Largest frame or message accepted, in bytes.
+        '''
+        self._buffer = bytearray()
+        self._max_size = max_size
+
+    def feed(self, data):
+        '''
+        Adds received bytes.
+
+        Args:
+            data (bytes): Bytes read from the connection.
+
+        Returns:
+            list(bytes): Messages in the frames completed.
+
+        Raises:
+            FrameError: If a frame is malformed or too large.
+        '''
+        self._buffer += data
+        messages = []
+        header_size = FRAME_HEADER.size
+        while len(self._buffer) >= header_size:
+            flag, length = FRAME_HEADER.unpack_from(self._buffer)
+            if flag not in (RAW_FLAG, COMPRESSED_FLAG):
+                raise FrameError(f'Unknown message flag {flag!r}')
+            if length > self._max_size:
+                raise FrameError(f'Frame of {length} bytes is too large')
+            end = header_size + length
+            if len(self._buffer) < end:
+                break
+            payload = bytes(self._buffer[header_size:end])
+            del self._buffer[:end]
+            messages.append(_decode_payload(flag, payload, self._max_size))
+        return messages
+
+
+def _wants_io(err):
+    '''
+    Returns True if err is TLS waiting on the peer, as a non-blocking
+    socket would raise BlockingIOError. ssl is only imported by TLS
+    transports, so without it no error can be a TLS one.
+    '''
+    ssl = sys.modules.get('ssl')
+    return ssl is not None and isinstance(
+        err, (ssl.SSLWantReadError, ssl.SSLWantWriteError)
+    )
+
+
+def parse_listener(url):
+    '''
+    Parses a listener URL: tcp://host:port, tcp://[ipv6 host]:port or
+    unix:///path/to/socket.
+
+    Args:
+        url (str): Listener URL.
+
+    Returns:
+        int: Socket address family.
+        tuple or str: Address to bind.
+    '''
+    scheme, separator, rest = url.strip().partition('://')
+    if separator and scheme == 'unix':
+        return socket.AF_UNIX, rest
+    if separator and scheme == 'tcp':
+        host, _, port = rest.rpartition(':')
+        if host.startswith('[') and host.endswith(']'):
+            return socket.AF_INET6, (host[1:-1], int(port))
+        return socket.AF_INET, (host, int(port))
+    raise ValueError(f'Unknown listener {url!r}')
+
+
+def parse_listeners(value):
+    '''
+    Parses the listeners setting, a list or comma separated string of
+    listener URLs.
+
+    Args:
+        value (str or list(str)): The setting. None means no listeners.
+
+    Returns:
+        list(tuple(int, tuple or str)): Family and address of each.
+    '''
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [parse_listener(url) for url in value if url.strip()]
+
+
+def _remove_stale_unix_socket(path):
+    '''Removes a socket file left by a server that did not clean up.'''
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _create_connection(address):
+    '''Connects a blocking socket to a TCP address or Unix socket path.'''
+    if isinstance(address, str):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.connect(address)
+        except OSError:
+            connection.close()
+            raise
+        return connection
+    return socket.create_connection(address)
+
+
+class MessageSocket:
+    '''
+    Wraps a connected socket, framing and compressing messages if asked,
+    and reading anything TLS has already decrypted that select cannot see.
+
+    Anything not defined here is passed to the wrapped socket, so it can
+    be used wherever the server and client use a socket.
+    '''
+    __slots__ = ('_sock', '_compress_min_size', '_frames')
+
+    def __init__(self, sock, compress_min_size=None):
+        '''
+        Args:
+            sock (socket.socket): Connected socket to wrap.
+            compress_min_size (int): Smallest message to compress, or None
+                to send messages unframed and uncompressed.
+        '''
+        self._sock = sock
+        self._compress_min_size = compress_min_size
+        self._frames = None if compress_min_size is None else FrameBuffer()
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+    def frame(self, data):
+        '''
+        Returns the bytes to write for a message, for send_framed.
+
+        Args:
+            data (bytes): Message to send.
+        '''
+        if self._compress_min_size is None:
+            return data
+        return compress_message(data, self._compress_min_size)
+
+    def send_framed(self, data):
+        '''
+        Writes bytes from frame, as much as the socket takes now, like
+        socket.send on a non-blocking socket.
+
+        Returns:
+            int: Number of bytes written.
+
+        Raises:
+            BlockingIOError: If the socket cannot take any now.
+        '''
+        try:
+            return self._sock.send(data)
+        except OSError as err:
+            if _wants_io(err):
+                raise BlockingIOError() from None
+            raise
+
+    def send(self, data):
+        '''
+        Sends a whole message on a blocking socket, e.g. from the client.
+
+        Returns:
+            int: Length of the message before compression.
+        '''
+        self._sock.sendall(self.frame(data))
+        return len(data)
+
+    def recv(self, size):
+        '''
+        Receives messages. If compressing, reads until at least one whole
+        frame has arrived, keeping the rest of a partial frame for the next
+        call.
+
+        Returns:
+            bytes: Received messages, or b'' if the connection closed.
+
+        Raises:
+            BlockingIOError: If a non-blocking socket has no whole message.
+            FrameError: If the peer sent a malformed frame.
+        '''
+        while True:
+            data = self._recv_available(size)
+            if not data or self._frames is None:
+                return data
+            messages = self._frames.feed(data)
+            if messages:
+                return b''.join(messages)
+
+    def _recv_available(self, size):
+        '''Reads what has arrived, including data TLS has buffered.'''
+        try:
+            data = self._sock.recv(size)
+        except OSError as err:
+            if _wants_io(err):
+                # Only TLS records with no message in them were readable.
+                raise BlockingIOError() from None
+            raise
+        pending = getattr(self._sock, 'pending', None)
+        while pending is not None and pending():
+            data += self._sock.recv(pending())
+        return data
+
+
+class Transport:
+    '''
+    Plain TCP, with optional per-message zlib compression. Both ends must
+    agree on compression.
+    '''
+    needs_handshake = False
+
+    def __init__(self, compression=False, compress_min_size=COMPRESS_MIN_SIZE):
+        '''
+        Args:
+            compression (bool): Compress large messages.
+            compress_min_size (int): Smallest message to compress.
+        '''
+        self._compress_min_size = compress_min_size if compression else None
+
+    def _wrap(self, sock):
+        '''Wraps a connected socket in a MessageSocket if it needs one.'''
+        if self._compress_min_size is None:
+            return sock
+        return MessageSocket(sock, self._compress_min_size)
+
+    def listen(self, address, backlog=2, family=socket.AF_INET,
+               reuse_port=False):
+        '''
+        Creates a non-blocking listening socket. IPv6 listeners are dual
+        stack, so they also accept IPv4 clients.
+
+        Args:
+            address (tuple or str): Address to bind, or a path for Unix
+                domain sockets.
+            backlog (int): Connections to queue before refusing more.
+            family (int): Socket address family.
+            reuse_port (bool): Set SO_REUSEPORT, so another process can
+                listen on the same TCP port, e.g. during a restart.
+
+        Returns:
+            socket.socket: The listening socket.
+        '''
+        listener = socket.socket(family, socket.SOCK_STREAM)
+        listener.setblocking(0)
+        if reuse_port and family != socket.AF_UNIX:
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if family == socket.AF_INET6:
+            listener.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
+        elif family == socket.AF_UNIX:
+            _remove_stale_unix_socket(address)
+        listener.bind(address)
+        listener.listen(backlog)
+        return listener
+
+    def accept(self, listener, compression=True):
+        '''
+        Accepts a connection on a listening socket.
+
+        Args:
+            listener (socket.socket): Listening socket that is readable.
+            compression (bool): False for connections that speak another
+                protocol, e.g. WebSocket, which must not be framed even if
+                the transport compresses.
+
+        Returns:
+            socket.socket: The new non-blocking connection.
+            tuple: The peer address.
+        '''
+        connection, address = listener.accept()
+        connection.setblocking(0)
+        if not compression:
+            return connection, address
+        return self._wrap(connection), address
+
+    def handshake(self, connection):
+        '''
+        Continues a connection handshake. Plain TCP has none.
+
+        Returns:
+            bool: True once the handshake is done.
+        '''
+        return True
+
+    def connect(self, address):
+        '''
+        Connects to a server.
+
+        Args:
+            address (tuple or str): Server address, or a Unix domain socket
+                path.
+
+        Returns:
+            socket.socket: The blocking connection.
+        '''
+        return self._wrap(_create_connection(address))
+
+    def close(self, connection):
+        '''Closes a connection made with connect.'''
+        connection.close()
+
+
+class TLSTransport(Transport):
+    '''
+    TLS over TCP. Clients keep the session from their last connection and
+    offer it on the next, so reconnects skip the full handshake.
+    '''
+    needs_handshake = True
+
+    def __init__(
+        self, certfile=None, keyfile=None, cafile=None,
+        server_hostname=None, compression=False,
+        compress_min_size=COMPRESS_MIN_SIZE,
+    ):
+        '''
+        Args:
+            certfile (str): Certificate chain. Required to listen.
+            keyfile (str): Private key for certfile.
+            cafile (str): CA bundle clients trust, e.g. a self-signed
+                certificate. Defaults to the system store.
+            server_hostname (str): Name to check the servers certificate
+                against. Defaults to the host connected to.
+            compression (bool): Compress large messages.
+            compress_min_size (int): Smallest message to compress.
+        '''
+        super().__init__(compression, compress_min_size)
+        self._certfile = certfile
+        self._keyfile = keyfile
+        self._cafile = cafile
+        self._server_hostname = server_hostname
+        self._server_context = None
+        self._client_context = None
+        self._session = None
+
+    def _get_server_context(self):
+        import ssl  # Only TLS needs it, and it is slow to import.
+
+        if self._server_context is None:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self._certfile, self._keyfile)
+            self._server_context = context
+        return self._server_context
+
+    def _get_client_context(self):
+        import ssl
+
+        if self._client_context is None:
+            self._client_context = ssl.create_default_context(
+                cafile=self._cafile
+            )
+        return self._client_context
+
+    def accept(self, listener, compression=True):
+        '''
+        Accepts a connection, without blocking on the TLS handshake. Call
+        handshake() each time the connection is readable until it is done.
+
+        Args:
+            listener (socket.socket): Listening socket that is readable.
+            compression (bool): False for connections that speak another
+                protocol, e.g. WebSocket, which must not be framed even if
+                the transport compresses.
+
+        Returns:
+            ssl.SSLSocket: The new non-blocking connection.
+            tuple: The peer address.
+        '''
+        connection, address = listener.accept()
+        connection.setblocking(0)
+        connection = self._get_server_context().wrap_socket(
+            connection, server_side=True, do_handshake_on_connect=False
+        )
+        return MessageSocket(
+            connection, self._compress_min_size if compression else None
+        ), address
+
+    def handshake(self, connection):
+        '''
+        Continues a non-blocking TLS handshake.
+
+        Returns:
+            bool: True once the handshake is done, False if it is waiting on
+                the peer.
+
+        Raises:
+            ssl.SSLError: If the handshake failed.
+        '''
+        try:
+            connection.do_handshake()
+        except OSError as err:
+            if _wants_io(err):
+                return False
+            raise
+        return True
+
+    def connect(self, address):
+        '''
+        Connects to a server, resuming the last TLS session if there is one.
+
+        Args:
+            address (tuple or str): Server address, or a Unix domain socket
+                path.
+
+        Returns:
+            MessageSocket: The blocking connection.
+        '''
+        hostname = self._server_hostname or (
+            address if isinstance(address, str) else address[0]
+        )
+        connection = self._get_client_context().wrap_socket(
+            _create_connection(address),
+            server_hostname=hostname,
+            session=self._session,
+        )
+        return MessageSocket(connection, self._compress_min_size)
+
+    def close(self, connection):
+        '''
+        Closes a connection made with connect, keeping its TLS session to
+        resume on the next connect.
+        '''
+        if connection.session is not None:
+            self._session = connection.session
+        connection.close()
+
+
+def create_transport(config):
+    '''
+    Builds the transport named in config.
+
+    Args:
+        config (dict): Settings. Uses transport ('tcp' or 'tls'),
+            compression, certfile, keyfile, cafile and server_hostname.
+
+    Returns:
+        Transport: The transport.
+    '''
+    name = config.get('transport') or 'tcp'
+    compression = bool(config.get('compression'))
+    if name == 'tcp':
+        return Transport(compression)
+    if name == 'tls':
+        return TLSTransport(
+            certfile=config.get('certfile'),
+            keyfile=config.get('keyfile'),
+            cafile=config.get('cafile'),
+            server_hostname=config.get('server_hostname'),
+            compression=compression,
+        )
+    raise ValueError(f'Unknown transport {name!r}')
@@ -1,9 +1,125 @@
+import argparse
+import signal
+
+from common.config import add_config_arguments
+from common.transport import create_transport
+from cluster import CoordinatorClient, parse_address
+from events import EventBus, StreamSink, open_stream
 from game_server import GameServer
-from server_utils import load_config
+from handoff import receive_listeners
+from metrics import Metrics
+from profiling import Profiler
+from ratings import RatingStore
+from server_utils import DEFAULTS, load_config
 
 
 if __name__ == "__main__":
-    config = load_config()
+    parser = argparse.ArgumentParser(prog='server')
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='Profile the server loop from the start. SIGUSR1 toggles '
+        'profiling while running.'
+    )
+    add_config_arguments(parser, DEFAULTS)
+    args = parser.parse_args()
+
+    config = load_config(vars(args))
+    ratings = (
+        RatingStore(config['ratings_db']) if config['ratings_db'] else None
+    )
+    analyzer = None
+    if config['hints']:
+        # The solver is only imported by servers that give hints.
+        from analysis import Analyzer
+        from book import PositionBook
+
+        analyzer = Analyzer(
+            book=(
+                PositionBook(config['book_path'])
+                if config['book_path'] else None
+            ),
+            cache_size=config['hint_cache_size'],
+            max_depth=config['hint_depth'],
+            time_budget=config['hint_time'],
+            max_pending=config['hint_queue_size'],
+        )
+
+    metrics = Metrics()
+    event_bus = EventBus()
+    event_sink = None
+    if config['event_stream']:
+        event_sink = StreamSink(open_stream(config['event_stream']))
+        event_bus.subscribe(event_sink)
+        metrics.register('event_stream', event_sink.stats)
+
+    profiler = Profiler(
+        config['profile_output'],
+        interval=config['profile_interval'],
+        dump_interval=config['profile_dump_interval'],
+        wall_clock=config['profile_wall_clock'],
+    )
+
+    coordinator = (
+        CoordinatorClient(parse_address(config['coordinator']))
+        if config['coordinator'] else None
+    )
+    if coordinator is not None:
+        metrics.register('coordinator', coordinator.stats)
+
+    server = GameServer(
+        config['host'], config['port'],
+        reconnect_grace=config['reconnect_grace'],
+        max_parked=config['max_parked'],
+        transport=create_transport(config),
+        listeners=config['listeners'],
+        websocket_listeners=config['websocket_listeners'],
+        websocket_ping_interval=config['websocket_ping_interval'],
+        max_message_size=config['max_message_size'],
+        message_rate=config['message_rate'],
+        message_burst=config['message_burst'],
+        ip_message_rate=config['ip_message_rate'],
+        ip_message_burst=config['ip_message_burst'],
+        max_queued_messages=config['max_queued_messages'],
+        max_strikes=config['max_strikes'],
+        turn_time=config['turn_time'],
+        turn_increment=config['turn_increment'],
+        idle_timeout=config['idle_timeout'],
+        ratings=ratings,
+        analyzer=analyzer,
+        metrics=metrics,
+        reuse_port=config['reuse_port'],
+        handoff_path=config['handoff_path'],
+        inherited_listeners=(
+            receive_listeners(config['takeover_from'])
+            if config['takeover_from'] else None
+        ),
+        drain_timeout=config['drain_timeout'],
+        coordinator=coordinator,
+        node_id=config['node_id'],
+        advertise_address=config['advertise_address'],
+        event_bus=event_bus,
+        profiler=profiler,
+        rules=config['rules'],
+        shed_lag=config['shed_lag'],
+        shed_recover_lag=config['shed_recover_lag'],
+        lag_smoothing=config['lag_smoothing'],
+    )
 
-    server = GameServer(config['host'], config['port'])
+    for signum in (signal.SIGTERM, signal.SIGHUP):
+        signal.signal(signum, lambda signum, frame: server.request_drain())
+    signal.signal(
+        signal.SIGUSR1, lambda signum, frame: profiler.request_toggle()
+    )
+    if args.profile:
+        profiler.start()
     server.server_loop()
+    if profiler.enabled:
+        profiler.stop()
+    if ratings is not None:
+        ratings.close()
+    if analyzer is not None:
+        analyzer.close()
+    if coordinator is not None:
+        coordinator.close()
+    if event_sink is not None:
+        event_sink.close()
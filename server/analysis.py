@@ -0,0 +1,246 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from server.book import canonical_key, mirror_column
+from server.game_logic import COLUMNS, ROWS
+from server.solver import WIN_SCORE, best_move
+
+
+# Scores at least this far from 0 are forced wins or losses.
+DECISIVE_SCORE = WIN_SCORE - ROWS * COLUMNS
+# Rough growth in search time per extra depth, to guess whether the next
+# depth fits in the time budget.
+BRANCHING_ESTIMATE = 4
+
+
+class EvaluationCache:
+    '''
+    Least recently used cache of position evaluations by canonical key,
+    shared by every game in the process so popular positions are searched
+    once. Locked, as analysis threads and the server loop both use it.
+    '''
+    def __init__(self, max_entries=4096):
+        '''
+        Args:
+            max_entries (int): Most positions kept.
+        '''
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        '''
+        Returns a cached evaluation, marking it recently used.
+
+        Args:
+            key (int): Canonical position key.
+
+        Returns:
+            tuple(int, int): Column and score, or None if not cached.
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        '''
+        Caches an evaluation, dropping the least recently used if full.
+
+        Args:
+            key (int): Canonical position key.
+            entry (tuple(int, int)): Column and score.
+        '''
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        '''
+        Returns the caches counters, for Metrics.register.
+
+        Returns:
+            dict(str, int or float)
+        '''
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class Analyzer:
+    '''
+    Finds the best move in a position: from the position book if it has
+    one, then the evaluation cache, then by iterative deepening search
+    within a time budget. Searches run on a worker thread, so the server
+    loop keeps serving while they think.
+    '''
+    def __init__(self, book=None, cache_size=4096, max_depth=6,
+                 time_budget=0.5, max_pending=16):
+        '''
+        Args:
+            book (.book.PositionBook): Precomputed positions, or None.
+            cache_size (int): Most positions in the evaluation cache.
+            max_depth (int): Deepest search, in moves.
+            time_budget (float): Seconds a search may take. Searches stop
+                deepening once the next depth would not fit.
+            max_pending (int): Most analyses queued or running at once.
+                Each waits up to time_budget behind the ones before it, so
+                this bounds how stale a hint can get.
+        '''
+        self._book = book
+        self.book_hits = 0
+        self.cache = EvaluationCache(cache_size)
+        self._max_depth = max_depth
+        self._time_budget = time_budget
+        self._max_pending = max_pending
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self.rejected = 0
+        self.failures = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='analysis'
+        )
+
+    def lookup(self, board, piece):
+        '''
+        Returns the best move if it is known without searching.
+
+        Args:
+            board (.game_logic.GameBoard): The position.
+            piece (str): Piece of the player to move.
+
+        Returns:
+            tuple(int, int): Zero based column and score for the player to
+                move, or None if a search is needed.
+        '''
+        if self._book is not None:
+            entry = self._book.lookup(board, piece)
+            if entry is not None:
+                self.book_hits += 1
+                return entry
+        key, mirrored = canonical_key(board, piece)
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        column, score = entry
+        return (mirror_column(column) if mirrored else column), score
+
+    def analyse(self, board, piece):
+        '''
+        Returns the best move, searching and caching it if not known.
+
+        Args:
+            board (.game_logic.GameBoard): The position. Not changed.
+            piece (str): Piece of the player to move.
+
+        Returns:
+            tuple(int, int): Zero based column and score for the player to
+                move. The column is None if the board is full.
+        '''
+        entry = self.lookup(board, piece)
+        if entry is not None:
+            return entry
+
+        deadline = time.perf_counter() + self._time_budget
+        for depth in range(1, self._max_depth + 1):
+            started = time.perf_counter()
+            column, score = best_move(board, piece, depth)
+            finished = time.perf_counter()
+            if (
+                column is None or
+                abs(score) >= DECISIVE_SCORE or
+                finished + (finished - started) * BRANCHING_ESTIMATE >
+                deadline
+            ):
+                break
+
+        if column is not None:
+            key, mirrored = canonical_key(board, piece)
+            self.cache.put(
+                key, (mirror_column(column) if mirrored else column, score)
+            )
+        return column, score
+
+    def stats(self):
+        '''
+        Returns book and cache counters, for Metrics.register.
+
+        Returns:
+            dict(str, int or float)
+        '''
+        stats = {
+            'book_hits': self.book_hits,
+            'pending': self._pending,
+            'rejected': self.rejected,
+            'failures': self.failures,
+        }
+        stats.update(
+            (f'cache_{name}', value)
+            for name, value in self.cache.stats().items()
+        )
+        return stats
+
+    def submit(self, board, piece, callback):
+        '''
+        Analyses a position on the worker thread.
+
+        Args:
+            board (.game_logic.GameBoard): The position. Copied, so the game
+                can go on.
+            piece (str): Piece of the player to move.
+            callback (callable): Called on the worker thread with the
+                result of analyse, or None if the analysis failed. Always
+                called once for an analysis that was started.
+
+        Returns:
+            bool: False if max_pending analyses are already waiting, so
+                this one was not started.
+        '''
+        with self._pending_lock:
+            if self._pending >= self._max_pending:
+                self.rejected += 1
+                return False
+            self._pending += 1
+        future = self._executor.submit(self.analyse, board.copy(), piece)
+        future.add_done_callback(
+            lambda done: self._finished(done, callback)
+        )
+        return True
+
+    def _finished(self, future, callback):
+        '''
+        Hands an analysis result, or None if it raised, to its callback.
+        '''
+        with self._pending_lock:
+            self._pending -= 1
+        try:
+            result = future.result()
+        except Exception as err:
+            self.failures += 1
+            print(f'Analysis failed: {err!r}')
+            result = None
+        callback(result)
+
+    def close(self):
+        '''Waits for running analyses, and stops the worker thread.'''
+        self._executor.shutdown()
@@ -0,0 +1,127 @@
+import mmap
+import struct
+
+from server.game_logic import COLUMNS, GameBoard
+
+
+MAGIC = b'FIARBK2\0'
+HEADER = struct.Struct('<8sII')  # Magic, slot count, entry count.
+SLOT = struct.Struct('<Qbb')  # Position key (0 if empty), column, score.
+# Folded into keys when the second player is to move.
+SECOND_TO_MOVE = 0x9E3779B97F4A7C15
+
+
+def mirror_column(column):
+    '''
+    Returns the column in the same place on the left-right mirrored board.
+
+    Args:
+        column (int): Zero based column.
+
+    Returns:
+        int
+    '''
+    return COLUMNS - 1 - column
+
+
+def canonical_key(board, piece):
+    '''
+    Returns a 64 bit key for a position, from the boards Zobrist hashes.
+    It is the same for the position and its left-right mirror image, as
+    they play the same way.
+
+    Args:
+        board (.game_logic.GameBoard): The position.
+        piece (str): Piece of the player to move.
+
+    Returns:
+        int: Non zero key.
+        bool: True if the key is for the mirror image, so columns stored
+            under it must be mirrored back.
+    '''
+    board_hash, mirror_hash = board.zobrist_hash, board.mirror_hash
+    if piece == GameBoard.player_pieces[1]:
+        board_hash ^= SECOND_TO_MOVE
+        mirror_hash ^= SECOND_TO_MOVE
+    return min(board_hash, mirror_hash) or 1, mirror_hash < board_hash
+
+
+def write_book(path, entries):
+    '''
+    Writes positions to a book file: an open addressing hash table with
+    linear probing, at most half full, so lookups touch one or two slots.
+
+    Args:
+        path (str): File to write.
+        entries (dict(int, tuple(int, int))): Best column and score of each
+            position, by canonical key, with columns for the canonical
+            orientation.
+    '''
+    slots = 8
+    while slots < len(entries) * 2:
+        slots *= 2
+    table = bytearray(HEADER.size + slots * SLOT.size)
+    HEADER.pack_into(table, 0, MAGIC, slots, len(entries))
+    for key, (column, score) in entries.items():
+        slot = key & (slots - 1)
+        while SLOT.unpack_from(table, HEADER.size + slot * SLOT.size)[0]:
+            slot = (slot + 1) & (slots - 1)
+        SLOT.pack_into(table, HEADER.size + slot * SLOT.size, key, column,
+                       score)
+    with open(path, 'wb') as book_file:
+        book_file.write(table)
+
+
+class PositionBook:
+    '''
+    Read only view of a book file written by write_book. The file is memory
+    mapped, so opening it reads nothing, and the operating system shares its
+    pages between every process using the same book.
+    '''
+    def __init__(self, path):
+        '''
+        Args:
+            path (str): Book file to open.
+
+        Raises:
+            ValueError: If the file is not a book.
+        '''
+        with open(path, 'rb') as book_file:
+            self._map = mmap.mmap(
+                book_file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        magic, self._slots, self._count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f'{path} is not a position book.')
+
+    def __len__(self):
+        return self._count
+
+    def lookup(self, board, piece):
+        '''
+        Looks up the best move in a position.
+
+        Args:
+            board (.game_logic.GameBoard): The position.
+            piece (str): Piece of the player to move.
+
+        Returns:
+            tuple(int, int): Zero based column and score for the player to
+                move, or None if the position is not in the book.
+        '''
+        key, mirrored = canonical_key(board, piece)
+        slot = key & (self._slots - 1)
+        while True:
+            stored, column, score = SLOT.unpack_from(
+                self._map, HEADER.size + slot * SLOT.size
+            )
+            if stored == key:
+                return (mirror_column(column) if mirrored else column), score
+            if not stored:
+                return None
+            slot = (slot + 1) & (self._slots - 1)
+
+    def close(self):
+        '''Unmaps the book file.'''
+        self._map.close()
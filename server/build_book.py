@@ -0,0 +1,148 @@
+'''
+Builds a position book for bots and hints: every opening position up to a
+number of moves, scored by a depth limited search, and late positions from
+random games, solved exactly.
+
+    python -m server.build_book --output book.bin
+'''
+import argparse
+import random
+import time
+
+from server.book import canonical_key, mirror_column, write_book
+from server.game_logic import GameBoard
+from server.solver import best_move, other_piece
+
+
+def opening_positions(plies):
+    '''
+    Lists every position reachable in up to plies moves from the empty
+    board, with x to move first. Mirror images are only listed once.
+
+    Args:
+        plies (int): Most moves played.
+
+    Returns:
+        list(tuple(.game_logic.GameBoard, str)): Each position and the piece
+            to move.
+    '''
+    positions = []
+    seen = set()
+    frontier = [(GameBoard(), GameBoard.player_pieces[0])]
+    for ply in range(plies + 1):
+        next_frontier = []
+        for board, piece in frontier:
+            key, _ = canonical_key(board, piece)
+            if key in seen:
+                continue
+            seen.add(key)
+            positions.append((board, piece))
+            if ply == plies:
+                continue
+            for column in board.legal_columns():
+                child = board.copy()
+                win, _, _ = child.insert_piece(piece, column)
+                if not win:
+                    next_frontier.append((child, other_piece(piece)))
+        frontier = next_frontier
+    return positions
+
+
+def endgame_positions(games, max_empty, rng):
+    '''
+    Plays random games, and lists positions from them with few empty spaces
+    left, so they can be solved exactly.
+
+    Args:
+        games (int): Number of random games to play.
+        max_empty (int): Most empty spaces in a listed position.
+        rng (random.Random): Source of random moves.
+
+    Returns:
+        list(tuple(.game_logic.GameBoard, str)): Each position and the piece
+            to move.
+    '''
+    positions = []
+    total = len(GameBoard().spaces)
+    for _ in range(games):
+        board, piece = GameBoard(), GameBoard.player_pieces[0]
+        while not board.is_board_full():
+            if total - board.move_count <= max_empty:
+                positions.append((board.copy(), piece))
+            win, _, _ = board.insert_piece(
+                piece, rng.choice(board.legal_columns())
+            )
+            if win:
+                break
+            piece = other_piece(piece)
+    return positions
+
+
+def evaluate(positions, depth, entries):
+    '''
+    Searches positions, and adds each best move to entries.
+
+    Args:
+        positions (list(tuple(.game_logic.GameBoard, str))): Positions and
+            the piece to move.
+        depth (int): Number of moves to search ahead.
+        entries (dict(int, tuple(int, int))): Best column and score by
+            canonical key, with columns for the canonical orientation.
+    '''
+    for board, piece in positions:
+        key, mirrored = canonical_key(board, piece)
+        if key in entries:
+            continue
+        column, score = best_move(board, piece, depth)
+        entries[key] = (mirror_column(column) if mirrored else column, score)
+
+
+def build_entries(opening_plies, opening_depth, endgame_games, endgame_empty,
+                  seed=None):
+    '''
+    Works out the book entries.
+
+    Args:
+        opening_plies (int): Most moves in an opening position.
+        opening_depth (int): Search depth for opening positions.
+        endgame_games (int): Random games to take endgame positions from.
+        endgame_empty (int): Most empty spaces in an endgame position.
+            Endgames are searched to the end of the game.
+        seed (int): Seed for the random games.
+
+    Returns:
+        dict(int, tuple(int, int)): Best column and score by canonical key.
+    '''
+    entries = {}
+    evaluate(opening_positions(opening_plies), opening_depth, entries)
+    evaluate(
+        endgame_positions(endgame_games, endgame_empty, random.Random(seed)),
+        endgame_empty, entries,
+    )
+    return entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='server.build_book')
+    parser.add_argument('--output', default='book.bin')
+    parser.add_argument('--opening-plies', type=int, default=4)
+    parser.add_argument('--opening-depth', type=int, default=4)
+    parser.add_argument('--endgame-games', type=int, default=1000)
+    parser.add_argument('--endgame-empty', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    entries = build_entries(
+        args.opening_plies, args.opening_depth,
+        args.endgame_games, args.endgame_empty, args.seed,
+    )
+    write_book(args.output, entries)
+    print(
+        f'Wrote {len(entries)} positions to {args.output} in '
+        f'{time.perf_counter() - start:.1f}s'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+class TurnClock:
+    '''
+    Chess clock for a two player match. Each player has a time bank that
+    runs down on their turn, and gains the increment after each move.
+    Times come from time.monotonic(), so changes to the wall clock do not
+    affect them.
+
+    Attrs:
+    remaining: list(float)
+        Seconds left for each player, as of when their turn started.
+
+    running_player: int
+        Player whose time is running, or None if stopped.
+    '''
+    __slots__ = ('_base', '_increment', 'remaining', 'running_player',
+                 '_turn_started')
+
+    def __init__(self, base, increment=0):
+        '''
+        Args:
+            base (float): Seconds each player starts with.
+            increment (float): Seconds added after each move.
+        '''
+        self._base = base
+        self._increment = increment
+        self.remaining = [base, base]
+        self.running_player = None
+        self._turn_started = 0.0
+
+    def start(self, player, now):
+        '''
+        Resets both time banks, and starts the players time.
+
+        Args:
+            player (int): Player to move first.
+            now (float): Current time.monotonic().
+        '''
+        self.remaining = [self._base, self._base]
+        self.running_player = player
+        self._turn_started = now
+
+    def stop(self):
+        '''Stops the clock.'''
+        self.running_player = None
+
+    def switch(self, now):
+        '''
+        Ends the running players turn, and starts the other players time.
+
+        Args:
+            now (float): Current time.monotonic().
+        '''
+        player = self.running_player
+        self.remaining[player] = (
+            self.remaining[player] - (now - self._turn_started) +
+            self._increment
+        )
+        self.running_player = 1 - player
+        self._turn_started = now
+
+    def time_left(self, player, now):
+        '''
+        Returns the players time left.
+
+        Args:
+            player (int): Player to check.
+            now (float): Current time.monotonic().
+
+        Returns:
+            float: Seconds left, never negative.
+        '''
+        left = self.remaining[player]
+        if player == self.running_player:
+            left -= now - self._turn_started
+        return max(0.0, left)
+
+    def deadline(self):
+        '''
+        Returns when the running players time will run out.
+
+        Returns:
+            float: time.monotonic() of the flag fall.
+        '''
+        return self._turn_started + self.remaining[self.running_player]
@@ -0,0 +1,370 @@
+'''
+Routing of rooms across server nodes. A coordinator keeps the registry of
+nodes, and rooms are spread over them by consistent hashing, so adding or
+removing a node only moves the rooms that node gains or loses.
+
+The Coordinator runs in process, e.g. in tests. CoordinatorServer serves
+one over localhost, and CoordinatorClient gives a node the same interface:
+
+    python -m server.cluster --port 7000
+'''
+import argparse
+import bisect
+import hashlib
+import json
+import socket
+import socketserver
+import threading
+import time
+
+
+DEFAULT_REPLICAS = 100
+
+
+def _hash(value):
+    '''Returns a stable 64 bit hash of a string.'''
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big'
+    )
+
+
+class HashRing:
+    '''
+    Consistent hash ring. Each node is placed at many points (virtual nodes)
+    so rooms spread evenly, and a room belongs to the first node point at or
+    after its own hash.
+    '''
+    def __init__(self, nodes=(), replicas=DEFAULT_REPLICAS):
+        '''
+        Args:
+            nodes (iterable(str)): Initial node ids.
+            replicas (int): Points on the ring per node.
+        '''
+        self._replicas = replicas
+        self._points = []
+        self._owners = {}
+        for node in nodes:
+            self.add_node(node)
+
+    def __len__(self):
+        return len(self._points) // self._replicas
+
+    def add_node(self, node):
+        '''
+        Adds a node, taking over the rooms just before its points.
+
+        Args:
+            node (str): Node id.
+        '''
+        for replica in range(self._replicas):
+            point = _hash(f'{node}#{replica}')
+            if point in self._owners:
+                continue
+            self._owners[point] = node
+            bisect.insort(self._points, point)
+
+    def remove_node(self, node):
+        '''
+        Removes a node. Its rooms go to the next node round the ring.
+
+        Args:
+            node (str): Node id.
+        '''
+        self._points = [
+            point for point in self._points if self._owners[point] != node
+        ]
+        self._owners = {
+            point: owner for point, owner in self._owners.items()
+            if owner != node
+        }
+
+    def node_for(self, key):
+        '''
+        Returns the node owning a key.
+
+        Args:
+            key (str): E.g. a room name.
+
+        Returns:
+            str: Node id, or None if there are no nodes.
+        '''
+        if not self._points:
+            return None
+        index = bisect.bisect_left(self._points, _hash(key))
+        return self._owners[self._points[index % len(self._points)]]
+
+
+class Coordinator:
+    '''
+    In process registry of nodes and their addresses, and owner of the hash
+    ring that assigns rooms to them. Locked, so CoordinatorServer threads
+    can share it.
+    '''
+    def __init__(self, replicas=DEFAULT_REPLICAS):
+        self._replicas = replicas
+        self._nodes = {}
+        self._ring = HashRing(replicas=replicas)
+        self._lock = threading.Lock()
+
+    def register(self, node_id, address):
+        '''
+        Adds a node, or updates its address.
+
+        Args:
+            node_id (str): Node id.
+            address (str): host:port clients connect to.
+        '''
+        with self._lock:
+            if node_id not in self._nodes:
+                self._ring.add_node(node_id)
+            self._nodes[node_id] = address
+
+    def unregister(self, node_id):
+        '''
+        Removes a node, e.g. as it drains. Unknown nodes are ignored.
+
+        Args:
+            node_id (str): Node id.
+        '''
+        with self._lock:
+            if self._nodes.pop(node_id, None) is not None:
+                self._ring.remove_node(node_id)
+
+    def nodes(self):
+        '''
+        Returns every node.
+
+        Returns:
+            dict(str, str): Address of each node id.
+        '''
+        with self._lock:
+            return dict(self._nodes)
+
+    def owner(self, room):
+        '''
+        Returns the node owning a room.
+
+        Args:
+            room (str): Room name.
+
+        Returns:
+            tuple(str, str): Node id and address, or None if there are no
+                nodes.
+        '''
+        with self._lock:
+            node_id = self._ring.node_for(room)
+            if node_id is None:
+                return None
+            return node_id, self._nodes[node_id]
+
+
+class _CoordinatorHandler(socketserver.StreamRequestHandler):
+    '''Answers one JSON request per line from a CoordinatorClient.'''
+    def handle(self):
+        coordinator = self.server.coordinator
+        for line in self.rfile:
+            request = json.loads(line)
+            operation = request['op']
+            if operation == 'register':
+                coordinator.register(request['node'], request['address'])
+                reply = {'ok': True}
+            elif operation == 'unregister':
+                coordinator.unregister(request['node'])
+                reply = {'ok': True}
+            elif operation == 'nodes':
+                reply = {'nodes': coordinator.nodes()}
+            else:
+                reply = {'error': f'Unknown op {operation!r}.'}
+            self.wfile.write(json.dumps(reply).encode() + b'\n')
+
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    '''
+    Serves a Coordinator over localhost, one thread per node connection.
+    '''
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, coordinator, address=('127.0.0.1', 0)):
+        '''
+        Args:
+            coordinator (Coordinator): Registry to serve.
+            address (tuple(str, int)): Address to listen on.
+        '''
+        super().__init__(address, _CoordinatorHandler)
+        self.coordinator = coordinator
+
+    def serve_in_thread(self):
+        '''
+        Serves on a daemon thread.
+
+        Returns:
+            threading.Thread: The serving thread.
+        '''
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        '''Stops serving, and closes the listening socket.'''
+        self.shutdown()
+        self.server_close()
+
+
+class CoordinatorClient:
+    '''
+    Talks to a CoordinatorServer, with the same interface as Coordinator.
+    Room lookups never wait on the coordinator: they use a local copy of
+    the hash ring, refreshed on a worker thread once it is refresh_interval
+    seconds old. After a failed refresh the copy is kept, and the next
+    attempt waits longer each time, up to max_backoff seconds, so a dead
+    coordinator costs the server loop nothing.
+    '''
+    def __init__(self, address, replicas=DEFAULT_REPLICAS,
+                 refresh_interval=5, timeout=2, max_backoff=60):
+        '''
+        Args:
+            address (tuple(str, int)): Coordinator address.
+            replicas (int): Points on the ring per node. Must match the
+                coordinator.
+            refresh_interval (float): Seconds a local ring is used for.
+            timeout (float): Seconds to wait for the coordinator.
+            max_backoff (float): Longest wait between refreshes after
+                failures, in seconds.
+        '''
+        self._address = address
+        self._replicas = replicas
+        self._refresh_interval = refresh_interval
+        self._timeout = timeout
+        self._max_backoff = max_backoff
+        self._connection = None
+        self._reader = None
+        self._lock = threading.Lock()  # One request at a time.
+        # Replaced whole, so readers never see a half updated pair.
+        self._routes = ({}, HashRing(replicas=replicas))
+        self._next_refresh = 0.0
+        self._refreshing = False
+        self._failures = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    def _request(self, request):
+        with self._lock:
+            if self._connection is None:
+                self._connection = socket.create_connection(
+                    self._address, self._timeout
+                )
+                self._reader = self._connection.makefile('rb')
+            try:
+                self._connection.sendall(
+                    json.dumps(request).encode() + b'\n'
+                )
+                return json.loads(self._reader.readline())
+            except (OSError, ValueError):
+                self._close_connection()
+                raise
+
+    def register(self, node_id, address):
+        self._request({'op': 'register', 'node': node_id, 'address': address})
+        self.nodes()
+
+    def unregister(self, node_id):
+        self._request({'op': 'unregister', 'node': node_id})
+        self.nodes()
+
+    def nodes(self):
+        nodes = self._request({'op': 'nodes'})['nodes']
+        self._routes = (nodes, HashRing(nodes, self._replicas))
+        self._failures = 0
+        self._next_refresh = time.monotonic() + self._refresh_interval
+        self.refreshes += 1
+        return dict(nodes)
+
+    def owner(self, room):
+        '''
+        Returns the owner of a room on the local ring, starting a refresh
+        in the background if it is due.
+
+        Returns:
+            tuple(str, str): Node id and address, or None if no nodes are
+                known yet.
+        '''
+        if not self._refreshing and time.monotonic() >= self._next_refresh:
+            self._refreshing = True
+            threading.Thread(target=self._refresh, daemon=True).start()
+        nodes, ring = self._routes
+        node_id = ring.node_for(room)
+        if node_id is None:
+            return None
+        return node_id, nodes[node_id]
+
+    def _refresh(self):
+        '''Fetches the nodes on a worker thread, backing off on failure.'''
+        try:
+            self.nodes()
+        except (OSError, ValueError, KeyError) as err:
+            self.errors += 1
+            self._failures += 1
+            backoff = min(self._max_backoff, 2 ** (self._failures - 1))
+            self._next_refresh = time.monotonic() + backoff
+            print(f'Coordinator refresh failed, retrying in {backoff}s: {err}')
+        finally:
+            self._refreshing = False
+
+    def stats(self):
+        '''
+        Returns refresh counters, for Metrics.register.
+
+        Returns:
+            dict(str, int)
+        '''
+        return {
+            'nodes': len(self._routes[0]),
+            'refreshes': self.refreshes,
+            'errors': self.errors,
+        }
+
+    def _close_connection(self):
+        if self._connection is not None:
+            self._reader.close()
+            self._connection.close()
+            self._connection = self._reader = None
+
+    def close(self):
+        '''Closes the connection to the coordinator.'''
+        with self._lock:
+            self._close_connection()
+
+
+def parse_address(value):
+    '''
+    Splits host:port.
+
+    Args:
+        value (str): Address, e.g. 127.0.0.1:7000.
+
+    Returns:
+        tuple(str, int)
+    '''
+    host, _, port = value.rpartition(':')
+    return host.strip('[]'), int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='server.cluster')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7000)
+    args = parser.parse_args(argv)
+
+    server = CoordinatorServer(Coordinator(), (args.host, args.port))
+    print(f'Coordinator listening on {args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+'''
+Game events, published on an in process bus. Each event is encoded to a
+JSON line at most once, and the same bytes are shared by every consumer, so
+a game loop with several subscribers pays for one encoding. StreamSink
+forwards events to a file or Unix socket on its own thread, dropping them
+rather than blocking the loop when the consumer falls behind.
+'''
+import json
+import socket
+import threading
+import time
+from collections import deque
+
+
+JOIN = 'join'
+RESUME = 'resume'
+GAME_START = 'game_start'
+MOVE = 'move'
+UNDO = 'undo'
+WIN = 'win'
+DRAW = 'draw'
+DISCONNECT = 'disconnect'
+GAME_ABANDONED = 'game_abandoned'
+EVENT_KINDS = frozenset((
+    JOIN, RESUME, GAME_START, MOVE, UNDO, WIN, DRAW, DISCONNECT,
+    GAME_ABANDONED,
+))
+
+
+class Event:
+    '''
+    Something that happened in a game. Shared by every subscriber, so must
+    not be changed once published.
+
+    Attrs:
+    kind: str
+        One of EVENT_KINDS.
+
+    sequence: int
+        Position in the buses stream, from 1.
+
+    timestamp: float
+        time.time() it was published.
+
+    fields: dict
+        Details of the event, e.g. the player and column of a move.
+    '''
+    __slots__ = ('kind', 'sequence', 'timestamp', 'fields', '_encoded')
+
+    def __init__(self, kind, sequence, timestamp, fields):
+        if kind not in EVENT_KINDS:
+            raise ValueError(f'Unknown event kind {kind!r}.')
+        self.kind = kind
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.fields = fields
+        self._encoded = None
+
+    @property
+    def encoded(self):
+        '''
+        The event as a JSON line, encoded on first use and then shared.
+
+        Returns:
+            bytes
+        '''
+        if self._encoded is None:
+            self._encoded = json.dumps({
+                'kind': self.kind,
+                'sequence': self.sequence,
+                'timestamp': self.timestamp,
+                **self.fields,
+            }, separators=(',', ':')).encode() + b'\n'
+        return self._encoded
+
+
+class EventBus:
+    '''
+    Delivers events to subscribers, in order, on the publishing thread.
+    Subscribers should return quickly; anything slow belongs behind a
+    StreamSink or a queue of its own. A subscriber raising does not stop
+    the others, or the game.
+    '''
+    def __init__(self):
+        self._subscribers = []
+        self._sequence = 0
+        self.errors = 0
+
+    def subscribe(self, callback, kinds=None):
+        '''
+        Adds a subscriber.
+
+        Args:
+            callback (callable): Called with each Event.
+            kinds (iterable(str)): Kinds to receive. Defaults to all.
+
+        Returns:
+            Subscription to pass to unsubscribe.
+        '''
+        subscription = (callback, frozenset(kinds) if kinds else None)
+        self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        '''
+        Removes a subscriber. Unknown subscriptions are ignored.
+        '''
+        if subscription in self._subscribers:
+            self._subscribers.remove(subscription)
+
+    def publish(self, kind, **fields):
+        '''
+        Publishes an event to every subscriber that wants its kind.
+
+        Args:
+            kind (str): One of EVENT_KINDS.
+            **fields: Details of the event. Must be JSON serialisable.
+
+        Returns:
+            Event: The published event.
+        '''
+        self._sequence += 1
+        event = Event(kind, self._sequence, time.time(), fields)
+        for callback, kinds in self._subscribers:
+            if kinds is not None and kind not in kinds:
+                continue
+            try:
+                callback(event)
+            except Exception as err:
+                self.errors += 1
+                print(f'Event subscriber failed: {err!r}')
+        return event
+
+    def stats(self):
+        '''
+        Returns bus counters, for Metrics.register.
+
+        Returns:
+            dict(str, int)
+        '''
+        return {
+            'published': self._sequence,
+            'subscribers': len(self._subscribers),
+            'errors': self.errors,
+        }
+
+
+def open_stream(target):
+    '''
+    Opens where a StreamSink writes to.
+
+    Args:
+        target (str): unix:///path connects to a Unix socket listening
+            there. Anything else is a file path, appended to.
+
+    Returns:
+        Binary file object.
+    '''
+    if target.startswith('unix://'):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(target[len('unix://'):])
+        stream = sock.makefile('wb')
+        sock.close()  # The file object keeps the connection open.
+        return stream
+    return open(target, 'ab')
+
+
+class StreamSink:
+    '''
+    Subscriber writing encoded events to a stream on a writer thread. At
+    most max_pending events wait to be written; further events are dropped
+    and counted, so a slow or stuck consumer never blocks publishing.
+    '''
+    def __init__(self, stream, max_pending=1024):
+        '''
+        Args:
+            stream: Binary file object, e.g. from open_stream.
+            max_pending (int): Most events waiting to be written.
+        '''
+        self._stream = stream
+        self._max_pending = max_pending
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+        self._writer = threading.Thread(target=self._write_events, daemon=True)
+        self._writer.start()
+
+    def __call__(self, event):
+        with self._condition:
+            if self._closed or len(self._pending) >= self._max_pending:
+                self.dropped += 1
+                return
+            self._pending.append(event.encoded)
+            self._condition.notify()
+
+    def _write_events(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                batch = list(self._pending)
+                self._pending.clear()
+            try:
+                self._stream.writelines(batch)
+                self._stream.flush()
+            except OSError as err:
+                print(f'Event stream failed: {err}')
+                with self._condition:
+                    self._closed = True
+                    self.dropped += len(batch) + len(self._pending)
+                    self._pending.clear()
+                return
+            self.written += len(batch)
+
+    def stats(self):
+        '''
+        Returns sink counters, for Metrics.register.
+
+        Returns:
+            dict(str, int)
+        '''
+        return {
+            'pending': len(self._pending),
+            'written': self.written,
+            'dropped': self.dropped,
+        }
+
+    def close(self):
+        '''Writes any pending events, then closes the stream.'''
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._writer.join()
+        try:
+            self._stream.close()
+        except OSError:
+            pass
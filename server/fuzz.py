@@ -0,0 +1,262 @@
+'''
+Differential fuzzing of board engines. Plays random move sequences through
+the reference GameBoard and a candidate engine side by side, and checks
+they agree on every landing row, win and ColumnFullError. Failing
+sequences are shrunk to a minimal reproduction.
+
+    python -m server.fuzz --engine naive --sequences 1000000
+    python -m server.fuzz --engine mypackage.fast_board:FastBoard
+'''
+import argparse
+import importlib
+import multiprocessing
+import os
+import random
+import time
+
+from server.game_errors import ColumnFullError
+from server.game_logic import COLUMNS, ROWS, WIN_LENGTH, GameBoard
+
+
+class NaiveBoard:
+    '''
+    Deliberately simple engine: a grid of lists, scanned on every drop,
+    sharing no code or tables with GameBoard. Used to check GameBoard.
+    '''
+    def __init__(self):
+        self._grid = [[' '] * COLUMNS for _ in range(ROWS)]
+
+    def insert_piece(self, piece, column):
+        for row in range(ROWS - 1, -1, -1):
+            if self._grid[row][column] == ' ':
+                self._grid[row][column] = piece
+                return self._wins(row, column, piece), row, column
+        raise ColumnFullError(f'Column {column + 1} is already full.')
+
+    def _wins(self, row, column, piece):
+        for row_step, column_step in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            count = 1
+            for sign in (1, -1):
+                next_row = row + row_step * sign
+                next_column = column + column_step * sign
+                while (
+                    0 <= next_row < ROWS and 0 <= next_column < COLUMNS and
+                    self._grid[next_row][next_column] == piece
+                ):
+                    count += 1
+                    next_row += row_step * sign
+                    next_column += column_step * sign
+            if count >= WIN_LENGTH:
+                return True
+        return False
+
+    def is_board_full(self):
+        return all(space != ' ' for space in self._grid[0])
+
+
+ENGINES = {'naive': NaiveBoard, 'gameboard': GameBoard}
+
+
+def load_engine(spec):
+    '''
+    Returns an engine class from a name in ENGINES, or module:Class.
+
+    Args:
+        spec (str): Engine name or import path.
+
+    Returns:
+        type: Engine class, made with no arguments.
+    '''
+    if spec in ENGINES:
+        return ENGINES[spec]
+    module, _, name = spec.partition(':')
+    return getattr(importlib.import_module(module), name)
+
+
+def random_moves(rng, max_moves=80):
+    '''
+    Makes a random sequence of moves, alternating pieces. Some drop into
+    full columns, so ColumnFullError is checked too.
+
+    Args:
+        rng (random.Random): Source of moves.
+        max_moves (int): Longest sequence.
+
+    Returns:
+        list(tuple(str, int)): Piece and zero based column of each move.
+    '''
+    return [
+        (GameBoard.player_pieces[index % 2], rng.randrange(COLUMNS))
+        for index in range(rng.randint(1, max_moves))
+    ]
+
+
+def _play(engine, piece, column):
+    try:
+        return engine.insert_piece(piece, column), engine.is_board_full()
+    except ColumnFullError:
+        return ColumnFullError, engine.is_board_full()
+
+
+def find_mismatch(moves, candidate, reference=GameBoard):
+    '''
+    Plays moves through both engines, and returns where they first differ.
+
+    Args:
+        moves (list(tuple(str, int))): Moves to play.
+        candidate (type): Engine class to check.
+        reference (type): Engine class trusted to be right.
+
+    Returns:
+        str: Description of the first difference, or None if they agree.
+    '''
+    expected_engine, actual_engine = reference(), candidate()
+    for index, (piece, column) in enumerate(moves):
+        expected = _play(expected_engine, piece, column)
+        actual = _play(actual_engine, piece, column)
+        if expected != actual:
+            return (
+                f'Move {index} ({piece} in column {column}): expected '
+                f'{expected}, got {actual}'
+            )
+    return None
+
+
+def minimise(moves, fails):
+    '''
+    Shrinks a failing move sequence by delta debugging: removes ever smaller
+    chunks of moves while the sequence still fails.
+
+    Args:
+        moves (list(tuple(str, int))): Failing moves.
+        fails (callable): Returns True if a sequence still fails.
+
+    Returns:
+        list(tuple(str, int)): A failing sequence from which no single
+            chunk of the last size tried can be removed.
+    '''
+    chunks = 2
+    while len(moves) >= 2:
+        size = max(1, len(moves) // chunks)
+        for start in range(0, len(moves), size):
+            candidate = moves[:start] + moves[start + size:]
+            if candidate and fails(candidate):
+                moves = candidate
+                chunks = max(chunks - 1, 2)
+                break
+        else:
+            if size == 1:
+                break
+            chunks = min(chunks * 2, len(moves))
+    return moves
+
+
+def fuzz_batch(engine_spec, seed, sequences, max_moves=80):
+    '''
+    Checks a batch of random sequences. Runs in pool workers.
+
+    Args:
+        engine_spec (str): Candidate engine, for load_engine.
+        seed (int): Seed of the batch.
+        sequences (int): Number of sequences to check.
+        max_moves (int): Longest sequence.
+
+    Returns:
+        tuple(int, list, str): Sequences checked, and the first failing
+            sequence and its mismatch, or None and None.
+    '''
+    candidate = load_engine(engine_spec)
+    rng = random.Random(seed)
+    for checked in range(1, sequences + 1):
+        moves = random_moves(rng, max_moves)
+        mismatch = find_mismatch(moves, candidate)
+        if mismatch is not None:
+            return checked, moves, mismatch
+    return sequences, None, None
+
+
+def _fuzz_batch(args):
+    return fuzz_batch(*args)
+
+
+def run_fuzz(engine_spec, sequences, workers=None, seed=0, batch_size=1000,
+             max_moves=80):
+    '''
+    Checks random sequences across worker processes until one fails or all
+    pass, then shrinks the failure.
+
+    Args:
+        engine_spec (str): Candidate engine, for load_engine.
+        sequences (int): Number of sequences to check.
+        workers (int): Worker processes. Defaults to one per core. 1 runs
+            in this process.
+        seed (int): Seed of the first batch.
+        batch_size (int): Sequences per batch handed to a worker.
+        max_moves (int): Longest sequence.
+
+    Returns:
+        tuple(int, list, str): Sequences checked, and the minimised failing
+            sequence and its mismatch, or None and None.
+    '''
+    candidate = load_engine(engine_spec)
+    batches = [
+        (engine_spec, seed + index, min(batch_size, sequences - start),
+         max_moves)
+        for index, start in enumerate(range(0, sequences, batch_size))
+    ]
+    workers = workers or os.cpu_count()
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    checked, failure = 0, None
+    try:
+        results = (
+            map(_fuzz_batch, batches) if pool is None
+            else pool.imap_unordered(_fuzz_batch, batches)
+        )
+        for batch_checked, moves, _ in results:
+            checked += batch_checked
+            if moves is not None:
+                failure = moves
+                break
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    if failure is None:
+        return checked, None, None
+    failure = minimise(
+        failure, lambda moves: find_mismatch(moves, candidate) is not None
+    )
+    return checked, failure, find_mismatch(failure, candidate)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='server.fuzz')
+    parser.add_argument(
+        '--engine', default='naive',
+        help='naive, gameboard, or module:Class of an engine to check',
+    )
+    parser.add_argument('--sequences', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-moves', type=int, default=80)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    checked, moves, mismatch = run_fuzz(
+        args.engine, args.sequences, args.workers, args.seed,
+        max_moves=args.max_moves,
+    )
+    elapsed = time.perf_counter() - started
+    print(
+        f'Checked {checked} sequences in {elapsed:.1f}s '
+        f'({checked / elapsed:.0f}/s)'
+    )
+    if moves is not None:
+        print(f'Mismatch: {mismatch}')
+        print(f'Minimal sequence: {moves}')
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
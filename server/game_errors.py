@@ -3,3 +3,26 @@ class ColumnFullError(IndexError):
     Raised if a user tries to insert a game piece in a column that is full.
     '''
     pass
+
+
+class NoMoveError(IndexError):
+    '''
+    Raised if there is no move to undo or redo.
+    '''
+    pass
+
+
+class SpaceTakenError(IndexError):
+    '''
+    Raised if a user tries to place a game piece on a space that already
+    holds one, or is off the board.
+    '''
+    pass
+
+
+class InvalidMoveError(ValueError):
+    '''
+    Raised if a move is written in a form the rules do not accept, e.g. a
+    column number past the edge of the board.
+    '''
+    pass
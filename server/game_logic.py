@@ -1,14 +1,201 @@
-from server.game_errors import ColumnFullError
+import random
 
+from server.game_errors import ColumnFullError, NoMoveError, SpaceTakenError
 
-class GameBoard:
+
+ROWS = 6
+COLUMNS = 9
+WIN_LENGTH = 5
+
+EMPTY_BOARD = b' ' * (ROWS * COLUMNS)
+EMPTY_CODE = ord(' ')
+
+HORIZONTAL = 'horizontal'
+VERTICAL = 'vertical'
+POSITIVE_DIAGONAL = 'positive diagonal'
+NEGATIVE_DIAGONAL = 'negative diagonal'
+DIRECTIONS = {
+    HORIZONTAL: (0, 1),
+    VERTICAL: (1, 0),
+    POSITIVE_DIAGONAL: (1, -1),
+    NEGATIVE_DIAGONAL: (1, 1),
+}
+
+
+def build_win_lines(rows, columns, win_length):
+    '''
+    Lists every line of spaces on a board that would win the game if filled
+    by one player.
+
+    Args:
+        rows (int): Number of rows on the board.
+        columns (int): Number of columns on the board.
+        win_length (int): Number of pieces in a row needed to win.
+
+    Returns:
+        tuple(tuple(tuple(int, int))): The (row, column) spaces in each line.
+        tuple(str): The direction of each line.
+    '''
+    lines = []
+    directions = []
+    for direction, (row_step, column_step) in DIRECTIONS.items():
+        for row in range(rows):
+            for column in range(columns):
+                end_row = row + row_step * (win_length - 1)
+                end_column = column + column_step * (win_length - 1)
+                if not (0 <= end_row < rows and 0 <= end_column < columns):
+                    continue
+                lines.append(tuple(
+                    (row + row_step * i, column + column_step * i)
+                    for i in range(win_length)
+                ))
+                directions.append(direction)
+    return tuple(lines), tuple(directions)
+
+
+def build_cell_lines(rows, columns, win_lines):
+    '''
+    Maps every space on a board to the win lines that pass through it.
+
+    Args:
+        rows (int): Number of rows on the board.
+        columns (int): Number of columns on the board.
+        win_lines (tuple): Win lines from build_win_lines.
+
+    Returns:
+        tuple(tuple(tuple(int))): Indexed by row then column, the index of
+            every line in win_lines through that space.
     '''
-    Class to represent the game board.
+    cell_lines = [[[] for _ in range(columns)] for _ in range(rows)]
+    for line, spaces in enumerate(win_lines):
+        for row, column in spaces:
+            cell_lines[row][column].append(line)
+    return tuple(
+        tuple(tuple(lines) for lines in row) for row in cell_lines
+    )
+
+
+ZOBRIST_SEED = 0x5A0B1257
+
+
+class BoardGeometry:
+    '''
+    Size of a board and the number in a row that wins, with every lookup
+    table a board needs, built once so moves never work out line positions.
+    Boards of the same geometry share one instance.
 
     Attrs:
-    _game_board: list(list(str))
-        Stores the games state, with a character representing
-        a game piece or an empty space.
+    rows, columns, win_length, size: int
+        Board dimensions, pieces in a row to win, and number of spaces.
+
+    empty: bytes
+        An empty board, row by row.
+
+    win_lines, line_directions, cell_lines:
+        From build_win_lines and build_cell_lines.
+
+    zobrist_keys: tuple(tuple(int), tuple(int))
+        Random 64 bit key for each player in each space, fixed by the seed
+        so hashes match between processes, e.g. in a position book file.
+
+    mirror_spaces: tuple(int)
+        Each space's partner in the left-right mirror image of the board.
+    '''
+    def __init__(self, rows, columns, win_length):
+        self.rows = rows
+        self.columns = columns
+        self.win_length = win_length
+        self.size = rows * columns
+        self.empty = b' ' * self.size
+        self.win_lines, self.line_directions = build_win_lines(
+            rows, columns, win_length
+        )
+        self.cell_lines = build_cell_lines(rows, columns, self.win_lines)
+        zobrist_random = random.Random(ZOBRIST_SEED)
+        self.zobrist_keys = tuple(
+            tuple(zobrist_random.getrandbits(64) for _ in range(self.size))
+            for _ in range(2)
+        )
+        self.mirror_spaces = tuple(
+            row * columns + columns - 1 - column
+            for row in range(rows) for column in range(columns)
+        )
+
+
+# The five in a row board. Its tables are also module constants, used by
+# the solver and position book, which only play this geometry.
+STANDARD_GEOMETRY = BoardGeometry(ROWS, COLUMNS, WIN_LENGTH)
+WIN_LINES = STANDARD_GEOMETRY.win_lines
+LINE_DIRECTIONS = STANDARD_GEOMETRY.line_directions
+CELL_LINES = STANDARD_GEOMETRY.cell_lines
+ZOBRIST_KEYS = STANDARD_GEOMETRY.zobrist_keys
+MIRROR_SPACES = STANDARD_GEOMETRY.mirror_spaces
+
+
+def zobrist_hash(spaces, pieces=('x', 'o'), geometry=STANDARD_GEOMETRY):
+    '''
+    Works out the Zobrist hash of a board from scratch. GameBoard keeps its
+    hash up to date as pieces drop, so this is for checking it.
+
+    Args:
+        spaces (bytes): The board row by row, as from GameBoard.spaces.
+        pieces (tuple(str, str)): Each players piece.
+        geometry (BoardGeometry): Size of the board.
+
+    Returns:
+        int: Hash of the board.
+        int: Hash of the board's left-right mirror image.
+    '''
+    codes = [ord(piece) for piece in pieces]
+    board_hash = mirror_hash = 0
+    for space, code in enumerate(spaces):
+        if code in codes:
+            keys = geometry.zobrist_keys[codes.index(code)]
+            board_hash ^= keys[space]
+            mirror_hash ^= keys[geometry.mirror_spaces[space]]
+    return board_hash, mirror_hash
+
+
+class Board:
+    '''
+    State shared by every kind of board: the spaces, the piece counts of
+    each win line, and the hashes. Moves are made by a subclass, which
+    decides how a piece reaches its space, so Board itself has no way to
+    play one.
+
+    Uses __slots__ and bytearrays rather than lists of strings, so an idle
+    board takes a few hundred bytes.
+
+    Attrs:
+    _geometry: BoardGeometry
+        Size of the board and its lookup tables.
+
+    _game_board: bytearray
+        Stores the games state row by row, with a character code
+        representing a game piece or an empty space.
+
+    _line_counts: bytearray
+        Number of each players pieces in every line of WIN_LINES, the first
+        player's counts followed by the second's. Updated on each move, so
+        a win is found without scanning the board.
+
+    _move_count: int
+        Number of pieces on the board.
+
+    _hash: int
+        64 bit Zobrist hash of the board, updated on each move.
+
+    _mirror_hash: int
+        Zobrist hash of the board's left-right mirror image, updated on
+        each move.
+
+    _moves: bytearray
+        Each move played, in order, a byte each, as the subclass records
+        it.
+
+    _undone: bytearray
+        Piece code and move of each undone move, most recent last, for
+        redo. Cleared when a new move is played.
 
     Methods:
     game_board(): str
@@ -17,15 +204,35 @@ class GameBoard:
     is_board_full(): bool
         Returns True if all board spaces have a piece in them.
 
-    insert_piece(piece: str, column: int): bool, int, int
-        insert a game piece at the specified column.
+    canonical_key(): int
+        Returns the smaller of the board and mirror image hashes.
+
+    copy(): Board
+        Returns an independent copy of the board.
     '''
-    def __init__(self):
+    __slots__ = (
+        '_geometry', '_game_board', '_line_counts', '_move_count', '_hash',
+        '_mirror_hash', '_moves', '_undone',
+    )
+
+    player_pieces = ('x', 'o')
+
+    def __init__(self, geometry=STANDARD_GEOMETRY):
         '''
-        Creates a new GameBoard, and generates an empty 6 * 9 2D array.
+        Creates an empty board, 6 * 9 with five in a row to win unless
+        another geometry is given.
+
+        Args:
+            geometry (BoardGeometry): Board size and win length.
         '''
-        self.player_pieces = ['x', 'o']
-        self._game_board = [[' ' for _ in range(9)] for _ in range(6)]
+        self._geometry = geometry
+        self._game_board = bytearray(geometry.empty)
+        self._line_counts = bytearray(len(geometry.win_lines) * 2)
+        self._move_count = 0
+        self._hash = 0
+        self._mirror_hash = 0
+        self._moves = bytearray()
+        self._undone = bytearray()
 
     @property
     def game_board(self):
@@ -35,128 +242,136 @@ class GameBoard:
         Returns:
             str
         '''
+        columns = self._geometry.columns
         output = ''
-        for row in self._game_board:
-            for space in row:
-                output = f'{output}[ {space} ] '
+        for row in range(self._geometry.rows):
+            for space in self._game_board[row * columns:(row + 1) * columns]:
+                output = f'{output}[ {chr(space)} ] '
             output = f'{output}\n'
         return output
 
-    def reset_game(self):
-        '''Clears the game board for a new game.'''
-        self._game_board = [[' ' for _ in range(9)] for _ in range(6)]
+    @property
+    def geometry(self):
+        '''
+        Returns the size of the board and its lookup tables.
 
-    def _is_column_full(self, column):
+        Returns:
+            BoardGeometry
         '''
-        Returns True if the first space in the column is filled, else False.
+        return self._geometry
+
+    @property
+    def spaces(self):
         '''
-        return self._game_board[0][column] != ' '
+        Returns the board row by row, one character code per space.
 
-    def _is_vertical_match(self, column, piece):
+        Returns:
+            bytes
         '''
-        Checks the first two rows of a column for the specified piece.
-        If found, will check rest of the column. If another piece type is found
-        it will return False, else True.
-        If not found, will return False.
+        return bytes(self._game_board)
+
+    @property
+    def move_count(self):
         '''
-        for row in range(2):
-            if self._game_board[row][column] == piece:
-                for i in range(row, row + 5):
-                    if self._game_board[i][column] != piece:
-                        return False
-                return True  # Found 5!
+        Returns the number of pieces on the board.
 
-        return False
-        # Since there's only 6 spaces, no need to continue the loop.
+        Returns:
+            int
+        '''
+        return self._move_count
 
-    def _is_horizontal_match(self, row, piece):
+    @property
+    def zobrist_hash(self):
         '''
-        Checks the first 5 columns of a row for the specified piece.
-        If found, will check rest of the row. If another piece type is found
-        it will return False, else True.
-        If not found, will return False.
+        Returns the boards 64 bit Zobrist hash.
+
+        Returns:
+            int
         '''
-        for col in range(5):
-            if self._game_board[row][col] == piece:
-                for i in range(col, col + 5):
-                    if self._game_board[row][i] != piece:
-                        return False
-                return True  # Found 5!
+        return self._hash
 
-        return False
-        # Since there's only 9 spaces, no need to continue the loop.
+    @property
+    def mirror_hash(self):
+        '''
+        Returns the Zobrist hash of the board's left-right mirror image.
 
-    def _is_positive_diagonal_match(self, row, column, piece):
+        Returns:
+            int
         '''
-        First checks if the specified row and column can result in a postive
-        diagonal victory If not, returns False.
-        If yes, starts at top right of board and and iterates towards bottom
-        left, through the specified piece.
-        If 5 in a row are found, return True, else return False.
+        return self._mirror_hash
+
+    @property
+    def moves(self):
         '''
-        if (row < 4 and column < 4) or (row > 2 and column > 4):
-            return False  # All can only reach 4 in a row
+        Returns each move played, in order.
 
-        diag_column = column + row
-        diag_column = diag_column - 1 if diag_column > 8 else diag_column
-        # Prevents index errors, and does not cause logic errors.
+        Returns:
+            bytes: Zero based columns on a GameBoard, space indexes on a
+                PlacementBoard.
+        '''
+        return bytes(self._moves)
 
-        for diag_row in range(2):
-            if self._game_board[diag_row][diag_column] == piece:
-                for i, j in zip(
-                    range(diag_row, diag_row + 5),
-                    range(diag_column, diag_column - 5, -1)
-                ):
-                    if self._game_board[i][j] != piece:
-                        return False
-                return True
+    def canonical_key(self):
+        '''
+        Returns a key that is the same for the board and its mirror image,
+        as they play the same way.
 
-        return False
+        Returns:
+            int
+        '''
+        return min(self._hash, self._mirror_hash)
 
-    def _is_negative_diagonal_match(self, row, column, piece):
+    def copy(self):
         '''
-        First checks if the specified row and column can result in a negative
-        diagonal victory If not, returns False.
-        If yes, starts at top left of board and and iterates towards bottom
-        right, through the specified piece.
-        If 5 in a row are found, return True, else return False.
+        Returns an independent copy of the board, e.g. for a search to play
+        moves on.
+
+        Returns:
+            Board: Of the same type as this one.
         '''
-        if (row > 1 and column < 4) or (row < 4 and column > 4):
-            return False  # All can only reach 4 in a row
+        board = type(self).__new__(type(self))
+        board._geometry = self._geometry
+        board._game_board = bytearray(self._game_board)
+        board._line_counts = bytearray(self._line_counts)
+        board._move_count = self._move_count
+        board._hash = self._hash
+        board._mirror_hash = self._mirror_hash
+        board._moves = bytearray(self._moves)
+        board._undone = bytearray(self._undone)
+        return board
 
-        diag_column = column - row
-        diag_column = diag_column + 1 if diag_column < 0 else diag_column
+    def reset_game(self):
+        '''Clears the game board for a new game.'''
+        self._game_board[:] = self._geometry.empty
+        self._line_counts[:] = bytes(len(self._line_counts))
+        self._move_count = 0
+        self._hash = 0
+        self._mirror_hash = 0
+        self._moves.clear()
+        self._undone.clear()
 
-        for diag_row in range(2):
-            if self._game_board[diag_row][diag_column] == piece:
-                for i, j in zip(
-                    range(diag_row, diag_row + 5),
-                    range(diag_column, diag_column + 5)
-                ):
-                    if self._game_board[i][j] != piece:
-                        return False
-                return True
+    def is_board_full(self):
+        '''
+        Checks if all spaces on board are filled.
 
-        return False
+        Returns:
+            bool: True if all spaces are filled, False if not.
+        '''
+        return self._move_count == self._geometry.size
 
-    def _drop_piece(self, piece, column):
+    def _line_offset(self, piece):
         '''
-        Moves piece down column until it meets an filled space, then places
-        piece in last empty space.
+        Returns where the pieces counts start in _line_counts.
         '''
-        for row in range(len(self._game_board)):
-            if self._game_board[row][column] != ' ':
-                self._game_board[row - 1][column] = piece
-                return row - 1, column
-
-        # if we get here, the whole column is empty,
-        # so drop to the bottom of the column.
-        self._game_board[5][column] = piece
-        return 5, column
+        return (
+            len(self._geometry.win_lines)
+            if piece == self.player_pieces[1] else 0
+        )
 
     def _is_winning_move(self, row, column, piece):
         '''
-        Calls all match functions and returns if the user made a winning move.
+        Returns if the user made a winning move, using the piece counts of
+        every win line through the space the piece landed in.
 
         Args:
             row (int): The row the piece landed.
@@ -166,24 +381,128 @@ class GameBoard:
         Returns:
             bool: True if a wining move was made, False if not.
         '''
-        return (
-            self._is_horizontal_match(row, piece) or
-            self._is_vertical_match(column, piece) or
-            self._is_positive_diagonal_match(row, column, piece) or
-            self._is_negative_diagonal_match(row, column, piece)
+        offset = self._line_offset(piece)
+        win_length = self._geometry.win_length
+        return any(
+            self._line_counts[offset + line] == win_length
+            for line in self._geometry.cell_lines[row][column]
         )
 
-    def is_board_full(self):
+
+class GameBoard(Board):
+    '''
+    Board where pieces drop down a column to the lowest empty space.
+
+    Attrs:
+    _column_heights: bytearray
+        Number of pieces in each column.
+
+    _moves: bytearray
+        Column of each move played, in order. The piece is read back from
+        the top of the column, so undoing needs nothing else.
+
+    Methods:
+    insert_piece(piece: str, column: int): bool, int, int
+        insert a game piece at the specified column.
+
+    undo_move(): str, int
+        Takes back the last move.
+
+    redo_move(): bool, int, int
+        Plays the last undone move again.
+
+    legal_columns(): list(int)
+        Returns the columns that are not full.
+    '''
+    __slots__ = ('_column_heights',)
+
+    def __init__(self, geometry=STANDARD_GEOMETRY):
         '''
-        Checks if all spaces on board are filled.
+        Creates a new GameBoard, and generates an empty board, 6 * 9 with
+        five in a row to win unless another geometry is given.
+
+        Args:
+            geometry (BoardGeometry): Board size and win length.
+        '''
+        super().__init__(geometry)
+        self._column_heights = bytearray(geometry.columns)
+
+    def copy(self):
+        '''
+        Returns an independent copy of the board, e.g. for a search to play
+        moves on.
 
         Returns:
-            bool: True if all spaces are filled, False if not.
+            GameBoard
         '''
-        for i in range(len(self._game_board[0])):
-            if self._game_board[0][i] == ' ':
-                return False
-        return True
+        board = super().copy()
+        board._column_heights = bytearray(self._column_heights)
+        return board
+
+    def reset_game(self):
+        '''Clears the game board for a new game.'''
+        super().reset_game()
+        self._column_heights[:] = bytes(len(self._column_heights))
+
+    def legal_columns(self):
+        '''
+        Returns the columns a piece can be dropped in.
+
+        Returns:
+            list(int): Zero based column numbers.
+        '''
+        return [
+            column for column in range(self._geometry.columns)
+            if not self._is_column_full(column)
+        ]
+
+    def _is_column_full(self, column):
+        '''
+        Returns True if the column holds as many pieces as there are rows,
+        else False.
+        '''
+        return self._column_heights[column] == self._geometry.rows
+
+    def _drop_piece(self, piece, column):
+        '''
+        Places piece in the lowest empty space of the column, found from the
+        column height.
+        '''
+        geometry = self._geometry
+        landing_row = geometry.rows - 1 - self._column_heights[column]
+        self._column_heights[column] += 1
+        self._move_count += 1
+
+        space = landing_row * geometry.columns + column
+        self._game_board[space] = ord(piece)
+        keys = geometry.zobrist_keys[piece == self.player_pieces[1]]
+        self._hash ^= keys[space]
+        self._mirror_hash ^= keys[geometry.mirror_spaces[space]]
+        offset = self._line_offset(piece)
+        for line in geometry.cell_lines[landing_row][column]:
+            self._line_counts[offset + line] += 1
+        return landing_row, column
+
+    def _lift_piece(self, column):
+        '''
+        Removes the top piece of the column, reversing _drop_piece.
+        Returns the piece.
+        '''
+        geometry = self._geometry
+        self._column_heights[column] -= 1
+        self._move_count -= 1
+        row = geometry.rows - 1 - self._column_heights[column]
+
+        space = row * geometry.columns + column
+        piece = chr(self._game_board[space])
+        self._game_board[space] = geometry.empty[space]
+        keys = geometry.zobrist_keys[piece == self.player_pieces[1]]
+        self._hash ^= keys[space]
+        self._mirror_hash ^= keys[geometry.mirror_spaces[space]]
+        offset = self._line_offset(piece)
+        for line in geometry.cell_lines[row][column]:
+            self._line_counts[offset + line] -= 1
+        return piece
 
     def insert_piece(self, piece, column):
         '''
@@ -200,5 +519,180 @@ class GameBoard:
                 f'Column {column + 1} is already full. '
                 'Please select another column'
             )
+        if self._undone:
+            self._undone.clear()
+        self._moves.append(column)
+        row, column = self._drop_piece(piece, column)
+        return self._is_winning_move(row, column, piece), row, column
+
+    def undo_move(self):
+        '''
+        Takes back the last move, restoring every part of the board state.
+        Raises a NoMoveError if no moves have been played.
+
+        Returns:
+            str: The piece that was taken back.
+            int: The column it was taken from.
+        '''
+        if not self._moves:
+            raise NoMoveError('There is no move to take back.')
+        column = self._moves.pop()
+        piece = self._lift_piece(column)
+        self._undone += bytes((ord(piece), column))
+        return piece, column
+
+    def redo_move(self):
+        '''
+        Plays the last undone move again. Raises a NoMoveError if there is
+        none.
+
+        Returns:
+            bool: True if the move was a winning move, False if not.
+            int: The row of the game piece.
+            int: the column of the game piece.
+        '''
+        if not self._undone:
+            raise NoMoveError('There is no move to redo.')
+        column = self._undone.pop()
+        piece = chr(self._undone.pop())
+        self._moves.append(column)
         row, column = self._drop_piece(piece, column)
         return self._is_winning_move(row, column, piece), row, column
+
+
+class PlacementBoard(Board):
+    '''
+    Board where pieces are placed on any empty space rather than dropped
+    down a column, as in gomoku. Records each move as a space index.
+
+    Methods:
+    place_piece(piece: str, row: int, column: int): bool, int, int
+        Places a game piece on an empty space.
+
+    legal_spaces(): list(tuple(int, int))
+        Returns the empty spaces.
+    '''
+    __slots__ = ()
+
+    def __init__(self, geometry):
+        '''
+        Args:
+            geometry (BoardGeometry): Board size and win length. At most
+                256 spaces, as moves are stored a byte each.
+        '''
+        if geometry.size > 256:
+            raise ValueError('A placement board has at most 256 spaces.')
+        super().__init__(geometry)
+
+    @property
+    def game_board(self):
+        '''
+        Returns the board for players, compactly with a letter heading each
+        column and a number on each row, as large boards would not fit in
+        one message drawn like GameBoard.
+
+        Returns:
+            str
+        '''
+        columns = self._geometry.columns
+        letters = ' '.join(chr(ord('a') + column) for column in range(columns))
+        lines = [f'   {letters}']
+        for row in range(self._geometry.rows):
+            spaces = self._game_board[row * columns:(row + 1) * columns]
+            lines.append(f'{row + 1:2} ' + ' '.join(
+                '.' if code == EMPTY_CODE else chr(code) for code in spaces
+            ))
+        return '\n'.join(lines) + '\n'
+
+    def legal_spaces(self):
+        '''
+        Returns the spaces a piece can be placed on.
+
+        Returns:
+            list(tuple(int, int)): Zero based row and column of each.
+        '''
+        columns = self._geometry.columns
+        return [
+            divmod(space, columns)
+            for space, code in enumerate(self._game_board)
+            if code == EMPTY_CODE
+        ]
+
+    def place_piece(self, piece, row, column):
+        '''
+        Places the piece on the space, if it is on the board and empty. If
+        not, raises a SpaceTakenError.
+
+        Returns:
+            bool: True if this move was a winning move, False if not.
+            int: The row of the game piece.
+            int: the column of the game piece.
+        '''
+        geometry = self._geometry
+        if not (0 <= row < geometry.rows and 0 <= column < geometry.columns):
+            raise SpaceTakenError('That space is not on the board.')
+        space = row * geometry.columns + column
+        if self._game_board[space] != EMPTY_CODE:
+            raise SpaceTakenError(
+                'That space is already taken. Please select another space'
+            )
+        if self._undone:
+            self._undone.clear()
+        self._moves.append(space)
+        self._set_space(piece, space)
+        return self._is_winning_move(row, column, piece), row, column
+
+    def _set_space(self, piece, space):
+        '''
+        Puts piece on the space, or clears it if piece is None, updating
+        the line counts and hashes. Returns the piece that was there.
+        '''
+        geometry = self._geometry
+        row, column = divmod(space, geometry.columns)
+        previous = chr(self._game_board[space])
+        placed = piece or previous
+        change = 1 if piece else -1
+        self._game_board[space] = ord(piece) if piece else EMPTY_CODE
+        self._move_count += change
+        keys = geometry.zobrist_keys[placed == self.player_pieces[1]]
+        self._hash ^= keys[space]
+        self._mirror_hash ^= keys[geometry.mirror_spaces[space]]
+        offset = self._line_offset(placed)
+        for line in geometry.cell_lines[row][column]:
+            self._line_counts[offset + line] += change
+        return previous
+
+    def undo_move(self):
+        '''
+        Takes back the last move. Raises a NoMoveError if no moves have
+        been played.
+
+        Returns:
+            str: The piece that was taken back.
+            int: The space index it was taken from.
+        '''
+        if not self._moves:
+            raise NoMoveError('There is no move to take back.')
+        space = self._moves.pop()
+        piece = self._set_space(None, space)
+        self._undone += bytes((ord(piece), space))
+        return piece, space
+
+    def redo_move(self):
+        '''
+        Plays the last undone move again. Raises a NoMoveError if there is
+        none.
+
+        Returns:
+            bool: True if the move was a winning move, False if not.
+            int: The row of the game piece.
+            int: the column of the game piece.
+        '''
+        if not self._undone:
+            raise NoMoveError('There is no move to redo.')
+        space = self._undone.pop()
+        piece = chr(self._undone.pop())
+        self._moves.append(space)
+        self._set_space(piece, space)
+        row, column = divmod(space, self._geometry.columns)
+        return self._is_winning_move(row, column, piece), row, column
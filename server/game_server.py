@@ -1,51 +1,326 @@
+import os
 import select
 import socket
-import queue
+import time
+from collections import OrderedDict, deque
 
-from server.game_logic import GameBoard
-from server.game_errors import ColumnFullError
+from common import protocol
+from common.transport import MessageSocket, Transport, parse_listeners
+from server import events
+from server.clock import TurnClock
+from server.handoff import send_listeners
+from server.load import BUSY_MESSAGE, LoadMonitor
+from server.events import EventBus
+from server.game_errors import (
+    ColumnFullError, InvalidMoveError, SpaceTakenError,
+)
+from server.metrics import Metrics
+from server.rate_limit import RateLimiter
+from server.rules import DEFAULT_RULES, make_rules
+from server.scheduler import Scheduler
+from server.session import Session
+from server.websocket import WebSocketConnection, WebSocketError
+
+
+HINTS_BUSY_MESSAGE = 'Too many hints are being worked out. Try again soon.'
+
+
+def _ignore_lap(phase):
+    '''Stands in for Profiler.lap when there is no profiler.'''
 
 
 class GameServer:
-    def __init__(self, host, port):
+    def __init__(
+        self, host, port, reconnect_grace=10, max_parked=16, transport=None,
+        listeners=None, websocket_listeners=None, websocket_ping_interval=20,
+        max_message_size=1024, message_rate=10, message_burst=20,
+        ip_message_rate=50, ip_message_burst=100, max_queued_messages=64,
+        max_strikes=20, turn_time=0, turn_increment=0, idle_timeout=15,
+        ratings=None, analyzer=None, metrics=None, reuse_port=False,
+        handoff_path=None, inherited_listeners=None, drain_timeout=300,
+        coordinator=None, node_id=None, advertise_address=None,
+        event_bus=None, profiler=None, rules=DEFAULT_RULES, shed_lag=0,
+        shed_recover_lag=None, lag_smoothing=0.2,
+    ):
         '''
         Server for the five in a row game.
 
         Args:
             host (str): The IPv4 address to use for hosting.
             port (int): Port to use on host IP.
+            reconnect_grace (float): Seconds a dropped players seat is held
+                for them to resume. 0 ends the game straight away.
+            max_parked (int): Most dropped sessions held at once.
+            transport (common.transport.Transport): How connections are
+                made, e.g. plain TCP or TLS. Defaults to plain TCP.
+            listeners (list(str) or str): Listener URLs, e.g.
+                tcp://0.0.0.0:8080, tcp://[::]:8080 or unix:///tmp/game.sock.
+                Defaults to tcp on host and port.
+            websocket_listeners (list(str) or str): Listener URLs for
+                browser clients speaking WebSocket.
+            websocket_ping_interval (float): Seconds between keepalive pings
+                to WebSocket clients. Clients silent for two intervals are
+                disconnected.
+            max_message_size (int): Largest message accepted, in bytes.
+            message_rate (float): Messages per second each connection may
+                send, on average.
+            message_burst (int): Messages a connection may send at once.
+            ip_message_rate (float): Messages and new connections per second
+                from each IP address, on average. Not applied to Unix socket
+                clients, which have no address.
+            ip_message_burst (int): Messages and new connections an IP
+                address may send at once.
+            max_queued_messages (int): Most messages waiting to be sent to a
+                client. Clients that let more build up are disconnected.
+            max_strikes (int): Oversized or rate limited messages a client
+                may send before it is disconnected.
+            turn_time (float): Seconds on each players clock at the start of
+                a game. A player who runs out loses. 0 turns clocks off.
+            turn_increment (float): Seconds added to a players clock after
+                each move.
+            idle_timeout (float): Seconds without any client activity before
+                the server shuts down.
+            ratings (.ratings.RatingStore): Where finished games are rated.
+                Ratings are off if None.
+            analyzer (.analysis.Analyzer): Answers the hint command. Hints
+                are off if None.
+            metrics (.metrics.Metrics): Counters for the stats command.
+            reuse_port (bool): Set SO_REUSEPORT on TCP listeners, so a new
+                server can bind the same port before this one drains.
+            handoff_path (str): Unix socket path a new server connects to
+                to take over the listeners, after which this one drains.
+            inherited_listeners (tuple(list, list)): Listening sockets taken
+                over from a running server, for game and WebSocket clients,
+                used instead of binding new ones.
+            drain_timeout (float): Longest a drain waits for the game in
+                progress to finish, in seconds.
+            coordinator (.cluster.Coordinator): Registry of nodes that
+                routes rooms between them. This server registers with it,
+                and redirects clients asking for rooms other nodes own.
+                Rooms are off if None.
+            node_id (str): Name of this node to the coordinator. Defaults
+                to host:port.
+            advertise_address (str): host:port clients are redirected to
+                for rooms this node owns. Defaults to host:port.
+            event_bus (.events.EventBus): Where game events are published,
+                e.g. for a StreamSink.
+            profiler (.profiling.Profiler): Times the phases of each loop
+                pass while it is enabled, and writes its stacks every
+                dump_interval seconds.
+            rules (str): Game variant played, a name in .rules.RULES.
+                Hints are only given for variants the solver knows.
+            shed_lag (float): Average seconds each loop pass spends
+                working at which new connections and joins are refused
+                with a busy reply, so matches in progress keep the loop.
+                0 never refuses.
+            shed_recover_lag (float): Average lag, in seconds, at which
+                the server accepts new work again. Defaults to half of
+                shed_lag.
+            lag_smoothing (float): Weight of each loop pass in the average
+                lag, between 0 and 1.
 
         Attributes:
-            _server (socket.socket): main socket all clients connect to.
+            _server (socket.socket): First listening socket.
+            _listeners (list(socket.socket)): Every listening socket, all
+                served by the same select loop.
             _host (str): IPv4 addrss of server
             _port (int): Port server accept connections from
             _inputs (list(socket.socket)): Sockets which send messages.
             _outputs (list(socket.socket)): Sockets awaiting a response.
-            _message_queues (dict(queue.Queue)): A dict storing messages
-                waiting to be sent to clients.
+            _message_queues (dict(collections.deque)): A dict storing
+                messages waiting to be sent to clients. Plain deques, as
+                everything runs on one thread and needs no locking.
             _connected_clients (int): Total number of connected clients.
                 Limited to two.
             _client_names: Name each client submitted when first connecting.
             _active_player: Current client that can control the game.
-            _timeout_count: Counter to determine how many ticks have occurred
-                since last client command.
-            _game (.game_logic.GameBoard): The game board and logic.
+            _last_activity (float): time.monotonic() of the last socket
+                event, for the idle shutdown.
+            _rules (.rules.RulesEngine): Reads and plays moves.
+            _game (.game_logic.Board): The rules engines board.
+            _sessions (dict(socket.socket, .session.Session)): Session of
+                each named, connected client.
+            _parked_sessions (OrderedDict(str, .session.Session)): Sessions
+                of dropped clients by token, oldest first.
+            _transport (common.transport.Transport): Makes connections.
+            _handshaking (set(socket.socket)): Connections still doing a
+                transport handshake, e.g. TLS.
+            _websocket_listeners (list(socket.socket)): Listening sockets
+                for WebSocket clients. Also in _listeners.
+            _websockets (dict(socket.socket, .websocket.WebSocketConnection)):
+                Protocol state of each WebSocket client.
+            _connection_limiter (.rate_limit.RateLimiter): Message rate limit
+                per connection.
+            _ip_limiter (.rate_limit.RateLimiter): Message and connection
+                rate limit per IP address.
+            _peer_ips (dict(socket.socket, str)): IP address of each client,
+                None for Unix socket clients.
+            _strikes (dict(socket.socket, int)): Rejected messages from each
+                client.
+            _overflowing (set(socket.socket)): Clients whose message queue is
+                full, to be disconnected at the end of the loop pass.
+            _scheduler (.scheduler.Scheduler): Deadlines run by the loop, for
+                turn clocks and parked sessions.
+            _clock (.clock.TurnClock): The games turn clock, or None if
+                clocks are off.
+            _flag_timer (.scheduler.Timer): Scheduled flag fall of the
+                player on move.
+            _ratings (.ratings.RatingStore): Player ratings, or None.
+            _analyzer (.analysis.Analyzer): Finds hints, or None.
+            _wake_reader (socket.socket): Read end of a socket pair that
+                analysis threads write to, to wake the loop. None if hints
+                are off.
+            _finished_analyses (collections.deque): Hints ready to send, as
+                (socket, move count when asked, (column, score)).
+            _metrics (.metrics.Metrics): Counters for the stats command.
+            _undo_request (int): Index of the player asking to take back
+                the last move, or None.
+            _control_sockets (set(socket.socket)): Sockets in _inputs that
+                are not clients, e.g. the analysis wake up socket.
+            _handoff_listener (socket.socket): Listener at handoff_path, or
+                None.
+            _drain_requested (bool): Set by request_drain, e.g. from a
+                signal handler, and acted on by the loop.
+            _drain_started (float): time.monotonic() the drain started, or
+                None if not draining.
+            _handed_off (bool): True once a new server has the listeners.
+            _coordinator (.cluster.Coordinator): Routes rooms, or None.
+            _node_id (str): Name of this node to the coordinator.
+            _registered (bool): True while this node is registered with
+                the coordinator.
+            _events (.events.EventBus): Publishes game events.
+            _profiler (.profiling.Profiler): Profiles the loop, or None.
+            _lap (callable): Charges the time since the last lap to a
+                phase of the loop pass, if profiling.
+            _line_buffers (dict(socket.socket, common.protocol.LineBuffer)):
+                Partial command lines of each stream client. WebSocket
+                clients send whole messages, so have none.
+            _unsent (dict(socket.socket, bytes)): Encoded bytes a client's
+                socket did not take on the last send.
+            _framed (set(socket.socket)): Clients using the framed
+                protocol. Their replies carry request ids, and other
+                messages are sent as pushes.
+            _request_id: Id of the framed request being handled, or None.
+            _load (.load.LoadMonitor): Average loop lag, and whether new
+                work is being shed.
+            _pass_started (float): time.monotonic() the last select
+                returned, or None before the first pass.
         '''
-        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._server.setblocking(0)
+        self._transport = transport or Transport()
         self._host = host
         self._port = port
-        self._server.bind((self._host, self._port))
-        self._server.listen(2)
-        self._inputs = [self._server]
+        if inherited_listeners is not None:
+            self._listeners = list(inherited_listeners[0])
+            self._websocket_listeners = list(inherited_listeners[1])
+        else:
+            self._listeners = [
+                self._transport.listen(
+                    address, family=family, reuse_port=reuse_port
+                )
+                for family, address in (
+                    parse_listeners(listeners) or
+                    [(socket.AF_INET, (self._host, self._port))]
+                )
+            ]
+            self._websocket_listeners = [
+                self._transport.listen(
+                    address, family=family, reuse_port=reuse_port
+                )
+                for family, address in parse_listeners(websocket_listeners)
+            ]
+        self._server = self._listeners[0]
+        self._listeners.extend(self._websocket_listeners)
+        self._websockets = {}
+        self._websocket_ping_interval = websocket_ping_interval
+        self._next_websocket_ping = time.monotonic() + websocket_ping_interval
+        self._handshaking = set()
+        self._max_message_size = max_message_size
+        self._connection_limiter = RateLimiter(message_rate, message_burst)
+        self._ip_limiter = RateLimiter(ip_message_rate, ip_message_burst)
+        self._peer_ips = {}
+        self._strikes = {}
+        self._max_strikes = max_strikes
+        self._max_queued_messages = max_queued_messages
+        self._overflowing = set()
+        self._inputs = list(self._listeners)
         self._outputs = []
         self._message_queues = {}
         self._connected_clients = 0
         self._client_names = ['', '']
         self._game_started = False
         self._active_player = 0
-        self._timeout_count = 0
-        self._game = GameBoard()
+        self._idle_timeout = idle_timeout
+        self._last_activity = time.monotonic()
+        self._rules = make_rules(rules)
+        self._game = self._rules.board
+        self._sessions = {}
+        self._parked_sessions = OrderedDict()
+        self._reconnect_grace = reconnect_grace
+        self._max_parked = max_parked
+        self._scheduler = Scheduler()
+        self._clock = (
+            TurnClock(turn_time, turn_increment) if turn_time else None
+        )
+        self._flag_timer = None
+        self._ratings = ratings
+        self._undo_request = None
+        self._control_sockets = set()
+        self._drain_requested = False
+        self._drain_started = None
+        self._drain_timeout = drain_timeout
+        self._handed_off = False
+        self._metrics = metrics or Metrics()
+        self._analyzer = analyzer if self._rules.supports_hints else None
+        self._finished_analyses = deque()
+        self._wake_reader = self._wake_writer = None
+        if self._analyzer is not None:
+            self._metrics.register('hint', analyzer.stats)
+            self._wake_reader, self._wake_writer = socket.socketpair()
+            self._wake_reader.setblocking(False)
+            self._wake_writer.setblocking(False)
+            self._inputs.append(self._wake_reader)
+            self._control_sockets.add(self._wake_reader)
+        self._handoff_listener = None
+        if handoff_path is not None:
+            self._handoff_listener = Transport().listen(
+                handoff_path, family=socket.AF_UNIX
+            )
+            self._inputs.append(self._handoff_listener)
+            self._control_sockets.add(self._handoff_listener)
+        self._metrics.register('drain', self._drain_stats)
+        self._events = event_bus or EventBus()
+        self._metrics.register('events', self._events.stats)
+        self._line_buffers = {}
+        self._unsent = {}
+        self._framed = set()
+        self._request_id = None
+        self._load = LoadMonitor(shed_lag, shed_recover_lag, lag_smoothing)
+        self._metrics.register('load', self._load.stats)
+        self._pass_started = None
+        self._profiler = profiler
+        self._lap = _ignore_lap
+        if profiler is not None:
+            self._lap = profiler.lap
+            self._metrics.register('profile', profiler.stats)
+            self._scheduler.call_at(
+                time.monotonic() + profiler.dump_interval, self._dump_profile
+            )
+        self._coordinator = coordinator
+        self._node_id = node_id or f'{host}:{port}'
+        self._registered = False
+        if coordinator is not None:
+            coordinator.register(
+                self._node_id, advertise_address or f'{host}:{port}'
+            )
+            self._registered = True
+
+    def request_drain(self):
+        '''
+        Asks the server to drain: stop accepting connections, let the game
+        in progress finish, then shut down. Safe to call from a signal
+        handler, as the loop does the work.
+        '''
+        self._drain_requested = True
 
     def server_loop(self):
         '''
@@ -55,68 +330,545 @@ class GameServer:
         it receives an exception, it will disconnect the client.
         '''
         while self._inputs:
-            print('Waiting for clients')
-            readable, writable, exceptional = select.select(
-                self._inputs, self._outputs, self._inputs, 1
+            self._serve_once()
+
+    def _serve_once(self, timeout=1):
+        '''
+        Runs one pass of the server loop: waits for sockets to be ready, up
+        to timeout seconds or the next scheduled deadline, then handles them.
+
+        Args:
+            timeout (float): Longest time to wait in select.
+        '''
+        print('Waiting for clients')
+        if self._pass_started is not None:
+            # Everything since select returned, on every path through the
+            # last pass, delayed the sockets that became ready meanwhile.
+            self._load.record(time.monotonic() - self._pass_started)
+        if self._profiler is not None:
+            self._profiler.begin_pass()
+        if self._drain_requested and self._drain_started is None:
+            self._start_drain()
+        readable, writable, exceptional = select.select(
+            self._inputs, self._outputs, self._inputs,
+            self._scheduler.time_until_next(time.monotonic(), timeout)
+        )
+        self._lap('select')
+        now = self._pass_started = time.monotonic()
+        self._scheduler.run_due(now)
+        self._ping_websockets(now)
+        self._lap('timers')
+
+        if not (readable or writable or exceptional):
+            print('Timed out. Will shut down if no response soon.')
+            if now - self._last_activity >= self._idle_timeout:
+                self._shut_down()
+            elif self._drain_started is not None:
+                self._check_drain(now)
+            return
+
+        self._last_activity = now
+
+        for sock in readable:
+            if sock in self._listeners:
+                self._accept_new_connection(sock)
+            elif sock is self._wake_reader:
+                self._finish_analyses()
+            elif sock is self._handoff_listener:
+                self._hand_off_listeners()
+            elif sock in self._handshaking:
+                self._continue_handshake(sock)
+            else:
+                self._receive(sock)
+        self._lap('dispatch')
+
+        for sock in writable:
+            self._send_response(sock)
+        self._lap('send')
+
+        for sock in exceptional:
+            self._handle_client_exception(sock)
+
+        self._shed_overflowing_clients()
+        if self._drain_started is not None:
+            self._check_drain(now)
+        self._lap('housekeeping')
+
+    def _dump_profile(self):
+        '''
+        Writes the profilers stacks if it is enabled, so a long profile can
+        be read while it runs. Run by the scheduler.
+        '''
+        if self._profiler.enabled:
+            self._profiler.dump()
+        self._scheduler.call_at(
+            time.monotonic() + self._profiler.dump_interval,
+            self._dump_profile,
+        )
+
+    def _hand_off_listeners(self):
+        '''
+        Sends the listening sockets to a new server connecting to the
+        handoff socket, then drains. Both servers accept on the same
+        sockets until this one stops, so no connection is refused.
+        '''
+        connection, _ = self._handoff_listener.accept()
+        # Gone before the new server binds the path for its own handoff.
+        self._close_handoff_listener()
+        try:
+            connection.setblocking(True)
+            send_listeners(
+                connection,
+                [
+                    listener for listener in self._listeners
+                    if listener not in self._websocket_listeners
+                ],
+                self._websocket_listeners,
             )
+        except OSError as err:
+            print(f'Handoff failed: {err}')
+            return
+        finally:
+            connection.close()
+        self._handed_off = True
+        self._metrics.increment('handoffs')
+        self._start_drain()
+
+    def _close_handoff_listener(self):
+        '''Closes the handoff listener, and removes its socket file.'''
+        listener = self._handoff_listener
+        if listener is None:
+            return
+        self._handoff_listener = None
+        self._control_sockets.discard(listener)
+        if listener in self._inputs:
+            self._inputs.remove(listener)
+        try:
+            os.unlink(listener.getsockname())
+        except OSError:
+            pass
+        listener.close()
 
-            if not (readable or writable or exceptional):
-                print('Timed out. Will shut down if no response soon.')
-                self._timeout_count += 1
-                if self._timeout_count >= 15:
-                    self._shut_down()
-                continue
+    def _start_drain(self):
+        '''
+        Stops accepting connections, and tells players in a game to finish
+        it before reconnecting.
+        '''
+        self._drain_started = time.monotonic()
+        self._close_handoff_listener()
+        self._unregister()
+        for sock in self._listeners:
+            if sock in self._inputs:
+                self._inputs.remove(sock)
+        if self._game_in_progress():
+            for sock in self._sessions:
+                self._queue_message(
+                    sock,
+                    'The server is restarting after this game. Reconnect '
+                    'when it ends.'
+                )
 
-            self._timeout_count = 0
+    def _unregister(self):
+        '''
+        Removes this node from the coordinator, so new rooms go to other
+        nodes. Does nothing if it is not registered.
+        '''
+        if not self._registered:
+            return
+        self._registered = False
+        try:
+            self._coordinator.unregister(self._node_id)
+        except OSError as err:
+            print(f'Could not unregister from the coordinator: {err}')
 
-            for sock in readable:
-                if sock is self._server:
-                    self._accept_new_connection(sock)
-                else:
-                    data = sock.recv(1024)
-                    if data:
-                        self._read_client_data(sock, data)
-                    else:
-                        self._disconnect_client(sock)
+    def _route_room(self, room):
+        '''
+        Finds the node owning a room, and redirects the client there if it
+        is not this one.
 
-            for sock in writable:
-                self._send_response(sock)
+        Args:
+            room (str): Room name.
 
-            for sock in exceptional:
-                self._handle_client_exception(sock)
+        Returns:
+            str: Redirect with the owners host:port, or the room is here.
+        '''
+        room = room.strip()
+        if not room:
+            return 'Please name a room.'
+        owner = None
+        if self._coordinator is not None:
+            try:
+                owner = self._coordinator.owner(room)
+            except OSError:
+                # Coordinator unreachable: serve the room here.
+                self._metrics.increment('coordinator_errors')
+        if owner is not None and owner[0] != self._node_id:
+            self._metrics.increment('redirects')
+            return f'Redirect {owner[1]}'
+        return f'Room {room} is here. Send your name to join.'
+
+    def _game_in_progress(self):
+        '''
+        Returns True if a game has moves on the board, so draining waits
+        for it.
+        '''
+        return self._game_started and self._game.move_count > 0
+
+    def _check_drain(self, now):
+        '''
+        Shuts down once no game is in progress and every queued message is
+        sent, or the drain timeout has passed.
+
+        Args:
+            now (float): Current time.monotonic().
+        '''
+        finished = not self._game_in_progress() and not self._outputs
+        if finished or now - self._drain_started >= self._drain_timeout:
+            self._shut_down('The server is restarting. Please reconnect.')
+
+    def _drain_stats(self):
+        '''
+        Returns drain progress, for Metrics.register.
+
+        Returns:
+            dict(str, int or float)
+        '''
+        if self._drain_started is None:
+            return {'active': 0}
+        return {
+            'active': 1,
+            'seconds': round(time.monotonic() - self._drain_started, 1),
+            'connections': len(self._message_queues),
+            'game_in_progress': int(self._game_in_progress()),
+        }
 
     def _accept_new_connection(self, sock):
         '''
         Accepts a new connection, and adds socket to inputs, and message queue.
 
         Args:
-            sock (socket.socket): Servers own socket.
+            sock (socket.socket): Listening socket that is readable.
         '''
-        connection, _ = sock.accept()
-        connection.setblocking(0)
+        # WebSocket clients compress with permessage-deflate, and their
+        # upgrade request is plain HTTP, so they are never framed.
+        connection, address = self._transport.accept(
+            sock, compression=sock not in self._websocket_listeners
+        )
+        # Unix socket peers have no address to tell them apart, so only
+        # their per-connection limit applies.
+        ip = address[0] if isinstance(address, tuple) else None
+        if ip is not None and not self._ip_limiter.allow(
+            ip, time.monotonic()
+        ):
+            connection.close()  # Shed before any per-connection state.
+            return
+        if self._load.shedding:
+            self._refuse_busy(connection, sock)
+            return
+
+        self._peer_ips[connection] = ip
         self._inputs.append(connection)
-        self._message_queues[connection] = queue.Queue()
+        self._message_queues[connection] = deque()
+        if sock in self._websocket_listeners:
+            self._websockets[connection] = WebSocketConnection(
+                time.monotonic(), self._max_message_size
+            )
+        if self._transport.needs_handshake:
+            self._handshaking.add(connection)
+
+    def _refuse_busy(self, connection, listener):
+        '''
+        Turns a new connection away while overloaded, without keeping any
+        state for it. Plain connections are told to retry later in one
+        non-blocking send; TLS and WebSocket connections would need a
+        handshake first, so are just closed.
+
+        Args:
+            connection (socket.socket): Connection just accepted.
+            listener (socket.socket): Listener it arrived on.
+        '''
+        self._load.count_shed('connections')
+        if not (
+            self._transport.needs_handshake or
+            listener in self._websocket_listeners
+        ):
+            try:
+                connection.send(BUSY_MESSAGE.encode())
+            except OSError:
+                pass
+        connection.close()
+
+    def _continue_handshake(self, sock):
+        '''
+        Moves a connections transport handshake on without blocking, and
+        disconnects it if the handshake fails.
+
+        Args:
+            sock (socket.socket): Connection still handshaking.
+        '''
+        try:
+            done = self._transport.handshake(sock)
+        except OSError as err:
+            print(f'Handshake failed: {err}')
+            self._handshaking.discard(sock)
+            self._disconnect_client(sock)
+        else:
+            if done:
+                self._handshaking.discard(sock)
+
+    def _receive(self, sock):
+        '''
+        Reads from a readable client socket, and disconnects it if the
+        connection closed or failed.
+
+        Args:
+            sock (socket.socket): Readable client socket.
+        '''
+        is_websocket = sock in self._websockets
+        try:
+            # Messages are buffered and limited in size one by one, so any
+            # size read is fine.
+            data = sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        self._lap('recv')
+
+        if not data:
+            self._disconnect_client(sock)
+        elif is_websocket:
+            self._read_websocket_data(sock, data)
+        elif self._admit_message(sock, time.monotonic()):
+            self._read_client_data(sock, data)
+
+    def _admit_message(self, sock, now):
+        '''
+        Checks a message against the connection and IP rate limits, and
+        rejects it if either is exceeded.
+
+        Args:
+            sock (socket.socket): Socket the message came from.
+            now (float): Current time.monotonic().
+
+        Returns:
+            bool: True if the message should be processed.
+        '''
+        ip = self._peer_ips.get(sock)
+        if (
+            self._connection_limiter.allow(sock, now) and
+            (ip is None or self._ip_limiter.allow(ip, now))
+        ):
+            return True
+        self._reject_message(sock, 'Too many messages. Slow down.')
+        return False
+
+    def _reject_message(self, sock, reason):
+        '''
+        Tells a client its message was rejected, and disconnects clients
+        that keep sending bad messages.
+
+        Args:
+            sock (socket.socket): Client that sent the message.
+            reason (str): Why the message was rejected.
+        '''
+        strikes = self._strikes.get(sock, 0) + 1
+        self._strikes[sock] = strikes
+        if strikes >= self._max_strikes:
+            print(f'Disconnecting {self._peer_ips.get(sock)}: {reason}')
+            self._disconnect_client(sock)
+        else:
+            self._queue_message(sock, reason)
+
+    def _shed_overflowing_clients(self):
+        '''Disconnects clients that let their message queue fill up.'''
+        for sock in self._overflowing:
+            if sock in self._message_queues:
+                self._disconnect_client(sock)
+        self._overflowing.clear()
+
+    def _read_websocket_data(self, sock, data):
+        '''
+        Passes data from a WebSocket client through its protocol state.
+        Control frames are answered straight away, and only text messages
+        reach the game.
+
+        Args:
+            sock (socket.socket): WebSocket client socket.
+            data (bytes): Bytes read from the socket.
+        '''
+        websocket = self._websockets[sock]
+        now = time.monotonic()
+        try:
+            messages, replies = websocket.feed(data, now)
+            self._lap('parse')
+        except WebSocketError as err:
+            print(f'WebSocket error: {err}')
+            if websocket.handshake_done:
+                replies = [websocket.encode_close(err.close_code)]
+            else:
+                replies = [b'HTTP/1.1 400 Bad Request\r\n\r\n']
+            messages = []
+            websocket.closed = True
+
+        for reply in replies:
+            self._queue_bytes(sock, reply)
+
+        for message in messages:
+            if self._admit_message(sock, now):
+                self._run_line(sock, message.encode())
+            if sock not in self._message_queues:
+                return  # Disconnected for sending too many.
+
+        if websocket.closed:
+            if sock in self._unsent:
+                # Tries once to get the close frame or 400 out first.
+                self._send_response(sock)
+            if sock in self._message_queues:
+                self._disconnect_client(sock)
+
+    def _ping_websockets(self, now):
+        '''
+        Sends keepalive pings to WebSocket clients once per ping interval,
+        and disconnects clients that have been silent for two intervals.
+        The replies are handled by the WebSocket layer, not the game.
+
+        Args:
+            now (float): Current time.monotonic().
+        '''
+        if not self._websockets or now < self._next_websocket_ping:
+            return
+        self._next_websocket_ping = now + self._websocket_ping_interval
+
+        for sock, websocket in list(self._websockets.items()):
+            if not websocket.handshake_done:
+                continue
+            if now - websocket.last_seen > 2 * self._websocket_ping_interval:
+                self._disconnect_client(sock)
+                continue
+            self._queue_bytes(sock, websocket.encode_ping())
 
     def _read_client_data(self, sock, data):
         '''
-        Process incoming data from clients, and sends for parsing.
-        Starts game when all clients are connected.
+        Splits data from a stream client into lines, one command each, and
+        runs every complete line. Each line is limited to max_message_size
+        bytes, and every line after the first in a read counts against the
+        rate limit as a message of its own.
 
         Args:
             sock (socket.socket): Socket data was read from.
-            data (bytes): Encoded string from client.
+            data (bytes): Lines read, the last possibly unfinished.
         '''
-        user_input = data.decode()
+        lines = self._line_buffers.setdefault(
+            sock, protocol.LineBuffer(self._max_message_size)
+        )
+        for index, line in enumerate(lines.feed(data)):
+            if index and not self._admit_message(sock, time.monotonic()):
+                return
+            if line is None:
+                self._reject_message(
+                    sock, 'Message too large. Limit is '
+                    f'{self._max_message_size} bytes.'
+                )
+            else:
+                self._run_line(sock, line)
+            if sock not in self._message_queues:
+                return  # Disconnected.
+
+    def _run_line(self, sock, line):
+        '''
+        Runs one command line, a request frame or plain text. A client's
+        first frame switches it to the framed protocol.
+
+        Args:
+            sock (socket.socket): Socket the line came from.
+            line (bytes): The line, without its newline.
+        '''
+        request_id = None
+        if sock in self._framed or protocol.is_framed(line):
+            self._framed.add(sock)
+            try:
+                request_id, command = protocol.decode_request(line)
+            except ValueError as err:
+                self._queue_message(sock, str(err))
+                return
+        else:
+            try:
+                command = line.rstrip(b'\r').decode()
+            except UnicodeDecodeError:
+                self._queue_message(sock, 'Invalid command, try again.')
+                return
+        self._request_id = request_id
+        try:
+            self._run_command(sock, command)
+        finally:
+            self._request_id = None
+
+    def _run_command(self, sock, user_input):
+        '''
+        Runs one command, starts the game once two players have joined, and
+        queues the reply.
+
+        Args:
+            sock (socket.socket): Socket the command came from.
+            user_input (str): The command.
+        '''
+        self._metrics.increment('commands')
+        self._lap('parse')
         output = self._parse_command(user_input, sock)
 
         if self._connected_clients == 2 and not self._game_started:
             self._start_game()
+        self._lap('command')
+
+        if output is not None:  # None if the reply comes later.
+            self._queue_message(sock, output, self._request_id)
 
-        self._message_queues[sock].put(output)
+    def _queue_message(self, sock, message, request_id=None, error=False):
+        '''
+        Queues a message for a client, and marks the socket for writing.
+        If the clients queue is full, the message is dropped and the client
+        is disconnected at the end of the loop pass.
+
+        Args:
+            sock (socket.socket): Socket to send message to.
+            message (str): Message to send.
+            request_id: Id of the framed request this replies to. Messages
+                to framed clients without one are pushes.
+            error (bool): True if the request failed, so framed clients get
+                an error frame rather than a reply.
+        '''
+        messages = self._message_queues[sock]
+        if len(messages) >= self._max_queued_messages:
+            self._overflowing.add(sock)
+            return
+        if sock in self._framed:
+            if request_id is None:
+                message = protocol.encode_push(message)
+            elif error:
+                message = protocol.encode_error(request_id, message)
+            else:
+                message = protocol.encode_reply(request_id, message)
+        messages.append(message)
 
         if sock not in self._outputs:
             self._outputs.append(sock)
 
+    def _queue_bytes(self, sock, data):
+        '''
+        Queues bytes that are already encoded, e.g. WebSocket control
+        frames, behind everything sent to the socket before them, so they
+        go out whole, in order, and never inside a partly sent frame.
+
+        Args:
+            sock (socket.socket): Socket to send to.
+            data (bytes): Bytes to write.
+        '''
+        messages = self._message_queues[sock]
+        self._unsent[sock] = self._take_outgoing(sock, messages) + data
+        if sock not in self._outputs:
+            self._outputs.append(sock)
+
     def _disconnect_client(self, sock):
         '''
         Disconnects a client from the server.
@@ -128,36 +880,112 @@ class GameServer:
             self._outputs.remove(sock)
 
         self._inputs.remove(sock)
+        self._forget_connection(sock)
         sock.close()
 
         del self._message_queues[sock]
 
-        self._end_game_if_started(sock)
+        self._drop_session(sock)
+
+    def _forget_connection(self, sock):
+        '''
+        Drops the per-connection protocol and rate limit state of a client.
+
+        Args:
+            sock (socket.socket): Socket being disconnected.
+        '''
+        self._handshaking.discard(sock)
+        self._websockets.pop(sock, None)
+        self._connection_limiter.forget(sock)
+        self._peer_ips.pop(sock, None)
+        self._strikes.pop(sock, None)
+        self._line_buffers.pop(sock, None)
+        self._unsent.pop(sock, None)
+        self._framed.discard(sock)
 
     def _send_response(self, sock):
         '''
-        Sends a response to the specified socket.
+        Sends queued messages to the specified socket, as much as it takes
+        without blocking. Whatever is left is sent on its next writable
+        pass, before anything queued later.
 
         Args:
             sock (socket.socket) Socket to send message to.
         '''
         try:
-            was_empty = self._message_queues[sock].empty()
+            messages = self._message_queues[sock]
         except KeyError:  # Socket disconnected
             print('Client disconnected')
-        else:
+            return
+        data = self._take_outgoing(sock, messages)
+        if not data:
+            print(f'{sock.getpeername()} queue empty')
+            self._outputs.remove(sock)
+            return
+        try:
+            sent = self._write(sock, data)
+        except BlockingIOError:  # Send buffer full, try again later.
+            sent = 0
+        except OSError:
+            self._disconnect_client(sock)
+            return
+        if sent < len(data):
+            self._unsent[sock] = data[sent:]
+
+    def _take_outgoing(self, sock, messages):
+        '''
+        Takes everything waiting to be written to a socket, in order: the
+        unsent bytes, then the queued messages, encoded.
+
+        Args:
+            sock (socket.socket): Socket to send to.
+            messages (collections.deque): The sockets message queue.
+
+        Returns:
+            bytes: Data to write.
+        '''
+        data = self._unsent.pop(sock, b'')
+        if messages:
             message = ''
-            while not self._message_queues[sock].empty():
-                message = (
-                    f'{message}\n{self._message_queues[sock].get_nowait()}'
-                )
-            if was_empty:
-                print(f'{sock.getpeername()} queue empty')
-                self._outputs.remove(sock)
-            else:
-                print(f'Sending {message} to {sock.getpeername()}')
-                message = message.encode()
-                sock.send(message)
+            while messages:
+                message = f'{message}\n{messages.popleft()}'
+            print(f'Sending {message} to {sock.getpeername()}')
+            data += self._encode_message(sock, message)
+        return data
+
+    def _encode_message(self, sock, message):
+        '''
+        Encodes a message for a client, framing it for WebSocket clients
+        and compressing connections.
+
+        Args:
+            sock (socket.socket): Socket to send message to.
+            message (str): Message to send.
+
+        Returns:
+            bytes: Data to write to the socket.
+        '''
+        websocket = self._websockets.get(sock)
+        if websocket is not None:
+            return websocket.encode_text(message)
+        if isinstance(sock, MessageSocket):
+            return sock.frame(message.encode())
+        return message.encode()
+
+    def _write(self, sock, data):
+        '''
+        Writes encoded bytes without blocking.
+
+        Args:
+            sock (socket.socket): Socket to write to.
+            data (bytes): Bytes from _encode_message.
+
+        Returns:
+            int: Number of bytes written.
+        '''
+        if isinstance(sock, MessageSocket):
+            return sock.send_framed(data)
+        return sock.send(data)
 
     def _handle_client_exception(self, sock):
         '''
@@ -167,26 +995,170 @@ class GameServer:
             sock (socket.socket): Socket to disconnect.
         '''
         self._inputs.remove(sock)
+        self._forget_connection(sock)
         if sock in self._outputs:
             self._outputs.remove(sock)
         sock.close()
 
         del self._message_queues[sock]
 
-        self._end_game_if_started(sock)
+        self._drop_session(sock)
 
-    def _shut_down(self):
-        '''Send shutdown message to clients, and then shut down server.'''
-        shutdown_message = (
-            'Took too long to respond. Shutting down.'
+    def _drop_session(self, sock):
+        '''
+        Handles a lost connection. Holds the players seat for them to resume
+        if a game is running, otherwise ends the game and frees the seat.
+
+        Args:
+            sock (socket.socket): Socket that was lost.
+        '''
+        session = self._sessions.pop(sock, None)
+        if session is not None:
+            self._events.publish(
+                events.DISCONNECT, player=session.player_index,
+                name=session.name,
+                held=self._game_started and self._reconnect_grace > 0,
+            )
+        if (
+            session is None or
+            not self._game_started or
+            self._reconnect_grace <= 0
+        ):
+            if session is not None:
+                self._release_seat(session)
+            self._end_game_if_started(sock)
+            return
+
+        now = time.monotonic()
+        session.park(now, self._scheduler.call_at(
+            now + self._reconnect_grace, self._expire_session, session.token
+        ))
+        self._parked_sessions[session.token] = session
+        while len(self._parked_sessions) > self._max_parked:
+            _, oldest = self._parked_sessions.popitem(last=False)
+            self._scheduler.cancel(oldest.expiry)
+            self._end_parked_session(oldest)
+        if session.token not in self._parked_sessions:
+            return  # Evicted straight away, and the game is over.
+
+        for other_sock in self._inputs:
+            if self._cannot_send_to_sock(sock, other_sock):
+                continue
+            self._queue_message(
+                other_sock,
+                f'{session.name} lost connection. Holding their seat for '
+                f'{self._reconnect_grace} seconds.'
+            )
+
+    def _expire_session(self, token):
+        '''
+        Ends the game for a parked session whose grace period has run out.
+        Run by the scheduler.
+
+        Args:
+            token (str): Resume token of the parked session.
+        '''
+        session = self._parked_sessions.pop(token, None)
+        if session is not None:
+            self._end_parked_session(session)
+
+    def _end_parked_session(self, session):
+        '''
+        Gives up a parked sessions seat for good, when its grace period
+        runs out or it is evicted to make room, ending the game and telling
+        the other player.
+
+        Args:
+            session (.session.Session): Session no longer parked.
+        '''
+        self._release_seat(session)
+        self._end_game_if_started(None)
+
+    def _release_seat(self, session):
+        '''
+        Frees the seat a session held, so another player can join.
+
+        Args:
+            session (.session.Session): Session giving up its seat.
+        '''
+        if self._client_names[session.player_index] == session.name:
+            self._client_names[session.player_index] = ''
+            self._connected_clients -= 1
+
+    def _resume_session(self, token, sock):
+        '''
+        Reattaches a parked session to a new connection.
+
+        Args:
+            token (str): Resume token given when the player joined.
+            sock (socket.socket): The players new connection.
+
+        Returns:
+            str: Welcome back message with the current board, or an error.
+        '''
+        session = self._parked_sessions.pop(token, None)
+        if session is None:
+            return 'Unknown or expired session.'
+
+        self._scheduler.cancel(session.expiry)
+        session.resume(sock)
+        self._sessions[sock] = session
+        self._events.publish(
+            events.RESUME, player=session.player_index, name=session.name
+        )
+        for other_sock in self._inputs:
+            if self._cannot_send_to_sock(sock, other_sock):
+                continue
+            self._queue_message(other_sock, f'{session.name} reconnected.')
+
+        return (
+            f'Welcome back {session.name}!\n'
+            f'Board:\n{self._rules.render()}\n'
+            f'It is {self._client_names[self._active_player]}s turn.'
+            f'{self._clock_text()}'
         )
-        shutdown_message = shutdown_message.encode()
+
+    def _shut_down(
+        self, shutdown_message='Took too long to respond. Shutting down.'
+    ):
+        '''
+        Send shutdown message to clients, and then shut down server.
+
+        Args:
+            shutdown_message (str): Message sent to every client.
+        '''
+        self._close_handoff_listener()
+        self._unregister()
         for sock in self._inputs:
-            if sock is self._server:
+            if sock in self._listeners:
                 continue
-            sock.send(shutdown_message)
+            if sock not in self._control_sockets:
+                message = (
+                    protocol.encode_push(shutdown_message)
+                    if sock in self._framed else shutdown_message
+                )
+                try:
+                    self._write(sock, self._encode_message(sock, message))
+                except OSError:  # Client already gone.
+                    pass
             sock.close()
         self._inputs.clear()
+        if self._wake_writer is not None:
+            self._wake_writer.close()
+        self._close_listeners()
+
+    def _close_listeners(self):
+        '''
+        Closes every listening socket, removing Unix socket files unless a
+        new server has taken them over.
+        '''
+        for listener in self._listeners:
+            if listener.family == socket.AF_UNIX and not self._handed_off:
+                try:
+                    os.unlink(listener.getsockname())
+                except OSError:
+                    pass
+            listener.close()
 
     def _is_active_player(self, player_number):
         '''
@@ -200,12 +1172,261 @@ class GameServer:
         '''
         return player_number == self._active_player
 
-    def _start_game(self):
+    def _start_game(self, first_player=0):
         '''
         Starts the game.
+
+        Args:
+            first_player (int): Index of the player who moves first.
         '''
-        self._active_player = 0
+        self._active_player = first_player
         self._game_started = True
+        self._undo_request = None
+        self._start_clock()
+        self._events.publish(
+            events.GAME_START, players=list(self._client_names)
+        )
+
+    def _start_next_game(self):
+        '''
+        Clears the board and starts the next game between the same players.
+        Whichever way the game ended, the player on move starts: the one
+        who did not play the last move, so after a win the loser.
+
+        The seats are kept on purpose, so a finished game, including a
+        flag fall, never leaves the room stuck and players need not
+        rejoin. Seats are only freed when a player leaves.
+        '''
+        self._game.reset_game()
+        self._start_game(self._active_player)
+
+    def _start_clock(self):
+        '''
+        Starts the clock of the player on move with full time banks, and
+        schedules their flag fall.
+        '''
+        if self._clock is None:
+            return
+        now = time.monotonic()
+        self._clock.start(self._active_player, now)
+        self._schedule_flag_fall()
+
+    def _switch_clock(self):
+        '''
+        Stops the clock of the player who just moved, and starts the clock of
+        the player now on move.
+        '''
+        if self._clock is None:
+            return
+        self._clock.switch(time.monotonic())
+        self._schedule_flag_fall()
+
+    def _stop_clock(self):
+        '''Stops the clock, cancelling the scheduled flag fall.'''
+        if self._clock is None:
+            return
+        self._clock.stop()
+        self._scheduler.cancel(self._flag_timer)
+        self._flag_timer = None
+
+    def _schedule_flag_fall(self):
+        '''Replaces the scheduled flag fall with one for the player on move.'''
+        self._scheduler.cancel(self._flag_timer)
+        self._flag_timer = self._scheduler.call_at(
+            self._clock.deadline(), self._flag_fall
+        )
+
+    def _flag_fall(self):
+        '''
+        Forfeits the game of the player whose time ran out, tells both
+        players, and starts a new game. Run by the scheduler.
+        '''
+        self._flag_timer = None
+        loser = self._active_player
+        self._record_result(1 - loser, loser)
+        self._events.publish(
+            events.WIN, winner=self._client_names[1 - loser],
+            loser=self._client_names[loser], reason='time',
+        )
+        for session in self._sessions.values():
+            if session.sock is None:
+                continue
+            if session.player_index == loser:
+                message = 'You ran out of time. You lost.'
+            else:
+                message = (
+                    f'{self._client_names[loser]} ran out of time. You won!'
+                )
+            self._queue_message(session.sock, message)
+        self._start_next_game()
+
+    def _record_result(self, winner, loser, draw=False):
+        '''
+        Sends a finished games result to the rating store, if ratings are on.
+
+        Args:
+            winner (int): Index of the winning player, or either player in a
+                draw.
+            loser (int): Index of the other player.
+            draw (bool): True if the game was drawn.
+        '''
+        if self._ratings is not None:
+            self._ratings.record_result(
+                self._client_names[winner], self._client_names[loser], draw
+            )
+
+    def _request_hint(self, player_index, sock):
+        '''
+        Starts analysing the board for the active player. The hint is sent
+        when the analysis thread finishes.
+
+        Args:
+            player_index (int): Index of player asking for a hint.
+            sock (socket.socket): The players socket.
+
+        Returns:
+            str: Why no hint can be given, or None if one is coming.
+        '''
+        if self._analyzer is None:
+            return 'Hints are off.'
+        elif not self._game_started:
+            return 'Game has not started.'
+        elif not self._is_active_player(player_index):
+            return 'Please wait for your turn.'
+
+        board_hash = self._game.zobrist_hash
+        request_id = self._request_id
+        started = self._analyzer.submit(
+            self._game, self._game.player_pieces[player_index],
+            lambda result: self._analysis_done(
+                sock, board_hash, result, request_id
+            ),
+        )
+        if not started:
+            self._metrics.increment('hints_shed')
+            return HINTS_BUSY_MESSAGE
+        self._metrics.increment('hints')
+        return None
+
+    def _analysis_done(self, sock, board_hash, result, request_id=None):
+        '''
+        Hands a finished hint to the loop. Runs on the analysis thread, so
+        only appends to a deque and wakes the loop.
+
+        Args:
+            sock (socket.socket): Socket of player that asked for the hint.
+            board_hash (int): Zobrist hash of the board when the hint was
+                asked. Undoing and playing another move keeps the move
+                count, so the position itself is compared.
+            result (tuple(int, int)): Zero based column and score, or None
+                if the analysis failed.
+            request_id: Id of the framed hint request, or None.
+        '''
+        self._finished_analyses.append(
+            (sock, board_hash, result, request_id)
+        )
+        try:
+            self._wake_writer.send(b'\0')
+        except OSError:  # Buffer full, so a wake up is already pending.
+            pass
+
+    def _finish_analyses(self):
+        '''Sends every finished hint to the player that asked for it.'''
+        try:
+            while self._wake_reader.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        while self._finished_analyses:
+            sock, board_hash, result, request_id = (
+                self._finished_analyses.popleft()
+            )
+            if sock not in self._message_queues:
+                continue
+            if result is None:
+                self._queue_message(
+                    sock, 'The hint could not be worked out.', request_id,
+                    error=True,
+                )
+            elif board_hash != self._game.zobrist_hash:
+                self._queue_message(
+                    sock, 'The board changed before the hint was ready.',
+                    request_id,
+                )
+            else:
+                self._queue_message(
+                    sock, self._hint_text(*result), request_id
+                )
+
+    def _hint_text(self, column, score):
+        '''
+        Returns a hint for players.
+
+        Args:
+            column (int): Zero based column of the best move.
+            score (int): Score of the move for the player to move.
+
+        Returns:
+            str
+        '''
+        # Only servers with hints need the solver, so it is not imported
+        # at startup.
+        from server.analysis import DECISIVE_SCORE
+
+        if column is None:
+            return 'There are no moves left.'
+        if score >= DECISIVE_SCORE:
+            outlook = 'you can force a win'
+        elif score <= -DECISIVE_SCORE:
+            outlook = 'your opponent can force a win'
+        else:
+            outlook = f'evaluation {score:+d}'
+        return f'Hint: drop in column {column + 1} ({outlook}).'
+
+    def _stats_text(self):
+        '''
+        Returns server statistics for players.
+
+        Returns:
+            str
+        '''
+        lines = [
+            f'{name}: {value}'
+            for name, value in self._metrics.snapshot().items()
+        ]
+        return 'Stats:\n' + '\n'.join(lines)
+
+    def _leaderboard_text(self):
+        '''
+        Returns the leaderboard for players, from the rating stores snapshot.
+
+        Returns:
+            str
+        '''
+        if self._ratings is None:
+            return 'Ratings are off.'
+        leaders = self._ratings.leaderboard()
+        if not leaders:
+            return 'No rated games yet.'
+        lines = [
+            f'{place}. {name} {rating:.0f} ({games} games)'
+            for place, (name, rating, games) in enumerate(leaders, 1)
+        ]
+        return 'Leaderboard:\n' + '\n'.join(lines)
+
+    def _clock_text(self):
+        '''
+        Returns the time each player has left, or an empty string if clocks
+        are off.
+        '''
+        if self._clock is None or self._clock.running_player is None:
+            return ''
+        now = time.monotonic()
+        times = ', '.join(
+            f'{name} {int(self._clock.time_left(index, now))}s'
+            for index, name in enumerate(self._client_names)
+        )
+        return f' Time left: {times}.'
 
     def _end_game_if_started(self, sock):
         '''
@@ -216,17 +1437,17 @@ class GameServer:
         '''
         if self._game_started:
             self._game_started = False
+            self._undo_request = None
+            self._stop_clock()
+            self._events.publish(
+                events.GAME_ABANDONED, moves=self._game.move_count
+            )
             self._game.reset_game()
             for other_sock in self._inputs:
                 if self._cannot_send_to_sock(sock, other_sock):
                     continue
-                if other_sock not in self._outputs:
-                    self._outputs.append(other_sock)
                 message = 'Player disconnected. Resetting Game.'
-
-                if other_sock not in self._outputs:
-                    self._outputs.append(other_sock)
-                self._message_queues[other_sock].put(message)
+                self._queue_message(other_sock, message)
 
     def _send_loss(self, sock):
         '''
@@ -239,17 +1460,34 @@ class GameServer:
             if self._cannot_send_to_sock(sock, other_sock):
                 continue
             message = 'You lost.'
+            self._queue_message(other_sock, message)
+
+    def _end_game_as_draw(self, sock):
+        '''
+        Ends a game on a full board as a draw, tells the other player, and
+        clears the board straight away for a new game.
 
-            if other_sock not in self._outputs:
-                self._outputs.append(other_sock)
-            self._message_queues[other_sock].put(message)
+        Args:
+            sock (socket.socket): Socket of player that filled the board.
+
+        Returns:
+            str: Draw message for the player that filled the board.
+        '''
+        message = 'The board is full. The game is a draw.'
+        self._start_next_game()
+        for other_sock in self._inputs:
+            if self._cannot_send_to_sock(sock, other_sock):
+                continue
+            self._queue_message(other_sock, message)
+
+        return message
 
     def _cannot_send_to_sock(self, sock_one, sock_two):
         '''
         Checks if a message cannot be sent to a socket.
 
-        This function checks if sock_one is the server itself, or is the same
-        socket as sock_two
+        This function checks if sock_two is one of the servers listening
+        sockets, or is the same socket as sock_one
 
         Args:
             sock_one (socket.socket): Socket to send message to.
@@ -258,7 +1496,11 @@ class GameServer:
         Returns:
             bool: True if a message cannot be sent, False if it can.
         '''
-        return (sock_two is self._server or sock_two is sock_one)
+        return (
+            sock_two in self._listeners or
+            sock_two is sock_one or
+            sock_two in self._control_sockets
+        )
 
     def _change_active_player(self):
         '''Changes the active player at the end of each turn.'''
@@ -277,10 +1519,57 @@ class GameServer:
         for other_sock in self._inputs:
             if self._cannot_send_to_sock(sock, other_sock):
                 continue
-            output = f'{self._game.game_board}\nYour turn!'
-            if sock not in self._outputs:
-                self._outputs.append(sock)
-            self._message_queues[other_sock].put(output)
+            output = f'{self._rules.render()}\nYour turn!'
+            self._queue_message(other_sock, output)
+
+    def _request_undo(self, player_index, sock):
+        '''
+        Asks to take back the last move, or agrees to the other players
+        request. The move is taken back once both players have asked.
+
+        Args:
+            player_index (int): Index of player sending undo.
+            sock (socket.socket): The players socket.
+
+        Returns:
+            str: Outcome of the request.
+        '''
+        other_name = self._client_names[1 - player_index]
+        if not self._game_started:
+            return 'Game has not started.'
+        elif not self._game.moves:
+            return 'There is no move to take back.'
+        elif self._undo_request == player_index:
+            return f'Waiting for {other_name} to agree.'
+        elif self._undo_request is None:
+            self._undo_request = player_index
+            for other_sock in self._inputs:
+                if self._cannot_send_to_sock(sock, other_sock):
+                    continue
+                self._queue_message(
+                    other_sock,
+                    f'{self._client_names[player_index]} asks to take back '
+                    'the last move. Send undo to agree.'
+                )
+            return f'Asked {other_name} to agree to take back the last move.'
+
+        self._undo_request = None
+        piece, move = self._rules.undo()
+        self._change_active_player()
+        self._events.publish(
+            events.UNDO, player=self._game.player_pieces.index(piece),
+            move=move,
+        )
+        self._switch_clock()
+        output = (
+            f'Move taken back.\nBoard:\n{self._rules.render()}\n'
+            f'It is {self._client_names[self._active_player]}s turn.'
+        )
+        for other_sock in self._inputs:
+            if self._cannot_send_to_sock(sock, other_sock):
+                continue
+            self._queue_message(other_sock, output)
+        return output
 
     def _help_text(self):
         '''Lists available commands for user'''
@@ -288,17 +1577,25 @@ class GameServer:
             'Commands:\n'
             '\tboard - Displays current game board.\n'
             '\tturn - Displays current turn number and current player.\n'
-            '\tNumber between 1 and 9 - Which column to drop yor piece.\n'
+            '\tleaderboard - Displays the highest rated players.\n'
+            '\thint - Suggests a column to drop your piece.\n'
+            '\tundo - Asks to take back the last move. Both players must '
+            'ask.\n'
+            '\tstats - Displays server statistics.\n'
+            '\troom NAME - Before sending your name, finds the server '
+            'hosting a room.\n'
+            f'\t{self._rules.move_help}\n'
             '\tdisconnect - Leave the game.\n'
         )
 
-    def _manage_piece_drop(self, player_index, column, sock):
+    def _manage_piece_drop(self, player_index, move, sock):
         '''
-        Manages inserting a game piece into the board, and win status.
+        Manages playing a game piece on the board, and win status.
 
         Args:
             player_index (int): Index of player in self._client_names.
-            column (int): Column specified by user to insert game piece.
+            move: Move from the rules engines parse_move, e.g. a zero based
+                column.
             sock (socket.socket): The clients socket.
 
         Returns:
@@ -307,36 +1604,62 @@ class GameServer:
         piece = self._game.player_pieces[player_index]
 
         try:
-            win, row, col = self._game.insert_piece(piece, column - 1)
-        except ColumnFullError as err:
+            win, row, col = self._rules.play(piece, move)
+        except (ColumnFullError, SpaceTakenError) as err:
             return str(err)
 
+        self._undo_request = None
         self._change_active_player()
+        self._events.publish(
+            events.MOVE, player=player_index,
+            name=self._client_names[player_index], column=col, row=row,
+            move=self._game.move_count,
+        )
         if win:
-            self._game.reset_game()
+            self._record_result(player_index, 1 - player_index)
+            self._events.publish(
+                events.WIN, winner=self._client_names[player_index],
+                loser=self._client_names[1 - player_index], reason='line',
+            )
+            self._start_next_game()
             self._send_loss(sock)
 
             return 'You won!'
+        elif self._rules.is_draw():
+            self._record_result(player_index, 1 - player_index, draw=True)
+            self._events.publish(
+                events.DRAW, players=list(self._client_names)
+            )
+            return self._end_game_as_draw(sock)
         else:
+            self._switch_clock()
             self._send_board_to_other_player(sock)
 
             return (
                 f'Piece landed in row {row} column {col}\n'
-                f'Board:\n{self._game.game_board}'
+                f'Board:\n{self._rules.render()}'
             )
 
-    def _name_new_client(self, client_input):
+    def _name_new_client(self, client_input, sock):
         '''
         Saves the name of a new client, and tells them if the game will start.
 
         Args:
             client_input (str): The players name.
+            sock (socket.socket): The clients socket.
 
         Returns
-            str: Welcome message, and the current number of connected clients.
+            str: Welcome message, the current number of connected clients,
+                and the token to resume the session with.
         '''
-        self._client_names[self._connected_clients] = client_input
+        player_index = self._client_names.index('')
+        self._client_names[player_index] = client_input
         self._connected_clients += 1
+        session = Session(player_index, client_input, sock)
+        self._sessions[sock] = session
+        self._events.publish(
+            events.JOIN, player=player_index, name=client_input
+        )
 
         output = (
             f'Welcome {client_input}! '
@@ -349,7 +1672,7 @@ class GameServer:
         else:
             output = f'{output} Waiting on another player.'
 
-        return output
+        return f'{output}\nResume token: {session.token}'
 
     def _parse_command(self, client_input, sock):
         '''
@@ -363,47 +1686,77 @@ class GameServer:
         Return:
             The output of the command entered.
         '''
+        session = self._sessions.get(sock)
         player_index = None
         player_name = None
         if ',' in client_input:
-            player_name, client_input = client_input.split(',')
-            player_index = self._client_names.index(player_name)
+            # The seat comes from the connections session, so a client can
+            # only act as the player it joined as.
+            player_name, client_input = client_input.split(',', 1)
+            if session is None or session.name != player_name:
+                return 'Invalid command, try again.'
+            player_index = session.player_index
 
         if client_input == 'help':
             return self._help_text()
 
         elif client_input == 'board':
             if self._game_started:
-                return self._game.game_board
+                return self._rules.render()
             else:
                 return 'Game has not started.'
+        elif client_input == 'undo' and player_index is not None:
+            return self._request_undo(player_index, sock)
+        elif client_input == 'hint':
+            return self._request_hint(player_index, sock)
+        elif client_input == 'stats':
+            return self._stats_text()
+        elif client_input == 'leaderboard':
+            return self._leaderboard_text()
         elif client_input == 'turn':
-            return f'It is {self._client_names[self._active_player]}s turn.'
-        elif client_input.isdigit():
+            return (
+                f'It is {self._client_names[self._active_player]}s turn.'
+                f'{self._clock_text()}'
+            )
+        elif self._rules.is_move(client_input):
             if not self._is_active_player(player_index):
                 return 'Please wait for your turn.'
             elif not self._game_started:
                 return 'Game has not started.'
 
-            column = int(client_input)
-
-            if 1 <= column <= 9:
-                return self._manage_piece_drop(player_index, column, sock)
-            else:
-                return "That's an invalid number. Try again."
+            try:
+                move = self._rules.parse_move(client_input)
+            except InvalidMoveError as err:
+                return str(err)
+            return self._manage_piece_drop(player_index, move, sock)
         elif client_input == 'disconnect':
             if player_name is not None and player_name in self._client_names:
+                self._events.publish(
+                    events.DISCONNECT, player=player_index, name=player_name,
+                    held=False,
+                )
                 self._client_names[player_index] = ''
                 self._connected_clients -= 1
+                self._sessions.pop(sock, None)
                 self._end_game_if_started(sock)
 
             return 'Disconnecting...'
+        elif client_input.startswith('resume ') and session is None:
+            return self._resume_session(client_input[len('resume '):], sock)
+        elif client_input.startswith('room ') and session is None:
+            if self._load.shedding:
+                self._load.count_shed('joins')
+                return BUSY_MESSAGE
+            return self._route_room(client_input[len('room '):])
         elif (
             not self._game_started and
             self._connected_clients < 2 and
-            player_index is None
+            session is None
         ):
-            return self._name_new_client(client_input)
+            if self._load.shedding:
+                self._load.count_shed('joins')
+                return BUSY_MESSAGE
+            return self._name_new_client(client_input, sock)
         elif self._connected_clients == 2 and player_index is None:
             return 'Server is full.'
         else:
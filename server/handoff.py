@@ -0,0 +1,58 @@
+'''
+Passes listening sockets from a running server to its replacement over a
+Unix domain socket, so a restart never stops accepting connections. The
+new server connects to the old servers handoff path, and gets duplicates
+of its listening sockets; the old server then drains.
+'''
+import json
+import socket
+
+
+MAX_LISTENERS = 64
+
+
+def send_listeners(connection, listeners, websocket_listeners):
+    '''
+    Sends listening sockets over a Unix domain socket connection.
+
+    Args:
+        connection (socket.socket): Connection to the new server.
+        listeners (list(socket.socket)): Listeners for game clients.
+        websocket_listeners (list(socket.socket)): Listeners for WebSocket
+            clients.
+    '''
+    header = json.dumps({
+        'listeners': len(listeners),
+        'websocket_listeners': len(websocket_listeners),
+    }).encode()
+    socket.send_fds(
+        connection, [header],
+        [listener.fileno() for listener in listeners + websocket_listeners],
+    )
+
+
+def receive_listeners(path, timeout=10):
+    '''
+    Takes over the listening sockets of the server with a handoff socket at
+    path.
+
+    Args:
+        path (str): Handoff socket path of the running server.
+        timeout (float): Seconds to wait for the running server.
+
+    Returns:
+        list(socket.socket): Listeners for game clients.
+        list(socket.socket): Listeners for WebSocket clients.
+    '''
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(timeout)
+        connection.connect(path)
+        header, fds, _, _ = socket.recv_fds(connection, 1024, MAX_LISTENERS)
+    counts = json.loads(header)
+    listeners = []
+    for fd in fds:
+        listener = socket.socket(fileno=fd)
+        listener.setblocking(False)
+        listeners.append(listener)
+    split = counts['listeners']
+    return listeners[:split], listeners[split:]
@@ -0,0 +1,102 @@
+'''
+Admission control for the server loop. Everything runs on one thread, so
+while a loop pass is working no other socket is looked at: the time a pass
+spends outside select is how late every other event is seen. LoadMonitor
+smooths that lag, and once it passes a threshold the server sheds new work
+(connections and players joining) with a cheap busy reply, keeping the
+loop for matches already being played.
+'''
+
+
+BUSY_MESSAGE = 'Server busy, retry later.'
+
+
+class LoadMonitor:
+    '''
+    Exponentially weighted moving average of loop lag, with hysteresis:
+    shedding starts when the average passes shed_lag, and stops once it
+    falls back under recover_lag, so the server does not flap between the
+    two on every pass.
+
+    Attrs:
+    shedding: bool
+        True while new work should be refused.
+    '''
+    def __init__(self, shed_lag=0, recover_lag=None, smoothing=0.2):
+        '''
+        Args:
+            shed_lag (float): Average lag, in seconds, at which shedding
+                starts. 0 never sheds, but lag is still measured.
+            recover_lag (float): Average lag, in seconds, at which shedding
+                stops. Defaults to half of shed_lag.
+            smoothing (float): Weight of each new pass in the average,
+                between 0 and 1. Higher reacts faster, and is noisier.
+        '''
+        if not 0 < smoothing <= 1:
+            raise ValueError('smoothing must be over 0 and at most 1.')
+        self._shed_lag = shed_lag
+        self._recover_lag = (
+            shed_lag / 2 if recover_lag is None else recover_lag
+        )
+        self._smoothing = smoothing
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.passes = 0
+        self.shedding = False
+        self.episodes = 0
+        self.shed = {'connections': 0, 'joins': 0}
+
+    def record(self, lag):
+        '''
+        Adds a loop pass to the average, and starts or stops shedding.
+
+        Args:
+            lag (float): Seconds the pass spent outside select.
+
+        Returns:
+            bool: True if new work should be refused.
+        '''
+        self.lag += self._smoothing * (lag - self.lag)
+        self.passes += 1
+        if lag > self.max_lag:
+            self.max_lag = lag
+        if self.shedding:
+            if self.lag < self._recover_lag:
+                self.shedding = False
+                print(f'Load recovered, lag {self.lag * 1000:.1f} ms.')
+        elif self._shed_lag and self.lag >= self._shed_lag:
+            self.shedding = True
+            self.episodes += 1
+            print(
+                f'Overloaded, lag {self.lag * 1000:.1f} ms. Shedding new '
+                'connections and joins.'
+            )
+        return self.shedding
+
+    def count_shed(self, kind):
+        '''
+        Counts work refused while shedding.
+
+        Args:
+            kind (str): 'connections' or 'joins'.
+        '''
+        self.shed[kind] += 1
+
+    def stats(self):
+        '''
+        Returns lag, thresholds and shed counts, for Metrics.register.
+
+        Returns:
+            dict(str, int or float)
+        '''
+        return {
+            'lag_ms': round(self.lag * 1000, 3),
+            'max_lag_ms': round(self.max_lag * 1000, 3),
+            'shed_lag_ms': round(self._shed_lag * 1000, 3),
+            'recover_lag_ms': round(self._recover_lag * 1000, 3),
+            'passes': self.passes,
+            'shedding': int(self.shedding),
+            'episodes': self.episodes,
+            'shed_connections': self.shed['connections'],
+            'shed_joins': self.shed['joins'],
+        }
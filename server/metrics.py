@@ -0,0 +1,54 @@
+class Metrics:
+    '''
+    Named counters for the stats command, plus sources whose values are
+    read when stats are asked for (e.g. a caches hit counts), so nothing
+    is copied on the hot path.
+    '''
+    def __init__(self):
+        self._counters = {}
+        self._sources = {}
+
+    def increment(self, name, amount=1):
+        '''
+        Adds to a counter, starting it at 0 if new.
+
+        Args:
+            name (str): Counter name.
+            amount (int): Amount to add.
+        '''
+        self._counters[name] = self._counters.get(name, 0) + amount
+
+    def get(self, name):
+        '''
+        Returns a counters value, 0 if it has not been incremented.
+
+        Args:
+            name (str): Counter name.
+
+        Returns:
+            int
+        '''
+        return self._counters.get(name, 0)
+
+    def register(self, prefix, source):
+        '''
+        Adds a source of values to the snapshot.
+
+        Args:
+            prefix (str): Put before each of the sources names.
+            source (callable): Returns a dict of names to values.
+        '''
+        self._sources[prefix] = source
+
+    def snapshot(self):
+        '''
+        Returns every counter and source value.
+
+        Returns:
+            dict(str, int or float): Values by name, sorted by name.
+        '''
+        values = dict(self._counters)
+        for prefix, source in self._sources.items():
+            for name, value in source().items():
+                values[f'{prefix}_{name}'] = value
+        return dict(sorted(values.items()))
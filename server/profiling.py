@@ -0,0 +1,240 @@
+'''
+Low overhead profiling of the server loop: a timer splitting each pass into
+phases (select, timers, recv, parse, command, send), and a signal based
+sampler recording call stacks in the collapsed format flame graph tools
+read:
+
+    flamegraph.pl server-profile.folded > profile.svg
+
+Both can be switched on and off while the server runs, e.g. with SIGUSR1.
+'''
+import os
+import signal
+import sys
+import time
+
+
+class PhaseTimer:
+    '''
+    Splits time into named phases with laps: each lap charges the time
+    since the previous one to a phase, so timing a sequence of phases costs
+    one clock read per phase.
+    '''
+    def __init__(self):
+        self._totals = {}
+        self._calls = {}
+        self._longest = {}
+        self._last = None
+
+    def mark(self):
+        '''Starts timing from now, charging the time before to no phase.'''
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        '''
+        Charges the time since the last lap or mark to a phase.
+
+        Args:
+            phase (str): Phase name.
+        '''
+        now = time.perf_counter()
+        if self._last is not None:
+            elapsed = now - self._last
+            self._totals[phase] = self._totals.get(phase, 0.0) + elapsed
+            self._calls[phase] = self._calls.get(phase, 0) + 1
+            if elapsed > self._longest.get(phase, 0.0):
+                self._longest[phase] = elapsed
+        self._last = now
+
+    def stats(self):
+        '''
+        Returns time spent in each phase, for Metrics.register.
+
+        Returns:
+            dict(str, float): Total and longest milliseconds, and laps, of
+                each phase.
+        '''
+        stats = {}
+        for phase, total in self._totals.items():
+            stats[f'{phase}_ms'] = round(total * 1000, 3)
+            stats[f'{phase}_max_ms'] = round(self._longest[phase] * 1000, 3)
+            stats[f'{phase}_laps'] = self._calls[phase]
+        return stats
+
+    def report(self):
+        '''
+        Returns a table of phases, most time first.
+
+        Returns:
+            str
+        '''
+        total = sum(self._totals.values()) or 1.0
+        lines = [
+            f'{"phase":12} {"laps":>9} {"total ms":>10} {"share":>6} '
+            f'{"mean us":>9} {"max ms":>8}'
+        ]
+        for phase in sorted(self._totals, key=self._totals.get, reverse=True):
+            phase_total = self._totals[phase]
+            calls = self._calls[phase]
+            lines.append(
+                f'{phase:12} {calls:9} {phase_total * 1000:10.1f} '
+                f'{phase_total / total:6.1%} '
+                f'{phase_total / calls * 1e6:9.1f} '
+                f'{self._longest[phase] * 1000:8.2f}'
+            )
+        return '\n'.join(lines)
+
+
+class StackSampler:
+    '''
+    Samples the main threads call stack from a timer signal, and counts
+    each distinct stack. SIGPROF samples CPU time, so a loop blocked in
+    select is not sampled; SIGALRM samples wall clock time. Must be started
+    from the main thread.
+    '''
+    def __init__(self, interval=0.005, wall_clock=False):
+        '''
+        Args:
+            interval (float): Seconds between samples.
+            wall_clock (bool): Sample wall clock rather than CPU time.
+        '''
+        self._interval = interval
+        self._timer, self._signal = (
+            (signal.ITIMER_REAL, signal.SIGALRM) if wall_clock
+            else (signal.ITIMER_PROF, signal.SIGPROF)
+        )
+        self._previous_handler = None
+        self.stacks = {}
+        self.samples = 0
+        self.running = False
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(
+                f'{os.path.basename(code.co_filename)}:{code.co_name}'
+            )
+            frame = frame.f_back
+        key = ';'.join(reversed(stack))
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+        self.samples += 1
+
+    def start(self):
+        '''Starts sampling.'''
+        if self.running:
+            return
+        self._previous_handler = signal.signal(self._signal, self._sample)
+        signal.setitimer(self._timer, self._interval, self._interval)
+        self.running = True
+
+    def stop(self):
+        '''Stops sampling, keeping the stacks sampled so far.'''
+        if not self.running:
+            return
+        signal.setitimer(self._timer, 0)
+        signal.signal(self._signal, self._previous_handler)
+        self.running = False
+
+    def collapsed(self):
+        '''
+        Returns sampled stacks in collapsed format: frames joined by
+        semicolons, outermost first, then the number of samples.
+
+        Returns:
+            str
+        '''
+        return ''.join(
+            f'{stack} {count}\n'
+            for stack, count in sorted(self.stacks.items())
+        )
+
+
+class Profiler:
+    '''
+    Phase timings and stack samples of the server loop, off until started.
+    Laps cost one attribute check while it is off.
+    '''
+    def __init__(self, output_path, interval=0.005, dump_interval=60,
+                 wall_clock=False):
+        '''
+        Args:
+            output_path (str): File collapsed stacks are written to.
+            interval (float): Seconds between stack samples.
+            dump_interval (float): Seconds between writes of output_path
+                while profiling.
+            wall_clock (bool): Sample wall clock rather than CPU time.
+        '''
+        self.output_path = output_path
+        self.dump_interval = dump_interval
+        self.phases = PhaseTimer()
+        self.sampler = StackSampler(interval, wall_clock)
+        self.enabled = False
+        self._toggle_requested = False
+
+    def start(self):
+        '''Starts timing phases and sampling stacks.'''
+        self.enabled = True
+        self.sampler.start()
+
+    def stop(self):
+        '''Stops profiling, and writes the results.'''
+        self.enabled = False
+        self.sampler.stop()
+        self.dump()
+
+    def request_toggle(self):
+        '''
+        Asks for profiling to be switched on or off at the start of the
+        next loop pass. Safe to call from a signal handler.
+        '''
+        self._toggle_requested = True
+
+    def begin_pass(self):
+        '''
+        Acts on a requested toggle, and starts timing a loop pass.
+        '''
+        if self._toggle_requested:
+            self._toggle_requested = False
+            if self.enabled:
+                self.stop()
+                print(f'Profiling stopped. Stacks in {self.output_path}')
+            else:
+                self.start()
+                print('Profiling started.')
+        if self.enabled:
+            self.phases.mark()
+
+    def lap(self, phase):
+        '''
+        Charges the time since the last lap to a phase, if profiling.
+
+        Args:
+            phase (str): Phase name.
+        '''
+        if self.enabled:
+            self.phases.lap(phase)
+
+    def dump(self):
+        '''
+        Writes collapsed stacks to output_path, replacing the file, and
+        prints the phase table.
+        '''
+        temporary_path = f'{self.output_path}.tmp'
+        with open(temporary_path, 'w') as output:
+            output.write(self.sampler.collapsed())
+        os.replace(temporary_path, self.output_path)
+        print(self.phases.report(), file=sys.stderr)
+
+    def stats(self):
+        '''
+        Returns phase timings and sample count, for Metrics.register.
+
+        Returns:
+            dict(str, int or float)
+        '''
+        return {
+            'enabled': int(self.enabled),
+            'samples': self.sampler.samples,
+            **self.phases.stats(),
+        }
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+
+
+class TokenBucket:
+    '''
+    Token bucket state for one key.
+
+    Attrs:
+    tokens: float
+        Tokens left. Each allowed event takes one.
+
+    updated: float
+        time.monotonic() when tokens was last worked out.
+    '''
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    '''
+    Token bucket rate limits, one bucket per key (e.g. a socket or an IP).
+    Checks are O(1), and the least recently used buckets are dropped once
+    there are more than max_keys, so memory stays bounded under attack.
+    '''
+    def __init__(self, rate, burst, max_keys=65536):
+        '''
+        Args:
+            rate (float): Tokens added per second.
+            burst (float): Most tokens a bucket holds.
+            max_keys (int): Most buckets kept at once.
+        '''
+        self._rate = rate
+        self._burst = burst
+        self._max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def allow(self, key, now):
+        '''
+        Takes a token from the keys bucket if it has one.
+
+        Args:
+            key: What is being limited.
+            now (float): Current time.monotonic().
+
+        Returns:
+            bool: True if the event is allowed, False if over the limit.
+        '''
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self._burst, now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(
+                self._burst, bucket.tokens + (now - bucket.updated) * self._rate
+            )
+            bucket.updated = now
+
+        if bucket.tokens < 1:
+            return False
+        bucket.tokens -= 1
+        return True
+
+    def forget(self, key):
+        '''
+        Drops a keys bucket, e.g. when its socket closes.
+
+        Args:
+            key: Key to drop.
+        '''
+        self._buckets.pop(key, None)
+
+    def __len__(self):
+        return len(self._buckets)
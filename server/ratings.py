@@ -0,0 +1,204 @@
+import queue
+import sqlite3
+import threading
+
+
+DEFAULT_RATING = 1500.0
+K_FACTOR = 32
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    rating REAL NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS players_by_rating ON players (rating DESC);
+'''
+
+
+def expected_score(rating, opponent_rating):
+    '''
+    Returns the Elo expected score of a player against an opponent.
+
+    Args:
+        rating (float): The players rating.
+        opponent_rating (float): The opponents rating.
+
+    Returns:
+        float: Expected score, between 0 and 1.
+    '''
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+def update_elo(rating_a, rating_b, score_a, k_factor=K_FACTOR):
+    '''
+    Works out both players new Elo ratings after a game.
+
+    Args:
+        rating_a (float): First players rating.
+        rating_b (float): Second players rating.
+        score_a (float): First players score. 1 win, 0.5 draw, 0 loss.
+        k_factor (float): Most a rating can change in one game.
+
+    Returns:
+        float: First players new rating.
+        float: Second players new rating.
+    '''
+    change = k_factor * (score_a - expected_score(rating_a, rating_b))
+    return rating_a + change, rating_b - change
+
+
+class RatingStore:
+    '''
+    Player ratings kept in SQLite, updated by Elo as games finish.
+
+    The server loop never touches the database. Results are queued, and a
+    writer thread applies them in batches, one transaction per batch. After
+    each batch the writer reads the top of the leaderboard through the
+    rating index and swaps in a new snapshot, so the leaderboard command is
+    a read of a tuple. The database is in WAL mode, so other readers (e.g.
+    reporting scripts) do not block the writer either.
+    '''
+    def __init__(
+        self, path, k_factor=K_FACTOR, leaderboard_size=10, batch_size=64
+    ):
+        '''
+        Opens or creates the database, and starts the writer thread.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            k_factor (float): Most a rating can change in one game.
+            leaderboard_size (int): Number of players on the leaderboard.
+            batch_size (int): Most results written in one transaction.
+        '''
+        self._path = path
+        self._k_factor = k_factor
+        self._leaderboard_size = leaderboard_size
+        self._batch_size = batch_size
+        self._results = queue.Queue()
+        self._leaderboard = ()
+
+        connection = self._connect()
+        with connection:
+            connection.executescript(SCHEMA)
+        self._refresh_leaderboard(connection)
+        self._thread = threading.Thread(
+            target=self._write_loop, args=(connection,), daemon=True
+        )
+        self._thread.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self._path, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def record_result(self, winner, loser, draw=False):
+        '''
+        Queues a finished games result. Returns straight away.
+
+        Args:
+            winner (str): Name of the winning player, or either player in a
+                draw.
+            loser (str): Name of the losing player, or the other player in
+                a draw.
+            draw (bool): True if the game was drawn.
+        '''
+        self._results.put((winner, loser, 0.5 if draw else 1.0))
+
+    def leaderboard(self):
+        '''
+        Returns the latest leaderboard snapshot.
+
+        Returns:
+            tuple(tuple(str, float, int)): Name, rating and games played of
+                the top players, highest rated first.
+        '''
+        return self._leaderboard
+
+    def flush(self):
+        '''Waits until every queued result is written.'''
+        self._results.join()
+
+    def close(self):
+        '''Writes any queued results, then stops the writer thread.'''
+        self._results.put(None)
+        self._thread.join()
+
+    def _write_loop(self, connection):
+        '''
+        Writes queued results in batches until close is called.
+
+        Args:
+            connection (sqlite3.Connection): Connection owned by the thread.
+        '''
+        running = True
+        while running:
+            batch = [self._results.get()]
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._results.get_nowait())
+                except queue.Empty:
+                    break
+
+            results = [result for result in batch if result is not None]
+            running = len(results) == len(batch)
+            if results:
+                with connection:
+                    for result in results:
+                        self._apply_result(connection, *result)
+                self._refresh_leaderboard(connection)
+            for _ in batch:
+                self._results.task_done()
+        connection.close()
+
+    def _rating(self, connection, name):
+        row = connection.execute(
+            'SELECT rating FROM players WHERE name = ?', (name,)
+        ).fetchone()
+        return DEFAULT_RATING if row is None else row[0]
+
+    def _apply_result(self, connection, player_a, player_b, score_a):
+        '''
+        Updates both players ratings and records from one game.
+
+        Args:
+            connection (sqlite3.Connection): Connection in a transaction.
+            player_a (str): First players name.
+            player_b (str): Second players name.
+            score_a (float): First players score.
+        '''
+        rating_a, rating_b = update_elo(
+            self._rating(connection, player_a),
+            self._rating(connection, player_b),
+            score_a, self._k_factor,
+        )
+        for name, rating, score in (
+            (player_a, rating_a, score_a),
+            (player_b, rating_b, 1 - score_a),
+        ):
+            connection.execute(
+                'INSERT INTO players (name, rating, games, wins, losses, '
+                'draws) VALUES (?, ?, 1, ?, ?, ?) '
+                'ON CONFLICT (name) DO UPDATE SET rating = excluded.rating, '
+                'games = games + 1, wins = wins + excluded.wins, '
+                'losses = losses + excluded.losses, '
+                'draws = draws + excluded.draws',
+                (name, rating, score == 1, score == 0, score == 0.5),
+            )
+
+    def _refresh_leaderboard(self, connection):
+        '''
+        Replaces the leaderboard snapshot, reading the top players through
+        the rating index.
+
+        Args:
+            connection (sqlite3.Connection): Connection to read with.
+        '''
+        self._leaderboard = tuple(connection.execute(
+            'SELECT name, rating, games FROM players '
+            'ORDER BY rating DESC LIMIT ?', (self._leaderboard_size,)
+        ))
@@ -0,0 +1,219 @@
+'''
+Rules engines. An engine holds everything GameServer needs to know about a
+game variant: which commands are moves, whether a move is legal, playing
+it, and drawing the board. The server calls the same methods whatever the
+variant, so one server fleet can host every variant, each server running
+the rules set in its config.
+'''
+import functools
+import re
+
+from server.game_errors import InvalidMoveError
+from server.game_logic import (
+    COLUMNS, ROWS, STANDARD_GEOMETRY, WIN_LENGTH, BoardGeometry, GameBoard,
+    PlacementBoard,
+)
+
+
+DEFAULT_RULES = 'five-in-a-row'
+
+
+@functools.lru_cache(maxsize=None)
+def get_geometry(rows, columns, win_length):
+    '''
+    Returns the shared geometry for a board size, building its tables on
+    first use.
+
+    Args:
+        rows (int): Number of rows.
+        columns (int): Number of columns.
+        win_length (int): Pieces in a row needed to win.
+
+    Returns:
+        .game_logic.BoardGeometry
+    '''
+    if (rows, columns, win_length) == (ROWS, COLUMNS, WIN_LENGTH):
+        return STANDARD_GEOMETRY
+    return BoardGeometry(rows, columns, win_length)
+
+
+class RulesEngine:
+    '''
+    Interface every variant implements, with the parts they share.
+
+    Attrs:
+    name: str
+        Name of the variant, as in RULES.
+
+    board: .game_logic.Board
+        The board, with the Board interface for state shared by every
+        variant: move_count, moves, reset_game. Moves are played, taken
+        back and checked through the engine, not the board.
+
+    move_help: str
+        How to write a move, for the help command.
+
+    supports_hints: bool
+        True if the solver and position book can analyse the board.
+    '''
+    supports_hints = False
+
+    def __init__(self, name, board):
+        self.name = name
+        self.board = board
+
+    def is_move(self, text):
+        '''
+        Returns True if a command is written as a move, legal or not.
+        '''
+        raise NotImplementedError
+
+    def parse_move(self, text):
+        '''
+        Reads a move from a command for which is_move is True.
+
+        Raises:
+            InvalidMoveError: If the move is off the board.
+        '''
+        raise NotImplementedError
+
+    def play(self, piece, move):
+        '''
+        Plays a move from parse_move.
+
+        Returns:
+            tuple(bool, int, int): True if the move won, and the zero based
+                row and column the piece ended up in.
+
+        Raises:
+            ColumnFullError, SpaceTakenError: If the move is not legal now.
+        '''
+        raise NotImplementedError
+
+    def legal_moves(self):
+        '''
+        Returns every move play would accept now.
+        '''
+        raise NotImplementedError
+
+    def undo(self):
+        '''
+        Takes back the last move.
+
+        Returns:
+            tuple(str, int): The piece taken back, and the move as the board
+                records it.
+
+        Raises:
+            NoMoveError: If no moves have been played.
+        '''
+        return self.board.undo_move()
+
+    def is_draw(self):
+        '''
+        Returns True if, after a move that did not win, the game cannot go
+        on.
+        '''
+        return self.board.is_board_full()
+
+    def render(self):
+        '''
+        Returns the board drawn for players.
+        '''
+        return self.board.game_board
+
+
+class DropRules(RulesEngine):
+    '''
+    Pieces drop to the lowest empty space of a column, as in five in a row
+    and connect four. Moves are column numbers from 1.
+    '''
+    def __init__(self, name, geometry):
+        super().__init__(name, GameBoard(geometry))
+        self._columns = geometry.columns
+        self.supports_hints = geometry is STANDARD_GEOMETRY
+        self.move_help = (
+            f'Number between 1 and {self._columns} - Which column to drop '
+            'yor piece.'
+        )
+
+    def is_move(self, text):
+        return text.isdigit()
+
+    def parse_move(self, text):
+        column = int(text)
+        if not 1 <= column <= self._columns:
+            raise InvalidMoveError("That's an invalid number. Try again.")
+        return column - 1
+
+    def play(self, piece, move):
+        return self.board.insert_piece(piece, move)
+
+    def legal_moves(self):
+        return self.board.legal_columns()
+
+
+class PlaceRules(RulesEngine):
+    '''
+    Pieces go on any empty space, as in gomoku. Moves are a column letter
+    then a row number, e.g. h8.
+    '''
+    MOVE_PATTERN = re.compile(r'([a-z])(\d{1,2})')
+
+    def __init__(self, name, geometry):
+        super().__init__(name, PlacementBoard(geometry))
+        self._rows = geometry.rows
+        self._columns = geometry.columns
+        last_column = chr(ord('a') + self._columns - 1)
+        self.move_help = (
+            f'Letter a to {last_column} and number 1 to {self._rows}, e.g. '
+            'h8 - Where to place your piece.'
+        )
+
+    def is_move(self, text):
+        return self.MOVE_PATTERN.fullmatch(text) is not None
+
+    def parse_move(self, text):
+        letter, number = self.MOVE_PATTERN.fullmatch(text).groups()
+        row, column = int(number) - 1, ord(letter) - ord('a')
+        if not (0 <= row < self._rows and 0 <= column < self._columns):
+            raise InvalidMoveError(
+                'That space is not on the board. Try again.'
+            )
+        return row, column
+
+    def play(self, piece, move):
+        return self.board.place_piece(piece, *move)
+
+    def legal_moves(self):
+        return self.board.legal_spaces()
+
+
+# Engine class and board of each variant: rows, columns, win length.
+RULES = {
+    'five-in-a-row': (DropRules, ROWS, COLUMNS, WIN_LENGTH),
+    'connect-four': (DropRules, 6, 7, 4),
+    'gomoku': (PlaceRules, 15, 15, 5),
+}
+
+
+def make_rules(name):
+    '''
+    Makes a rules engine, with a new board, for a variant.
+
+    Args:
+        name (str): Variant name in RULES.
+
+    Returns:
+        RulesEngine
+
+    Raises:
+        ValueError: If the variant is unknown.
+    '''
+    try:
+        engine, rows, columns, win_length = RULES[name]
+    except KeyError:
+        raise ValueError(
+            f'Unknown rules {name!r}. Choose from {", ".join(RULES)}.'
+        ) from None
+    return engine(name, get_geometry(rows, columns, win_length))
@@ -0,0 +1,105 @@
+import heapq
+import itertools
+
+
+class Timer:
+    '''
+    Handle for a scheduled call, used to cancel it.
+
+    Attrs:
+    deadline: float
+        time.monotonic() the call is due.
+
+    cancelled: bool
+        True if the call will not run.
+    '''
+    __slots__ = ('deadline', 'callback', 'args', 'cancelled')
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+
+class Scheduler:
+    '''
+    Runs callbacks at deadlines from the server loop, using one heap shared
+    by everything with a deadline (turn clocks, parked sessions). Each loop
+    pass only looks at the earliest deadline, so a thousand pending timers
+    cost the loop no more than one.
+
+    Cancelling marks the timer and leaves it in the heap, so it is O(1). It
+    is dropped when it reaches the top.
+    '''
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()  # Keeps equal deadlines in order.
+
+    def call_at(self, deadline, callback, *args):
+        '''
+        Schedules callback(*args) to run at deadline.
+
+        Args:
+            deadline (float): time.monotonic() to run at.
+            callback (callable): Function to call.
+
+        Returns:
+            Timer: Handle to cancel the call with.
+        '''
+        timer = Timer(deadline, callback, args)
+        heapq.heappush(self._heap, (deadline, next(self._counter), timer))
+        return timer
+
+    def cancel(self, timer):
+        '''
+        Stops a scheduled call from running.
+
+        Args:
+            timer (Timer): Handle from call_at. None is ignored.
+        '''
+        if timer is not None:
+            timer.cancelled = True
+
+    def _drop_cancelled(self):
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+
+    def time_until_next(self, now, default):
+        '''
+        Returns how long the loop can wait before the next call is due.
+
+        Args:
+            now (float): Current time.monotonic().
+            default (float): Longest wait, also used if nothing is due.
+
+        Returns:
+            float: Seconds to wait, never negative.
+        '''
+        self._drop_cancelled()
+        if not self._heap:
+            return default
+        return max(0, min(default, self._heap[0][0] - now))
+
+    def run_due(self, now):
+        '''
+        Runs every call due by now, earliest first.
+
+        Args:
+            now (float): Current time.monotonic().
+
+        Returns:
+            int: Number of calls run.
+        '''
+        ran = 0
+        while self._heap and self._heap[0][0] <= now:
+            _, _, timer = heapq.heappop(self._heap)
+            if timer.cancelled:
+                continue
+            timer.cancelled = True  # Cancelling it now does nothing.
+            timer.callback(*timer.args)
+            ran += 1
+        return ran
+
+    def __len__(self):
+        return sum(1 for _, _, timer in self._heap if not timer.cancelled)
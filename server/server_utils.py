@@ -1,17 +1,68 @@
-import yaml
+import os
 
+from common.config import load_config as load_layered_config
 
-CONFIG_PATH = './server/config.yaml'
 
+CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'config.yaml'
+)
+DEFAULTS = {
+    'host': '127.0.0.1',
+    'port': 8080,
+    'listeners': None,
+    'websocket_listeners': None,
+    'websocket_ping_interval': 20,
+    'max_message_size': 1024,
+    'message_rate': 10,
+    'message_burst': 20,
+    'ip_message_rate': 50,
+    'ip_message_burst': 100,
+    'max_queued_messages': 64,
+    'max_strikes': 20,
+    'reconnect_grace': 10,
+    'max_parked': 16,
+    'turn_time': 300,
+    'turn_increment': 5,
+    'idle_timeout': 15,
+    'ratings_db': None,
+    'hints': True,
+    'hint_depth': 6,
+    'hint_time': 0.5,
+    'hint_cache_size': 4096,
+    'hint_queue_size': 16,
+    'book_path': None,
+    'reuse_port': False,
+    'handoff_path': None,
+    'takeover_from': None,
+    'drain_timeout': 300,
+    'coordinator': None,
+    'node_id': None,
+    'advertise_address': None,
+    'event_stream': None,
+    'rules': 'five-in-a-row',
+    'shed_lag': 0.25,
+    'shed_recover_lag': None,
+    'lag_smoothing': 0.2,
+    'profile_output': 'server-profile.folded',
+    'profile_interval': 0.005,
+    'profile_dump_interval': 60,
+    'profile_wall_clock': False,
+    'transport': 'tcp',
+    'compression': False,
+    'certfile': None,
+    'keyfile': None,
+}
 
-def load_config():
+
+def load_config(overrides=None):
     '''
-    Loads config from CONFIG_PATH constant
+    Loads config from DEFAULTS, then CONFIG_PATH, then FIAR_* environment
+    variables, then CLI flags.
+
+    Args:
+        overrides (dict): Values from CLI flags.
 
     Returns:
-        dict(): Loaded yaml.
+        dict(): Loaded config.
     '''
-    with open(CONFIG_PATH) as config_file:
-        config = yaml.load(config_file, yaml.FullLoader)
-
-    return config
+    return load_layered_config(DEFAULTS, CONFIG_PATH, overrides)
@@ -0,0 +1,70 @@
+import os
+
+
+class Session:
+    '''
+    A players seat on the server, kept while their connection is down so
+    they can resume the game.
+
+    Attrs:
+    token: str
+        Secret the client sends to resume the session.
+
+    player_index: int
+        Index of the player in GameServer._client_names.
+
+    name: str
+        The players name.
+
+    sock: socket.socket
+        The players current connection, or None while parked.
+
+    parked_at: float
+        time.monotonic() when the connection dropped, or None if connected.
+
+    expiry: server.scheduler.Timer
+        Scheduled end of the grace period, or None if connected.
+    '''
+    __slots__ = (
+        'token', 'player_index', 'name', 'sock', 'parked_at', 'expiry'
+    )
+
+    def __init__(self, player_index, name, sock):
+        '''
+        Creates a new Session with a fresh resume token.
+
+        Args:
+            player_index (int): Index of the player in the server.
+            name (str): The players name.
+            sock (socket.socket): The players connection.
+        '''
+        self.token = os.urandom(8).hex()
+        self.player_index = player_index
+        self.name = name
+        self.sock = sock
+        self.parked_at = None
+        self.expiry = None
+
+    def park(self, now, expiry=None):
+        '''
+        Detaches the session from its dropped connection.
+
+        Args:
+            now (float): Current time.monotonic().
+            expiry (server.scheduler.Timer): Scheduled end of the grace
+                period.
+        '''
+        self.sock = None
+        self.parked_at = now
+        self.expiry = expiry
+
+    def resume(self, sock):
+        '''
+        Attaches the session to a new connection.
+
+        Args:
+            sock (socket.socket): The players new connection.
+        '''
+        self.sock = sock
+        self.parked_at = None
+        self.expiry = None
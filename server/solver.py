@@ -0,0 +1,130 @@
+from server.game_logic import COLUMNS, WIN_LINES, GameBoard
+
+
+WIN_SCORE = 100
+HEURISTIC_LIMIT = 40
+
+# Centre columns first, as they are in the most win lines, so alpha-beta
+# finds good moves early and cuts more of the tree.
+COLUMN_ORDER = tuple(
+    sorted(range(COLUMNS), key=lambda column: abs(column - COLUMNS // 2))
+)
+
+
+def other_piece(piece):
+    '''
+    Returns the opponents piece.
+
+    Args:
+        piece (str): A players piece.
+
+    Returns:
+        str
+    '''
+    return GameBoard.player_pieces[piece == GameBoard.player_pieces[0]]
+
+
+def heuristic(board, piece):
+    '''
+    Scores a position for the player to move without searching, from the
+    win lines only one player has pieces in. Kept within HEURISTIC_LIMIT so
+    it never looks like a forced win.
+
+    Args:
+        board (.game_logic.GameBoard): Position to score.
+        piece (str): Piece of the player to move.
+
+    Returns:
+        int: Positive if the position favours the player to move.
+    '''
+    counts = board._line_counts
+    lines = len(WIN_LINES)
+    mine = board._line_offset(piece)
+    theirs = board._line_offset(other_piece(piece))
+    score = 0
+    for line in range(lines):
+        own, opponent = counts[mine + line], counts[theirs + line]
+        if not opponent:
+            score += own * own
+        elif not own:
+            score -= opponent * opponent
+    return max(-HEURISTIC_LIMIT, min(HEURISTIC_LIMIT, score // 4))
+
+
+def negamax(board, piece, depth, alpha=-WIN_SCORE, beta=WIN_SCORE):
+    '''
+    Scores a position for the player to move by alpha-beta search.
+
+    Wins score WIN_SCORE less the number of pieces on the board, so faster
+    wins score higher. Positions at the search horizon are scored by
+    heuristic.
+
+    Moves are made and taken back on the board in place, rather than on
+    copies, so it is left as it was but must not be used meanwhile.
+
+    Args:
+        board (.game_logic.GameBoard): Position to score.
+        piece (str): Piece of the player to move.
+        depth (int): Number of moves to search ahead.
+        alpha (int): Score the player to move is already sure of.
+        beta (int): Score the opponent is already sure of.
+
+    Returns:
+        int: Score for the player to move.
+    '''
+    if board.is_board_full():
+        return 0
+    if depth <= 0:
+        return heuristic(board, piece)
+
+    best = -WIN_SCORE
+    for column in COLUMN_ORDER:
+        if board._is_column_full(column):
+            continue
+        # Drops and lifts directly, skipping the move history, as the
+        # search puts everything back itself.
+        row, _ = board._drop_piece(piece, column)
+        if board._is_winning_move(row, column, piece):
+            score = WIN_SCORE - board.move_count
+            board._lift_piece(column)
+            return score
+        score = -negamax(board, other_piece(piece), depth - 1, -beta, -alpha)
+        board._lift_piece(column)
+        if score > best:
+            best = score
+        if best > alpha:
+            alpha = best
+        if alpha >= beta:
+            break
+    return best
+
+
+def best_move(board, piece, depth):
+    '''
+    Finds the best column for the player to move by alpha-beta search.
+
+    Args:
+        board (.game_logic.GameBoard): Position to search. Not changed.
+        piece (str): Piece of the player to move.
+        depth (int): Number of moves to search ahead.
+
+    Returns:
+        int: Zero based column of the best move, or None if the board is
+            full.
+        int: Score of the move for the player to move.
+    '''
+    board = board.copy()  # Searched in place, keeping the callers redo moves.
+    best_column, alpha = None, -WIN_SCORE - 1
+    for column in COLUMN_ORDER:
+        if board._is_column_full(column):
+            continue
+        win, _, _ = board.insert_piece(piece, column)
+        if win:
+            return column, WIN_SCORE - board.move_count
+        score = -negamax(
+            board, other_piece(piece), depth - 1, -WIN_SCORE, -alpha
+        )
+        board.undo_move()
+        if score > alpha:
+            best_column, alpha = column, score
+    return best_column, alpha
@@ -0,0 +1,128 @@
+import threading
+import unittest
+from unittest import mock
+
+from server.analysis import Analyzer, EvaluationCache
+from server.book import canonical_key
+from server.game_logic import GameBoard
+
+
+class TestEvaluationCache(unittest.TestCase):
+
+    def setUp(self):
+        self._cache = EvaluationCache(max_entries=2)
+
+    def test_get_miss_and_hit(self):
+        assert self._cache.get(1) is None
+        self._cache.put(1, (4, 0))
+
+        assert self._cache.get(1) == (4, 0)
+        assert self._cache.stats()['hits'] == 1
+        assert self._cache.stats()['misses'] == 1
+        assert self._cache.stats()['hit_rate'] == 0.5
+
+    def test_evicts_least_recently_used(self):
+        self._cache.put(1, (0, 0))
+        self._cache.put(2, (1, 0))
+        self._cache.get(1)
+
+        self._cache.put(3, (2, 0))
+
+        assert self._cache.get(2) is None
+        assert self._cache.get(1) == (0, 0)
+        assert len(self._cache) == 2
+        assert self._cache.stats()['evictions'] == 1
+
+
+class TestAnalyzer(unittest.TestCase):
+
+    def setUp(self):
+        self._analyzer = Analyzer(max_depth=3, time_budget=1)
+        self._board = GameBoard()
+
+    def tearDown(self):
+        self._analyzer.close()
+
+    def test_analyse_finds_win(self):
+        for column in range(4):
+            self._board.insert_piece('x', column)
+
+        assert self._analyzer.analyse(self._board, 'x')[0] == 4
+
+    def test_analyse_caches_mirror(self):
+        self._board.insert_piece('x', 1)
+        mirror = GameBoard()
+        mirror.insert_piece('x', 7)
+
+        column, score = self._analyzer.analyse(self._board, 'o')
+        mirror_column, mirror_score = self._analyzer.analyse(mirror, 'o')
+
+        assert mirror_column == 8 - column
+        assert mirror_score == score
+        assert self._analyzer.stats()['cache_hits'] == 1
+
+    def test_analyse_uses_book(self):
+        book = mock.Mock()
+        book.lookup.return_value = (2, 7)
+        self._analyzer._book = book
+
+        assert self._analyzer.analyse(self._board, 'x') == (2, 7)
+        assert self._analyzer.stats()['book_hits'] == 1
+
+    def test_analyse_stops_at_time_budget(self):
+        self._analyzer._time_budget = 0
+        self._analyzer._max_depth = 50
+
+        with mock.patch(
+            'server.analysis.best_move', return_value=(4, 0)
+        ) as patched_best_move:
+            self._analyzer.analyse(self._board, 'x')
+
+        patched_best_move.assert_called_once()
+
+    def test_submit(self):
+        done = threading.Event()
+        results = []
+
+        def callback(result):
+            results.append(result)
+            done.set()
+
+        self._analyzer.submit(self._board, 'x', callback)
+
+        assert done.wait(5)
+        key, _ = canonical_key(self._board, 'x')
+        assert results == [self._analyzer.cache.get(key)]
+
+    def test_submit_failure_calls_back_with_none(self):
+        results = []
+        done = threading.Event()
+
+        def callback(result):
+            results.append(result)
+            done.set()
+
+        with mock.patch.object(
+            Analyzer, 'analyse', side_effect=RuntimeError('boom')
+        ), mock.patch('builtins.print'):
+            assert self._analyzer.submit(self._board, 'x', callback)
+            assert done.wait(5)
+
+        assert results == [None]
+        assert self._analyzer.stats()['failures'] == 1
+
+    def test_submit_rejects_past_max_pending(self):
+        analyzer = Analyzer(max_pending=1)
+        release = threading.Event()
+        done = threading.Event()
+        with mock.patch.object(
+            Analyzer, 'analyse', side_effect=lambda *_: release.wait(5)
+        ):
+            assert analyzer.submit(self._board, 'x', lambda _: done.set())
+            assert not analyzer.submit(self._board, 'x', lambda _: None)
+            release.set()
+            assert done.wait(5)
+        analyzer.close()
+
+        assert analyzer.stats()['rejected'] == 1
+        assert analyzer.stats()['pending'] == 0
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from server.book import (
+    PositionBook, canonical_key, mirror_column, write_book
+)
+from server.build_book import build_entries, opening_positions
+from server.game_logic import GameBoard
+from server.solver import best_move
+
+
+class TestBook(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, 'book.bin')
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_canonical_key_mirror(self):
+        board, mirror = GameBoard(), GameBoard()
+        board.insert_piece('x', 1)
+        mirror.insert_piece('x', mirror_column(1))
+
+        key, mirrored = canonical_key(board, 'o')
+        mirror_key, mirror_mirrored = canonical_key(mirror, 'o')
+
+        assert key == mirror_key
+        assert mirrored != mirror_mirrored
+
+    def test_canonical_key_side_to_move(self):
+        board = GameBoard()
+
+        assert canonical_key(board, 'x')[0] != canonical_key(board, 'o')[0]
+
+    def test_lookup_mirrors_column(self):
+        board = GameBoard()
+        board.insert_piece('x', 1)
+        key, mirrored = canonical_key(board, 'o')
+        write_book(self._path, {key: (2 if not mirrored else 6, 5)})
+        book = PositionBook(self._path)
+
+        mirror = GameBoard()
+        mirror.insert_piece('x', 7)
+
+        assert book.lookup(board, 'o') == (2, 5)
+        assert book.lookup(mirror, 'o') == (6, 5)
+        assert book.lookup(GameBoard(), 'x') is None
+        book.close()
+
+    def test_lookup_with_collisions(self):
+        # Keys 1, 65, 129 and 193 all hash to the same slot.
+        entries = {key: (key % 9, key % 100) for key in range(1, 200, 8)}
+        write_book(self._path, entries)
+        book = PositionBook(self._path)
+
+        for key, entry in entries.items():
+            with mock.patch(
+                'server.book.canonical_key', return_value=(key, False)
+            ):
+                assert book.lookup(None, 'x') == entry
+        assert len(book) == len(entries)
+        book.close()
+
+    def test_not_a_book(self):
+        with open(self._path, 'wb') as book_file:
+            book_file.write(b'\0' * 64)
+
+        with self.assertRaises(ValueError):
+            PositionBook(self._path)
+
+    def test_opening_positions_skip_mirrors(self):
+        positions = opening_positions(1)
+
+        # The empty board, and drops in columns 1 to 5.
+        assert len(positions) == 6
+
+    def test_built_book_matches_search(self):
+        write_book(self._path, build_entries(2, 2, 5, 4, seed=1))
+        book = PositionBook(self._path)
+
+        for board, piece in opening_positions(2):
+            column, score = book.lookup(board, piece)
+            _, searched = best_move(board, piece, 2)
+            assert score == searched
+            assert column in board.legal_columns()
+        book.close()
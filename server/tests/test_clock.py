@@ -0,0 +1,37 @@
+import unittest
+
+from server.clock import TurnClock
+
+
+class TestTurnClock(unittest.TestCase):
+
+    def setUp(self):
+        self._clock = TurnClock(base=60, increment=5)
+        self._clock.start(0, now=100)
+
+    def test_time_left_runs_down_for_running_player(self):
+        assert self._clock.time_left(0, now=110) == 50
+        assert self._clock.time_left(1, now=110) == 60
+
+    def test_switch_adds_increment(self):
+        self._clock.switch(now=110)
+
+        assert self._clock.running_player == 1
+        assert self._clock.time_left(0, now=120) == 55
+        assert self._clock.time_left(1, now=120) == 50
+
+    def test_deadline(self):
+        self._clock.switch(now=110)
+
+        assert self._clock.deadline() == 170
+
+    def test_time_left_never_negative(self):
+        assert self._clock.time_left(0, now=1000) == 0
+
+    def test_start_resets(self):
+        self._clock.switch(now=150)
+
+        self._clock.start(1, now=200)
+
+        assert self._clock.remaining == [60, 60]
+        assert self._clock.running_player == 1
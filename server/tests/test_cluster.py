@@ -0,0 +1,127 @@
+import socket
+import time
+import unittest
+from unittest import mock
+
+from server.cluster import (
+    Coordinator, CoordinatorClient, CoordinatorServer, HashRing,
+    parse_address,
+)
+
+
+ROOMS = [f'room-{index}' for index in range(2000)]
+
+
+class TestHashRing(unittest.TestCase):
+
+    def test_empty_ring_has_no_owner(self):
+        assert HashRing().node_for('room') is None
+
+    def test_rooms_spread_over_nodes(self):
+        ring = HashRing(['a', 'b', 'c', 'd'])
+        counts = {}
+        for room in ROOMS:
+            node = ring.node_for(room)
+            counts[node] = counts.get(node, 0) + 1
+
+        assert len(ring) == 4
+        assert set(counts) == {'a', 'b', 'c', 'd'}
+        assert all(count > len(ROOMS) / 8 for count in counts.values())
+
+    def test_adding_node_only_moves_rooms_to_it(self):
+        ring = HashRing(['a', 'b', 'c', 'd'])
+        before = {room: ring.node_for(room) for room in ROOMS}
+        ring.add_node('e')
+        moved = [room for room in ROOMS if ring.node_for(room) != before[room]]
+
+        assert all(ring.node_for(room) == 'e' for room in moved)
+        # About a fifth of the rooms, not a reshuffle.
+        assert len(ROOMS) / 10 < len(moved) < len(ROOMS) * 3 / 10
+
+    def test_removing_node_only_moves_its_rooms(self):
+        ring = HashRing(['a', 'b', 'c', 'd'])
+        before = {room: ring.node_for(room) for room in ROOMS}
+        ring.remove_node('b')
+
+        for room in ROOMS:
+            if before[room] == 'b':
+                assert ring.node_for(room) in ('a', 'c', 'd')
+            else:
+                assert ring.node_for(room) == before[room]
+
+
+class TestCoordinator(unittest.TestCase):
+
+    def test_owner(self):
+        coordinator = Coordinator()
+        assert coordinator.owner('room') is None
+
+        coordinator.register('a', '127.0.0.1:8080')
+        coordinator.register('b', '127.0.0.1:8081')
+        node_id, address = coordinator.owner('room')
+
+        assert coordinator.nodes()[node_id] == address
+        coordinator.unregister(node_id)
+        assert coordinator.owner('room')[0] != node_id
+        coordinator.unregister('unknown')
+
+    def test_client_matches_coordinator(self):
+        coordinator = Coordinator()
+        server = CoordinatorServer(coordinator)
+        server.serve_in_thread()
+        client = CoordinatorClient(server.server_address)
+        try:
+            client.register('a', '127.0.0.1:8080')
+            client.register('b', '127.0.0.1:8081')
+            client.register('c', '127.0.0.1:8082')
+
+            assert client.nodes() == coordinator.nodes()
+            for room in ROOMS[:100]:
+                assert client.owner(room) == coordinator.owner(room)
+
+            client.unregister('b')
+            assert 'b' not in coordinator.nodes()
+            assert client.owner(ROOMS[0])[0] != 'b'
+        finally:
+            client.close()
+            server.close()
+
+    def test_owner_does_not_wait_on_dead_coordinator(self):
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        address = listener.getsockname()
+        listener.close()  # Nothing listens here now.
+        client = CoordinatorClient(address, max_backoff=30)
+
+        with mock.patch('builtins.print'):
+            start = time.monotonic()
+            assert client.owner('room') is None
+            while client._refreshing:
+                time.sleep(0.001)
+            assert client.owner('room') is None
+            elapsed = time.monotonic() - start
+
+        assert client.errors == 1
+        assert client._next_refresh > time.monotonic()  # Backing off.
+        assert elapsed < 1
+
+    def test_owner_refreshes_in_background(self):
+        coordinator = Coordinator()
+        coordinator.register('a', '127.0.0.1:8080')
+        server = CoordinatorServer(coordinator)
+        server.serve_in_thread()
+        client = CoordinatorClient(server.server_address)
+        try:
+            assert client.owner('room') is None  # Nothing fetched yet.
+            while client._refreshing:
+                time.sleep(0.001)
+
+            assert client.owner('room') == ('a', '127.0.0.1:8080')
+            assert client.stats() == {'nodes': 1, 'refreshes': 1, 'errors': 0}
+        finally:
+            client.close()
+            server.close()
+
+    def test_parse_address(self):
+        assert parse_address('127.0.0.1:7000') == ('127.0.0.1', 7000)
+        assert parse_address('[::1]:7000') == ('::1', 7000)
@@ -0,0 +1,115 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+from server import events
+from server.events import Event, EventBus, StreamSink, open_stream
+
+
+class TestEventBus(unittest.TestCase):
+
+    def setUp(self):
+        self._bus = EventBus()
+
+    def test_publish_shares_one_encoding(self):
+        received = []
+        self._bus.subscribe(received.append)
+        self._bus.subscribe(received.append)
+
+        event = self._bus.publish(events.MOVE, player=0, column=3)
+
+        assert received == [event, event]
+        assert event.encoded is event.encoded
+        assert json.loads(event.encoded) == {
+            'kind': 'move', 'sequence': 1, 'timestamp': event.timestamp,
+            'player': 0, 'column': 3,
+        }
+
+    def test_subscribe_to_kinds(self):
+        received = []
+        subscription = self._bus.subscribe(received.append, [events.WIN])
+        self._bus.publish(events.MOVE, player=0, column=3)
+        self._bus.publish(events.WIN, winner='One', loser='Two')
+        self._bus.unsubscribe(subscription)
+        self._bus.publish(events.WIN, winner='One', loser='Two')
+
+        assert [event.kind for event in received] == [events.WIN]
+
+    @unittest.mock.patch('builtins.print')
+    def test_failing_subscriber_does_not_stop_others(self, _):
+        received = []
+        self._bus.subscribe(lambda event: 1 / 0)
+        self._bus.subscribe(received.append)
+
+        self._bus.publish(events.JOIN, player=0, name='One')
+
+        assert len(received) == 1
+        assert self._bus.stats() == {
+            'published': 1, 'subscribers': 2, 'errors': 1,
+        }
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            Event('explode', 1, 0.0, {})
+
+
+class TestStreamSink(unittest.TestCase):
+
+    def test_writes_events_to_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'events.jsonl')
+            bus = EventBus()
+            sink = StreamSink(open_stream(path))
+            bus.subscribe(sink)
+            bus.publish(events.JOIN, player=0, name='One')
+            bus.publish(events.JOIN, player=1, name='Two')
+            sink.close()
+
+            with open(path) as stream:
+                lines = [json.loads(line) for line in stream]
+        assert [line['name'] for line in lines] == ['One', 'Two']
+        assert sink.stats() == {'pending': 0, 'written': 2, 'dropped': 0}
+
+    def test_slow_consumer_drops_instead_of_blocking(self):
+        release = threading.Event()
+
+        class StuckStream:
+            def writelines(self, lines):
+                release.wait()
+
+            def flush(self):
+                pass
+
+            def close(self):
+                pass
+
+        bus = EventBus()
+        sink = StreamSink(StuckStream(), max_pending=2)
+        bus.subscribe(sink)
+        for column in range(10):
+            bus.publish(events.MOVE, player=0, column=column)
+        release.set()
+        sink.close()
+
+        # One batch may be in the writer, at most two wait behind it.
+        assert sink.dropped >= 10 - 3
+        assert sink.written + sink.dropped == 10
+
+    def test_writes_events_to_unix_socket(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'events.sock')
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(path)
+            listener.listen()
+            sink = StreamSink(open_stream(f'unix://{path}'))
+            consumer, _ = listener.accept()
+            sink(EventBus().publish(events.DRAW, players=['One', 'Two']))
+            sink.close()
+
+            data = consumer.makefile('rb').read()
+            consumer.close()
+            listener.close()
+        assert json.loads(data)['kind'] == events.DRAW
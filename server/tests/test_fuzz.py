@@ -0,0 +1,79 @@
+import random
+import unittest
+
+from server.fuzz import (
+    NaiveBoard, find_mismatch, fuzz_batch, load_engine, minimise,
+    random_moves, run_fuzz
+)
+from server.game_errors import ColumnFullError
+from server.game_logic import GameBoard
+
+
+class MissesHighWins(GameBoard):
+    '''Buggy engine: never reports a win in the top row.'''
+    __slots__ = ()
+
+    def insert_piece(self, piece, column):
+        win, row, column = super().insert_piece(piece, column)
+        return win and row > 0, row, column
+
+
+class TestFuzz(unittest.TestCase):
+
+    def test_naive_board(self):
+        board = NaiveBoard()
+        for column in range(4):
+            assert board.insert_piece('x', column) == (False, 5, column)
+
+        assert board.insert_piece('x', 4) == (True, 5, 4)
+
+    def test_naive_board_column_full(self):
+        board = NaiveBoard()
+        for _ in range(6):
+            board.insert_piece('x', 0)
+
+        with self.assertRaises(ColumnFullError):
+            board.insert_piece('x', 0)
+
+    def test_naive_board_agrees_with_game_board(self):
+        _, moves, _ = fuzz_batch('naive', seed=0, sequences=300)
+
+        assert moves is None
+
+    def test_random_moves_alternate_pieces(self):
+        moves = random_moves(random.Random(1), max_moves=20)
+
+        assert 1 <= len(moves) <= 20
+        assert [piece for piece, _ in moves[:2]] == ['x', 'o'][:len(moves)]
+
+    def test_find_mismatch(self):
+        moves = [('x', column) for column in range(5)]
+
+        assert find_mismatch(moves, GameBoard) is None
+        assert find_mismatch(moves, NaiveBoard) is None
+
+    def test_find_mismatch_column_full(self):
+        moves = [('x', 0)] * 7
+
+        assert find_mismatch(moves, NaiveBoard) is None
+
+    def test_minimise(self):
+        moves = list(range(40))
+
+        assert minimise(moves, lambda moves: 7 in moves) == [7]
+        assert minimise(
+            moves, lambda moves: 3 in moves and 30 in moves
+        ) == [3, 30]
+
+    def test_run_fuzz_finds_and_minimises_bug(self):
+        engine = f'{__name__}:MissesHighWins'
+
+        _, moves, mismatch = run_fuzz(
+            engine, sequences=2000, workers=1, batch_size=500, max_moves=200
+        )
+
+        assert moves is not None
+        assert 'expected ((True, 0' in mismatch
+        # Five pieces at the top need at least a few moves below them.
+        assert len(moves) < 40
+        assert find_mismatch(moves, load_engine(engine)) == mismatch
@@ -1,7 +1,10 @@
+import random
 import unittest
 
-from server.game_logic import GameBoard
-from server.game_errors import ColumnFullError
+from server.game_logic import (
+    CELL_LINES, COLUMNS, WIN_LINES, GameBoard, zobrist_hash
+)
+from server.game_errors import ColumnFullError, NoMoveError
 
 
 class TestGameBoard(unittest.TestCase):
@@ -10,23 +13,8 @@ class TestGameBoard(unittest.TestCase):
         self._board = GameBoard()
 
     def _fill_column(self, column):
-        for i in range(6):
-            self._board._game_board[i][column] = 'x'
-
-    def _fill_row(self, row):
-        self._board._game_board[row] = ['x' for _ in range(9)]
-
-    def _fill_positive_diagonal(self):
-        for i in range(8, 3, -1):
-            for j, k in zip(range(6), range(i, i - 5, -1)):
-                self._board._game_board[j][k] = 'x'
-                self._board._game_board[j + 1][k] = 'x'
-
-    def _fill_negative_diagonal(self):
-        for i in range(5):
-            for j, k in zip(range(6), range(i, i + 5)):
-                self._board._game_board[j][k] = 'x'
-                self._board._game_board[j + 1][k] = 'x'
+        for _ in range(6):
+            self._board.insert_piece('x', column)
 
     def test_is_column_full_returns_true(self):
         self._fill_column(0)
@@ -42,88 +30,6 @@ class TestGameBoard(unittest.TestCase):
             self._board._drop_piece('x', 0) == (expected_row, expected_column)
         )
 
-    def test_is_vertical_match_same_piece(self):
-        self._fill_column(0)
-
-        assert self._board._is_vertical_match(0, 'x') is True
-
-    def test_is_vertical_match_diff_piece(self):
-        self._fill_column(0)
-
-        assert self._board._is_vertical_match(0, 'o') is False
-
-    def test_is_vertical_match_empty(self):
-        assert self._board._is_vertical_match(0, 'x') is False
-
-    def test_is_vertical_match_diff_piece_in_middle(self):
-        self._board._game_board[1][0] = 'x'
-        self._board._game_board[1][0] = 'o'
-        self._board._game_board[1][0] = 'x'
-        self._board._game_board[1][0] = 'o'
-        self._board._game_board[1][0] = 'x'
-
-        assert self._board._is_vertical_match(0, 'x') is False
-
-    def test_is_horizontal_match_same_piece(self):
-        self._fill_row(5)
-
-        assert self._board._is_horizontal_match(5, 'x') is True
-
-    def test_is_horizontal_match_diff_piece(self):
-        self._fill_row(5)
-
-        assert self._board._is_horizontal_match(5, 'o') is False
-
-    def test_is_horizontal_match_empty(self):
-        assert self._board._is_horizontal_match(5, 'x') is False
-
-    def test_is_horizontal_match_diff_piece_in_middle(self):
-        self._board._game_board[5] = [
-            'x', 'x', 'o', 'x', 'x', ' ', ' ', ' ', ' '
-        ]
-
-        assert self._board._is_horizontal_match(5, 'x') is False
-
-    def test_is_positive_diagonal_match_same_piece(self):
-        self._fill_positive_diagonal()
-
-        assert self._board._is_positive_diagonal_match(3, 4, 'x') is True
-
-    def test_is_positive_diagonal_match_diff_piece(self):
-        self._fill_positive_diagonal()
-
-        assert self._board._is_positive_diagonal_match(3, 4, 'o') is False
-
-    def test_is_positive_diagonal_match_empty(self):
-        assert self._board._is_positive_diagonal_match(3, 4, 'x') is False
-
-    def test_is_positive_diagonal_match_diff_piece_in_middle(self):
-        self._board._game_board[3] = [
-            'o', 'o', 'o', 'o', 'o', 'o', 'o', 'o', 'o'
-        ]
-
-        assert self._board._is_positive_diagonal_match(3, 4, 'x') is False
-
-    def test_is_negative_diagonal_match_same_piece(self):
-        self._fill_negative_diagonal()
-
-        assert self._board._is_negative_diagonal_match(3, 4, 'x') is True
-
-    def test_is_negative_diagonal_match_diff_piece(self):
-        self._fill_negative_diagonal()
-
-        assert self._board._is_negative_diagonal_match(3, 4, 'o') is False
-
-    def test_is_negative_diagonal_match_empty(self):
-        assert self._board._is_negative_diagonal_match(3, 4, 'x') is False
-
-    def test_is_negative_diagonal_match_diff_piece_in_middle(self):
-        self._board._game_board[3] = [
-            'o', 'o', 'o', 'o', 'o', 'o', 'o', 'o', 'o'
-        ]
-
-        assert self._board._is_negative_diagonal_match(3, 4, 'x') is False
-
     def test_insert_piece_success(self):
         expected_win_value = False
         expected_row = 5
@@ -146,6 +52,248 @@ class TestGameBoard(unittest.TestCase):
 
         self._board.reset_game()
 
-        for row in self._board._game_board:
-            for actual_value in row:
-                assert expected_value == actual_value
+        for actual_value in self._board._game_board:
+            assert expected_value == chr(actual_value)
+
+    def test_win_lines_count(self):
+        # 30 horizontal, 18 vertical and 10 of each diagonal.
+        assert len(WIN_LINES) == 68
+
+    def test_cell_lines_only_hold_lines_through_cell(self):
+        for row, columns in enumerate(CELL_LINES):
+            for column, lines in enumerate(columns):
+                for line in lines:
+                    assert (row, column) in WIN_LINES[line]
+
+    def test_insert_piece_vertical_win(self):
+        for _ in range(4):
+            assert self._board.insert_piece('x', 2)[0] is False
+
+        assert self._board.insert_piece('x', 2)[0] is True
+
+    def test_insert_piece_horizontal_win(self):
+        for column in (0, 1, 3, 4):
+            assert self._board.insert_piece('o', column)[0] is False
+
+        assert self._board.insert_piece('o', 2)[0] is True
+
+    def test_insert_piece_interrupted_vertical_line(self):
+        self._board.insert_piece('x', 0)
+        self._board.insert_piece('o', 0)
+        for _ in range(4):
+            assert self._board.insert_piece('x', 0)[0] is False
+
+    def test_insert_piece_interrupted_horizontal_line(self):
+        for column, piece in enumerate('xxoxx'):
+            assert self._board.insert_piece(piece, column)[0] is False
+        for column in (5, 6):
+            assert self._board.insert_piece('x', column)[0] is False
+
+        assert self._board.insert_piece('x', 7)[0] is True
+
+    def test_insert_piece_other_players_pieces_do_not_count(self):
+        for column in range(4):
+            self._board.insert_piece('x', column)
+
+        assert self._board.insert_piece('o', 4)[0] is False
+        assert self._board.insert_piece('x', 4)[0] is False
+
+    def test_insert_piece_positive_diagonal_win(self):
+        # Builds a staircase of 'o' rising to the right.
+        for column in range(5):
+            for _ in range(column):
+                self._board.insert_piece('o', column)
+        for column in range(4):
+            assert self._board.insert_piece('x', column)[0] is False
+
+        assert self._board.insert_piece('x', 4)[0] is True
+
+    def test_insert_piece_interrupted_diagonal_line(self):
+        for column in range(5):
+            for _ in range(column):
+                self._board.insert_piece('o', column)
+        for column, piece in enumerate('xxoxx'):
+            assert self._board.insert_piece(piece, column)[0] is False
+
+    def test_insert_piece_diagonal_win(self):
+        # Builds a staircase of 'o' so 'x' lands on a diagonal.
+        for column, height in zip(range(5), range(4, -1, -1)):
+            for _ in range(height):
+                self._board.insert_piece('o', column)
+        for column in range(1, 5):
+            assert self._board.insert_piece('x', column)[0] is False
+
+        assert self._board.insert_piece('x', 0)[0] is True
+
+    def test_insert_piece_no_win_after_reset(self):
+        for _ in range(4):
+            self._board.insert_piece('x', 2)
+        self._board.reset_game()
+
+        assert self._board.insert_piece('x', 2)[0] is False
+
+    def test_drop_piece_stacks_on_column(self):
+        self._board._drop_piece('x', 0)
+
+        assert self._board._drop_piece('o', 0) == (4, 0)
+
+    def test_is_board_full_returns_false(self):
+        self._fill_column(0)
+
+        assert self._board.is_board_full() is False
+
+    def test_is_board_full_returns_true(self):
+        for column in range(9):
+            self._fill_column(column)
+
+        assert self._board.is_board_full() is True
+
+    def test_reset_game_clears_move_count(self):
+        for column in range(9):
+            self._fill_column(column)
+
+        self._board.reset_game()
+
+        assert self._board.is_board_full() is False
+        assert self._board._is_column_full(0) is False
+
+    def test_game_board_renders_pieces(self):
+        self._board.insert_piece('x', 0)
+        self._board.insert_piece('o', 8)
+
+        rows = self._board.game_board.split('\n')
+
+        assert len(rows) == 7
+        assert rows[5].startswith('[ x ] [   ] ')
+        assert rows[5].endswith('[   ] [ o ] ')
+
+    def test_copy_is_independent(self):
+        self._board.insert_piece('x', 0)
+
+        board = self._board.copy()
+        board.insert_piece('o', 0)
+
+        assert self._board.move_count == 1
+        assert board.move_count == 2
+        assert self._board.spaces != board.spaces
+
+    def test_legal_columns(self):
+        self._fill_column(3)
+
+        assert self._board.legal_columns() == [0, 1, 2, 4, 5, 6, 7, 8]
+
+    def _play_random_game(self, rng, board):
+        piece = 'x'
+        while board.legal_columns():
+            win, _, _ = board.insert_piece(
+                piece, rng.choice(board.legal_columns())
+            )
+            yield
+            if win:
+                return
+            piece = 'o' if piece == 'x' else 'x'
+
+    def test_zobrist_hash_matches_recomputation(self):
+        for seed in range(50):
+            board = GameBoard()
+            for _ in self._play_random_game(random.Random(seed), board):
+                assert (board.zobrist_hash, board.mirror_hash) == (
+                    zobrist_hash(board.spaces)
+                )
+
+    def test_mirror_hash_is_hash_of_mirror_image(self):
+        for seed in range(50):
+            rng = random.Random(seed)
+            board, mirror = GameBoard(), GameBoard()
+            piece = 'x'
+            for _ in range(rng.randrange(1, 30)):
+                column = rng.choice(board.legal_columns())
+                board.insert_piece(piece, column)
+                mirror.insert_piece(piece, COLUMNS - 1 - column)
+                piece = 'o' if piece == 'x' else 'x'
+
+            assert board.mirror_hash == mirror.zobrist_hash
+            assert board.canonical_key() == mirror.canonical_key()
+
+    def test_zobrist_hash_depends_on_order_only_through_position(self):
+        board = GameBoard()
+        for piece, column in (('x', 0), ('o', 1), ('x', 2)):
+            board.insert_piece(piece, column)
+        other = GameBoard()
+        for piece, column in (('x', 2), ('o', 1), ('x', 0)):
+            other.insert_piece(piece, column)
+
+        assert board.zobrist_hash == other.zobrist_hash
+
+    def test_zobrist_hash_reset_and_copy(self):
+        self._board.insert_piece('x', 3)
+        board = self._board.copy()
+
+        self._board.reset_game()
+
+        assert board.zobrist_hash == zobrist_hash(board.spaces)[0]
+        assert self._board.zobrist_hash == 0
+        assert self._board.mirror_hash == 0
+
+    def test_undo_move_restores_state(self):
+        for seed in range(20):
+            rng = random.Random(seed)
+            board = GameBoard()
+            states = []
+            for _ in self._play_random_game(rng, board):
+                states.append(board.copy())
+            states.pop()
+
+            while states:
+                board.undo_move()
+                state = states.pop()
+                assert board.spaces == state.spaces
+                assert board._line_counts == state._line_counts
+                assert board._column_heights == state._column_heights
+                assert board.move_count == state.move_count
+                assert board.zobrist_hash == state.zobrist_hash
+                assert board.mirror_hash == state.mirror_hash
+
+    def test_undo_move_returns_move(self):
+        self._board.insert_piece('x', 2)
+        self._board.insert_piece('o', 2)
+
+        assert self._board.undo_move() == ('o', 2)
+        assert self._board.moves == bytes([2])
+
+    def test_undo_move_empty(self):
+        with self.assertRaises(NoMoveError):
+            self._board.undo_move()
+
+    def test_redo_move(self):
+        self._board.insert_piece('x', 0)
+        for column in range(1, 4):
+            self._board.insert_piece('x', column)
+        self._board.insert_piece('x', 4)
+        self._board.undo_move()
+        self._board.undo_move()
+
+        self._board.redo_move()
+        win, row, column = self._board.redo_move()
+
+        assert (win, row, column) == (True, 5, 4)
+        assert self._board.moves == bytes([0, 1, 2, 3, 4])
+
+    def test_insert_piece_clears_redo(self):
+        self._board.insert_piece('x', 0)
+        self._board.undo_move()
+        self._board.insert_piece('o', 1)
+
+        with self.assertRaises(NoMoveError):
+            self._board.redo_move()
+
+    def test_reset_game_clears_history(self):
+        self._board.insert_piece('x', 0)
+        self._board.insert_piece('o', 1)
+        self._board.undo_move()
+
+        self._board.reset_game()
+
+        assert self._board.moves == b''
+        with self.assertRaises(NoMoveError):
+            self._board.redo_move()
@@ -1,9 +1,24 @@
-import queue
+import os
+import select
 import socket
+import subprocess
+import sys
+import tempfile
+import threading
 import unittest
+from collections import deque
 
-from server.game_server import GameServer
-from server.game_logic import GameBoard
+from common import protocol
+from common.transport import Transport
+from server.analysis import Analyzer
+from server.cluster import Coordinator
+from server.events import EventBus
+from server.game_server import HINTS_BUSY_MESSAGE, GameServer
+from server.handoff import receive_listeners
+from server.profiling import Profiler
+from server.rate_limit import RateLimiter
+from server.rules import RulesEngine
+from server.session import Session
 
 
 HOST = '127.0.0.1'
@@ -17,6 +32,13 @@ class TestGameServer(unittest.TestCase):
     def setUp(self, _, __):
         self._server = GameServer(HOST, PORT)
 
+    def _seat(self, name, player_index=0):
+        '''Seats a player as if they had joined, returning their socket.'''
+        sock = unittest.mock.Mock()
+        self._server._client_names[player_index] = name
+        self._server._sessions[sock] = Session(player_index, name, sock)
+        return sock
+
     def test_is_active_player(self):
         expected_value = True
         actual_value = self._server._is_active_player(0)
@@ -45,9 +67,9 @@ class TestGameServer(unittest.TestCase):
     )
     def test_read_client_data(self, patched_parse):
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._server._message_queues[sock] = queue.Queue()
+        self._server._message_queues[sock] = deque()
 
-        data = b'input'
+        data = b'input\n'
 
         self._server._read_client_data(sock, data)
 
@@ -62,10 +84,10 @@ class TestGameServer(unittest.TestCase):
         self, patched_start_game, patched_parse
     ):
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._server._message_queues[sock] = queue.Queue()
+        self._server._message_queues[sock] = deque()
         self._server._connected_clients = 2
 
-        data = b'input'
+        data = b'input\n'
 
         self._server._read_client_data(sock, data)
 
@@ -73,6 +95,21 @@ class TestGameServer(unittest.TestCase):
         patched_start_game.assert_called_once()
         assert sock in self._server._outputs
 
+    @unittest.mock.patch.object(
+        GameServer, '_parse_command', return_value='response'
+    )
+    def test_read_client_data_lines(self, patched_parse):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server._message_queues[sock] = deque()
+
+        self._server._read_client_data(sock, b'Name,board\nName,tu')
+        self._server._read_client_data(sock, b'rn\r\n')
+
+        assert [call.args[0] for call in patched_parse.call_args_list] == [
+            'Name,board', 'Name,turn',
+        ]
+        assert sock not in self._server._framed
+
     @unittest.mock.patch('socket.socket.close')
     @unittest.mock.patch.object(GameServer, '_end_game_if_started')
     def test_disconnect_client(
@@ -80,7 +117,7 @@ class TestGameServer(unittest.TestCase):
     ):
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._server._inputs.append(sock)
-        self._server._message_queues[sock] = queue.Queue()
+        self._server._message_queues[sock] = deque()
 
         self._server._disconnect_client(sock)
 
@@ -95,7 +132,7 @@ class TestGameServer(unittest.TestCase):
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._server._inputs.append(sock)
         self._server._outputs.append(sock)
-        self._server._message_queues[sock] = queue.Queue()
+        self._server._message_queues[sock] = deque()
 
         self._server._disconnect_client(sock)
 
@@ -110,7 +147,7 @@ class TestGameServer(unittest.TestCase):
     ):
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._server._inputs.append(sock)
-        self._server._message_queues[sock] = queue.Queue()
+        self._server._message_queues[sock] = deque()
 
         self._server._handle_client_exception(sock)
 
@@ -125,7 +162,7 @@ class TestGameServer(unittest.TestCase):
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._server._inputs.append(sock)
         self._server._outputs.append(sock)
-        self._server._message_queues[sock] = queue.Queue()
+        self._server._message_queues[sock] = deque()
 
         self._server._handle_client_exception(sock)
 
@@ -137,105 +174,101 @@ class TestGameServer(unittest.TestCase):
         self._server._shut_down()
         assert len(self._server._inputs) == 0
 
-    @unittest.mock.patch('queue.Queue.put')
-    def test_end_game_if_started(self, patched_put):
+    def test_end_game_if_started(self):
         sock_one = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock_two = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._server._inputs.append(sock_one)
         self._server._inputs.append(sock_two)
-        self._server._message_queues[sock_one] = queue.Queue()
-        self._server._message_queues[sock_two] = queue.Queue()
+        self._server._message_queues[sock_one] = deque()
+        self._server._message_queues[sock_two] = deque()
         self._server._game_started = True
 
         self._server._end_game_if_started(sock_one)
 
-        patched_put.assert_called_once()
+        assert len(self._server._message_queues[sock_one]) == 0
+        assert len(self._server._message_queues[sock_two]) == 1
 
-    @unittest.mock.patch('queue.Queue.put')
-    def test_end_game_if_started_game_not_started(self, patched_put):
+    @unittest.mock.patch.object(GameServer, '_queue_message')
+    def test_end_game_if_started_game_not_started(self, patched_queue):
         self._server._end_game_if_started(None)
 
-        patched_put.assert_not_called()
+        patched_queue.assert_not_called()
 
     @unittest.mock.patch.object(GameServer, '_help_text')
     def test_parse_command_help(self, patched_help_text):
         test_name = 'Name'
         test_command = 'help'
-        self._server._client_names[0] = test_name
+        sock = self._seat(test_name)
         test_input = f'{test_name},{test_command}'
 
-        self._server._parse_command(test_input, None)
+        self._server._parse_command(test_input, sock)
 
         patched_help_text.assert_called_once()
 
-    @unittest.mock.patch.object(
-        GameBoard, 'game_board', new_callable=unittest.mock.PropertyMock
-    )
+    @unittest.mock.patch.object(RulesEngine, 'render')
     def test_parse_command_board_game_not_started(self, patched_game_board):
         test_name = 'Name'
         test_command = 'board'
-        self._server._client_names[0] = test_name
+        sock = self._seat(test_name)
         test_input = f'{test_name},{test_command}'
 
-        self._server._parse_command(test_input, None)
+        self._server._parse_command(test_input, sock)
 
         patched_game_board.assert_not_called()
 
-    @unittest.mock.patch.object(
-        GameBoard, 'game_board', new_callable=unittest.mock.PropertyMock
-    )
+    @unittest.mock.patch.object(RulesEngine, 'render')
     def test_parse_command_board_game_started(self, patched_game_board):
         test_name = 'Name'
         test_command = 'board'
-        self._server._client_names[0] = test_name
+        sock = self._seat(test_name)
         self._server._game_started = True
         test_input = f'{test_name},{test_command}'
 
-        self._server._parse_command(test_input, None)
+        self._server._parse_command(test_input, sock)
 
         patched_game_board.assert_called_once()
 
     def test_parse_command_turn(self):
         test_name = 'Name'
         test_command = 'turn'
-        self._server._client_names[0] = test_name
+        sock = self._seat(test_name)
         self._server._game_started = True
         test_input = f'{test_name},{test_command}'
 
-        output = self._server._parse_command(test_input, None)
+        output = self._server._parse_command(test_input, sock)
 
         assert output == 'It is Names turn.'
 
     def test_parse_command_digit_not_active_player(self):
         test_name = 'Name'
         test_command = '1'
-        self._server._client_names[1] = test_name
+        sock = self._seat(test_name, 1)
         self._server._game_started = False
         test_input = f'{test_name},{test_command}'
 
-        output = self._server._parse_command(test_input, None)
+        output = self._server._parse_command(test_input, sock)
 
         assert output == 'Please wait for your turn.'
 
     def test_parse_command_digit_game_not_started(self):
         test_name = 'Name'
         test_command = '1'
-        self._server._client_names[0] = test_name
+        sock = self._seat(test_name)
         self._server._game_started = False
         test_input = f'{test_name},{test_command}'
 
-        output = self._server._parse_command(test_input, None)
+        output = self._server._parse_command(test_input, sock)
 
         assert output == 'Game has not started.'
 
     def test_parse_command_digit_game_invalid_number(self):
         test_name = 'Name'
         test_command = '0'
-        self._server._client_names[0] = test_name
+        sock = self._seat(test_name)
         self._server._game_started = True
         test_input = f'{test_name},{test_command}'
 
-        output = self._server._parse_command(test_input, None)
+        output = self._server._parse_command(test_input, sock)
 
         assert output == "That's an invalid number. Try again."
 
@@ -245,11 +278,11 @@ class TestGameServer(unittest.TestCase):
     ):
         test_name = 'Name'
         test_command = '1'
-        self._server._client_names[0] = test_name
+        sock = self._seat(test_name)
         self._server._game_started = True
         test_input = f'{test_name},{test_command}'
 
-        self._server._parse_command(test_input, None)
+        self._server._parse_command(test_input, sock)
 
         patched_manage_piece_drop.assert_called_once()
 
@@ -279,13 +312,50 @@ class TestGameServer(unittest.TestCase):
     def test_parse_command_invalid(self):
         test_name = 'Name'
         test_command = 'invalid'
-        self._server._client_names[0] = test_name
+        sock = self._seat(test_name)
         test_input = f'{test_name},{test_command}'
 
-        output = self._server._parse_command(test_input, None)
+        output = self._server._parse_command(test_input, sock)
+
+        assert output == 'Invalid command, try again.'
+
+    def test_parse_command_unknown_name(self):
+        sock = self._seat('Name')
+
+        output = self._server._parse_command('Other,board', sock)
 
         assert output == 'Invalid command, try again.'
 
+    def test_parse_command_name_without_seat(self):
+        self._server._client_names[0] = 'Name'
+
+        output = self._server._parse_command('Name,board', None)
+
+        assert output == 'Invalid command, try again.'
+
+    def test_parse_command_extra_commas(self):
+        sock = self._seat('Name')
+
+        output = self._server._parse_command('Name,board,disconnect', sock)
+
+        assert output == 'Invalid command, try again.'
+
+    def test_parse_command_seated_client_cannot_join_again(self):
+        sock = self._seat('Name')
+
+        output = self._server._parse_command('Other', sock)
+
+        assert output == 'Invalid command, try again.'
+        assert self._server._client_names == ['Name', '']
+
+    @unittest.mock.patch.object(GameServer, '_queue_message')
+    def test_read_client_data_invalid_utf8(self, patched_queue):
+        self._server._read_client_data(None, b'\xff\xfe\n')
+
+        patched_queue.assert_called_once_with(
+            None, 'Invalid command, try again.'
+        )
+
     def test_cannot_send_to_sock_false(self):
         sock_one = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock_two = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -319,48 +389,1161 @@ class TestGameServer(unittest.TestCase):
         assert expected_active_player == self._server._active_player
         assert expected_game_started == self._server._game_started
 
-    @unittest.mock.patch('queue.Queue.put')
-    def test_send_loss(self, patched_put):
+    def test_send_loss(self):
         sock_one = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock_two = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._server._inputs.append(sock_one)
         self._server._inputs.append(sock_two)
-        self._server._message_queues[sock_one] = queue.Queue()
-        self._server._message_queues[sock_two] = queue.Queue()
+        self._server._message_queues[sock_one] = deque()
+        self._server._message_queues[sock_two] = deque()
 
         self._server._send_loss(sock_one)
 
-        patched_put.assert_called_once()
+        assert list(self._server._message_queues[sock_two]) == ['You lost.']
 
-    @unittest.mock.patch('queue.Queue.put')
-    def test_send_loss_no_clients_to_send_to(self, patched_put):
+    @unittest.mock.patch.object(GameServer, '_queue_message')
+    def test_send_loss_no_clients_to_send_to(self, patched_queue):
         sock_one = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._server._inputs.append(sock_one)
-        self._server._message_queues[sock_one] = queue.Queue()
+        self._server._message_queues[sock_one] = deque()
 
         self._server._send_loss(sock_one)
 
-        patched_put.assert_not_called()
+        patched_queue.assert_not_called()
 
-    @unittest.mock.patch('queue.Queue.put')
-    def test_send_board_to_other_player(self, patched_put):
+    def test_send_board_to_other_player(self):
         sock_one = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock_two = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._server._inputs.append(sock_one)
         self._server._inputs.append(sock_two)
-        self._server._message_queues[sock_one] = queue.Queue()
-        self._server._message_queues[sock_two] = queue.Queue()
+        self._server._message_queues[sock_one] = deque()
+        self._server._message_queues[sock_two] = deque()
 
         self._server._send_board_to_other_player(sock_one)
 
-        patched_put.assert_called_once()
+        assert len(self._server._message_queues[sock_two]) == 1
+        assert sock_two in self._server._outputs
 
-    @unittest.mock.patch('queue.Queue.put')
-    def test_send_board_to_other_player_no_other_player(self, patched_put):
+    @unittest.mock.patch.object(GameServer, '_queue_message')
+    def test_send_board_to_other_player_no_other_player(
+        self, patched_queue
+    ):
         sock_one = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._server._inputs.append(sock_one)
-        self._server._message_queues[sock_one] = queue.Queue()
+        self._server._message_queues[sock_one] = deque()
 
         self._server._send_board_to_other_player(sock_one)
 
-        patched_put.assert_not_called()
+        patched_queue.assert_not_called()
+
+    def test_end_game_as_draw(self):
+        sock_one = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock_two = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server._inputs.append(sock_one)
+        self._server._inputs.append(sock_two)
+        self._server._message_queues[sock_one] = deque()
+        self._server._message_queues[sock_two] = deque()
+        self._server._game.insert_piece('x', 0)
+
+        output = self._server._end_game_as_draw(sock_one)
+
+        assert output == 'The board is full. The game is a draw.'
+        assert list(self._server._message_queues[sock_two]) == [output]
+        assert self._server._game._move_count == 0
+
+    @unittest.mock.patch.object(GameServer, '_end_game_as_draw')
+    @unittest.mock.patch.object(RulesEngine, 'is_draw', return_value=True)
+    def test_manage_piece_drop_draw(self, _, patched_end_game_as_draw):
+        self._server._game_started = True
+
+        self._server._manage_piece_drop(0, 1, None)
+
+        patched_end_game_as_draw.assert_called_once_with(None)
+
+    def _add_client(self, name):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server._inputs.append(sock)
+        self._server._message_queues[sock] = deque()
+        self._server._parse_command(name, sock)
+        return sock
+
+    def test_name_new_client_gives_resume_token(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+        output = self._server._name_new_client('Name', sock)
+
+        token = self._server._sessions[sock].token
+        assert output.endswith(f'Resume token: {token}')
+
+    def test_name_new_client_fills_free_seat(self):
+        self._server._client_names = ['', 'Other']
+        self._server._connected_clients = 1
+
+        self._server._name_new_client('Name', None)
+
+        assert self._server._client_names == ['Name', 'Other']
+
+    @unittest.mock.patch('socket.socket.close')
+    def test_disconnect_client_parks_session(self, _):
+        sock_one = self._add_client('One')
+        sock_two = self._add_client('Two')
+
+        self._server._disconnect_client(sock_one)
+
+        assert self._server._game_started is True
+        assert len(self._server._parked_sessions) == 1
+        assert 'One lost connection' in self._server._message_queues[
+            sock_two
+        ][-1]
+
+    @unittest.mock.patch('socket.socket.close')
+    def test_disconnect_client_frees_seat_before_game(self, _):
+        sock = self._add_client('One')
+
+        self._server._disconnect_client(sock)
+
+        assert self._server._connected_clients == 0
+        assert self._server._client_names == ['', '']
+
+    @unittest.mock.patch('socket.socket.close')
+    def test_expire_parked_sessions(self, _):
+        sock_one = self._add_client('One')
+        self._add_client('Two')
+        self._server._disconnect_client(sock_one)
+
+        self._server._scheduler.run_due(float('inf'))
+
+        assert self._server._game_started is False
+        assert len(self._server._parked_sessions) == 0
+        assert self._server._client_names == ['', 'Two']
+
+    @unittest.mock.patch('socket.socket.close')
+    def test_expire_parked_sessions_in_grace_period(self, _):
+        sock_one = self._add_client('One')
+        self._add_client('Two')
+        self._server._disconnect_client(sock_one)
+
+        self._server._scheduler.run_due(0)
+
+        assert self._server._game_started is True
+        assert len(self._server._parked_sessions) == 1
+
+    @unittest.mock.patch('socket.socket.close')
+    def test_max_parked_sessions(self, _):
+        self._server._max_parked = 0
+        sock_one = self._add_client('One')
+        sock_two = self._add_client('Two')
+
+        self._server._disconnect_client(sock_one)
+
+        assert len(self._server._parked_sessions) == 0
+        assert self._server._client_names == ['', 'Two']
+        assert self._server._game_started is False
+        assert list(self._server._message_queues[sock_two])[-1] == (
+            'Player disconnected. Resetting Game.'
+        )
+        output = self._server._parse_command('Three', socket.socket())
+        assert output.startswith('Welcome Three!')
+
+    @unittest.mock.patch('socket.socket.close')
+    def test_parse_command_resume(self, _):
+        sock_one = self._add_client('One')
+        self._add_client('Two')
+        token = self._server._sessions[sock_one].token
+        self._server._disconnect_client(sock_one)
+        new_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+        output = self._server._parse_command(f'resume {token}', new_sock)
+
+        assert output.startswith('Welcome back One!')
+        assert self._server._sessions[new_sock].name == 'One'
+        assert len(self._server._parked_sessions) == 0
+
+    @unittest.mock.patch('socket.socket.close')
+    def test_resume_cancels_expiry(self, _):
+        sock_one = self._add_client('One')
+        self._add_client('Two')
+        token = self._server._sessions[sock_one].token
+        self._server._disconnect_client(sock_one)
+        new_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server._parse_command(f'resume {token}', new_sock)
+
+        self._server._scheduler.run_due(float('inf'))
+
+        assert self._server._game_started is True
+        assert self._server._client_names == ['One', 'Two']
+
+    def test_parse_command_resume_unknown_token(self):
+        output = self._server._parse_command('resume nope', None)
+
+        assert output == 'Unknown or expired session.'
+
+    @unittest.mock.patch.object(GameServer, '_disconnect_client')
+    def test_continue_handshake_failed(self, patched_disconnect):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server._handshaking.add(sock)
+        self._server._transport = unittest.mock.Mock()
+        self._server._transport.handshake.side_effect = OSError('bad hello')
+
+        self._server._continue_handshake(sock)
+
+        patched_disconnect.assert_called_once_with(sock)
+        assert sock not in self._server._handshaking
+
+    def test_continue_handshake_done(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server._handshaking.add(sock)
+
+        self._server._continue_handshake(sock)
+
+        assert sock not in self._server._handshaking
+
+    @unittest.mock.patch.object(GameServer, '_disconnect_client')
+    @unittest.mock.patch(
+        'socket.socket.recv', side_effect=ConnectionResetError()
+    )
+    def test_receive_connection_reset(self, _, patched_disconnect):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+        self._server._receive(sock)
+
+        patched_disconnect.assert_called_once_with(sock)
+
+    @unittest.mock.patch.object(GameServer, '_read_client_data')
+    @unittest.mock.patch('socket.socket.recv', side_effect=BlockingIOError())
+    def test_receive_nothing_ready(self, _, patched_read):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+        self._server._receive(sock)
+
+        patched_read.assert_not_called()
+
+    @unittest.mock.patch('socket.socket.recv', return_value=b'x' * 1025)
+    def test_receive_message_too_large(self, _):
+        sock = self._add_client('One')
+
+        with unittest.mock.patch.object(
+            GameServer, '_parse_command'
+        ) as patched_parse:
+            self._server._receive(sock)
+
+        patched_parse.assert_not_called()
+        assert self._server._message_queues[sock][-1] == (
+            'Message too large. Limit is 1024 bytes.'
+        )
+
+    @unittest.mock.patch.object(GameServer, '_read_client_data')
+    @unittest.mock.patch('socket.socket.recv', return_value=b'One,board\n')
+    def test_receive_rate_limited(self, _, patched_read):
+        self._server._connection_limiter = RateLimiter(rate=0, burst=2)
+        sock = self._add_client('One')
+
+        for _ in range(3):
+            self._server._receive(sock)
+
+        assert patched_read.call_count == 2
+        assert self._server._message_queues[sock][-1] == (
+            'Too many messages. Slow down.'
+        )
+
+    @unittest.mock.patch('socket.socket.close')
+    def test_reject_message_disconnects_after_max_strikes(self, _):
+        self._server._max_strikes = 2
+        sock = self._add_client('One')
+
+        self._server._reject_message(sock, 'Slow down.')
+        self._server._reject_message(sock, 'Slow down.')
+
+        assert sock not in self._server._inputs
+        assert sock not in self._server._strikes
+
+    @unittest.mock.patch('socket.socket.close')
+    def test_queue_message_sheds_overflowing_client(self, _):
+        self._server._max_queued_messages = 2
+        sock = self._add_client('One')
+
+        for _ in range(3):
+            self._server._queue_message(sock, 'board')
+        self._server._shed_overflowing_clients()
+
+        assert sock not in self._server._inputs
+        assert not self._server._overflowing
+
+    @unittest.mock.patch('socket.socket.setblocking')
+    @unittest.mock.patch('socket.socket.close')
+    def test_accept_new_connection_ip_rate_limited(self, patched_close, _):
+        self._server._ip_limiter = RateLimiter(rate=0, burst=0)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+        with unittest.mock.patch(
+            'socket.socket.accept',
+            return_value=(connection, ('10.0.0.1', 1234))
+        ):
+            self._server._accept_new_connection(sock)
+
+        patched_close.assert_called_once()
+        assert connection not in self._server._inputs
+
+
+class TestGameServerUndo(unittest.TestCase):
+
+    @unittest.mock.patch('socket.socket.bind')
+    @unittest.mock.patch('socket.socket.listen')
+    def setUp(self, _, __):
+        self._server = GameServer(HOST, PORT)
+        self._socks = [self._add_client('One'), self._add_client('Two')]
+
+    def _add_client(self, name):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server._inputs.append(sock)
+        self._server._message_queues[sock] = deque()
+        self._server._parse_command(name, sock)
+        return sock
+
+    def test_undo_needs_both_players(self):
+        self._server._parse_command('One,3', self._socks[0])
+
+        output = self._server._parse_command('One,undo', self._socks[0])
+
+        assert output == 'Asked Two to agree to take back the last move.'
+        assert self._server._message_queues[self._socks[1]][-1] == (
+            'One asks to take back the last move. Send undo to agree.'
+        )
+        assert self._server._game.move_count == 1
+
+    def test_undo_agreed(self):
+        self._server._parse_command('One,3', self._socks[0])
+        self._server._parse_command('One,undo', self._socks[0])
+
+        output = self._server._parse_command('Two,undo', self._socks[1])
+
+        assert output.startswith('Move taken back.')
+        assert output.endswith('It is Ones turn.')
+        assert self._server._message_queues[self._socks[0]][-1] == output
+        assert self._server._game.move_count == 0
+        assert self._server._active_player == 0
+
+    def test_undo_waiting(self):
+        self._server._parse_command('One,3', self._socks[0])
+        self._server._parse_command('One,undo', self._socks[0])
+
+        output = self._server._parse_command('One,undo', self._socks[0])
+
+        assert output == 'Waiting for Two to agree.'
+
+    def test_undo_request_cleared_by_move(self):
+        self._server._parse_command('One,3', self._socks[0])
+        self._server._parse_command('One,undo', self._socks[0])
+        self._server._parse_command('Two,4', self._socks[1])
+
+        output = self._server._parse_command('Two,undo', self._socks[1])
+
+        assert output == 'Asked One to agree to take back the last move.'
+
+    def test_undo_no_moves(self):
+        output = self._server._parse_command('One,undo', self._socks[0])
+
+        assert output == 'There is no move to take back.'
+
+
+class TestGameServerRatings(unittest.TestCase):
+
+    @unittest.mock.patch('socket.socket.bind')
+    @unittest.mock.patch('socket.socket.listen')
+    def setUp(self, _, __):
+        self._ratings = unittest.mock.Mock()
+        self._server = GameServer(HOST, PORT, ratings=self._ratings)
+
+    def test_leaderboard(self):
+        self._ratings.leaderboard.return_value = (
+            ('One', 1516.2, 1), ('Two', 1483.8, 1)
+        )
+
+        output = self._server._parse_command('leaderboard', None)
+
+        assert output == (
+            'Leaderboard:\n1. One 1516 (1 games)\n2. Two 1484 (1 games)'
+        )
+
+    def test_leaderboard_empty(self):
+        self._ratings.leaderboard.return_value = ()
+
+        output = self._server._parse_command('leaderboard', None)
+
+        assert output == 'No rated games yet.'
+
+    def test_leaderboard_ratings_off(self):
+        self._server._ratings = None
+
+        output = self._server._parse_command('leaderboard', None)
+
+        assert output == 'Ratings are off.'
+
+    @unittest.mock.patch.object(GameServer, '_send_loss')
+    def test_win_is_rated(self, _):
+        self._server._client_names = ['One', 'Two']
+        sock = unittest.mock.Mock()
+        self._server._sessions[sock] = Session(1, 'Two', sock)
+        self._server._game_started = True
+        self._server._active_player = 1
+        for column in range(4):
+            self._server._game.insert_piece('o', column)
+
+        self._server._parse_command('Two,5', sock)
+
+        self._ratings.record_result.assert_called_once_with(
+            'Two', 'One', False
+        )
+
+
+class TestGameServerHints(unittest.TestCase):
+
+    @unittest.mock.patch('socket.socket.bind')
+    @unittest.mock.patch('socket.socket.listen')
+    def setUp(self, _, __):
+        self._analyzer = Analyzer(max_depth=2)
+        self._server = GameServer(HOST, PORT, analyzer=self._analyzer)
+        self._socks = [self._add_client('One'), self._add_client('Two')]
+
+    def tearDown(self):
+        self._analyzer.close()
+        self._server._wake_reader.close()
+        self._server._wake_writer.close()
+
+    def _add_client(self, name):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server._inputs.append(sock)
+        self._server._message_queues[sock] = deque()
+        self._server._parse_command(name, sock)
+        return sock
+
+    def _wait_for_hint(self):
+        readable, _, _ = select.select([self._server._wake_reader], [], [], 5)
+        assert readable
+        self._server._finish_analyses()
+
+    def test_hint(self):
+        for column in range(4):
+            self._server._game.insert_piece('x', column)
+
+        output = self._server._parse_command('One,hint', self._socks[0])
+        self._wait_for_hint()
+
+        assert output is None
+        assert self._server._message_queues[self._socks[0]][-1] == (
+            'Hint: drop in column 5 (you can force a win).'
+        )
+        assert self._server._metrics.get('hints') == 1
+
+    def test_hint_board_changed(self):
+        self._server._parse_command('One,hint', self._socks[0])
+        self._server._game.insert_piece('x', 0)
+        self._wait_for_hint()
+
+        assert self._server._message_queues[self._socks[0]][-1] == (
+            'The board changed before the hint was ready.'
+        )
+
+    def test_hint_stale_after_undo_and_other_move(self):
+        self._server._game.insert_piece('x', 0)
+        self._server._game.insert_piece('o', 1)
+        self._server._parse_command('One,hint', self._socks[0])
+        self._server._game.undo_move()
+        self._server._game.insert_piece('o', 2)
+        self._wait_for_hint()
+
+        assert self._server._message_queues[self._socks[0]][-1] == (
+            'The board changed before the hint was ready.'
+        )
+
+    def test_hint_failure_gets_error_frame(self):
+        self._server._framed.add(self._socks[0])
+        self._server._request_id = 7
+        with unittest.mock.patch.object(
+            Analyzer, 'analyse', side_effect=RuntimeError('boom')
+        ), unittest.mock.patch('builtins.print'):
+            output = self._server._parse_command('One,hint', self._socks[0])
+            self._wait_for_hint()
+
+        assert output is None
+        assert self._server._message_queues[self._socks[0]][-1] == (
+            protocol.encode_error(7, 'The hint could not be worked out.')
+        )
+
+    def test_hint_busy(self):
+        self._server._analyzer = Analyzer(max_pending=0)
+
+        output = self._server._parse_command('One,hint', self._socks[0])
+        self._server._analyzer.close()
+
+        assert output == HINTS_BUSY_MESSAGE
+        assert self._server._metrics.get('hints_shed') == 1
+        assert self._server._metrics.get('hints') == 0
+
+    def test_hint_not_your_turn(self):
+        output = self._server._parse_command('Two,hint', self._socks[1])
+
+        assert output == 'Please wait for your turn.'
+
+    def test_hint_off(self):
+        self._server._analyzer = None
+
+        output = self._server._parse_command('One,hint', self._socks[0])
+
+        assert output == 'Hints are off.'
+
+    def test_stats(self):
+        output = self._server._parse_command('stats', None)
+
+        assert output.startswith('Stats:\n')
+        assert 'hint_book_hits: 0\n' in output
+        assert 'hint_cache_hit_rate: 0.0' in output
+
+    def test_wake_socket_not_sent_broadcasts(self):
+        assert self._server._cannot_send_to_sock(
+            self._socks[0], self._server._wake_reader
+        )
+
+
+class TestGameServerClock(unittest.TestCase):
+
+    @unittest.mock.patch('socket.socket.bind')
+    @unittest.mock.patch('socket.socket.listen')
+    def setUp(self, _, __):
+        self._server = GameServer(HOST, PORT, turn_time=60, turn_increment=5)
+        self._socks = [self._add_client('One'), self._add_client('Two')]
+
+    def _add_client(self, name):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server._inputs.append(sock)
+        self._server._message_queues[sock] = deque()
+        self._server._parse_command(name, sock)
+        return sock
+
+    def test_game_start_schedules_flag_fall(self):
+        assert self._server._clock.running_player == 0
+        assert len(self._server._scheduler) == 1
+
+    def test_move_switches_clock(self):
+        self._server._parse_command('One,1', self._socks[0])
+
+        assert self._server._clock.running_player == 1
+        assert len(self._server._scheduler) == 1
+
+    def test_flag_fall_forfeits(self):
+        self._server._parse_command('One,1', self._socks[0])
+        deadline = self._server._clock.deadline()
+
+        with unittest.mock.patch('time.monotonic', return_value=deadline):
+            ran = self._server._scheduler.run_due(deadline)
+
+        assert ran == 1
+
+        assert self._server._message_queues[self._socks[0]][-1] == (
+            'Two ran out of time. You won!'
+        )
+        assert self._server._message_queues[self._socks[1]][-1] == (
+            'You ran out of time. You lost.'
+        )
+        assert self._server._game._move_count == 0
+        assert self._server._active_player == 1  # The loser starts.
+        assert self._server._clock.running_player == 1
+
+    def test_flag_not_fallen_before_deadline(self):
+        self._server._scheduler.run_due(0)
+
+        assert self._server._clock.running_player == 0
+        assert len(self._server._scheduler) == 1
+
+    def test_turn_shows_time_left(self):
+        output = self._server._parse_command('turn', self._socks[0])
+
+        assert output.startswith('It is Ones turn. Time left: One ')
+
+    @unittest.mock.patch('socket.socket.close')
+    def test_game_end_stops_clock(self, _):
+        self._server._parse_command('One,disconnect', self._socks[0])
+
+        assert self._server._clock.running_player is None
+        assert len(self._server._scheduler) == 0
+
+
+class TestGameServerListeners(unittest.TestCase):
+
+    def test_listeners(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'game.sock')
+            server = GameServer(
+                HOST, PORT, listeners=f'tcp://127.0.0.1:0, unix://{path}'
+            )
+
+            families = [listener.family for listener in server._listeners]
+            assert families == [socket.AF_INET, socket.AF_UNIX]
+            assert server._inputs == server._listeners
+            assert server._server is server._listeners[0]
+
+            server._shut_down()
+            assert not os.path.exists(path)
+
+    def test_accept_from_unix_listener(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'game.sock')
+            server = GameServer(HOST, PORT, listeners=[f'unix://{path}'])
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.connect(path)
+
+            server._accept_new_connection(server._server)
+
+            assert len(server._inputs) == 2
+            assert server._cannot_send_to_sock(None, server._server) is True
+            client.close()
+            server._shut_down()
+
+    def test_unix_clients_do_not_share_a_rate_limit(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'game.sock')
+            server = GameServer(
+                HOST, PORT, listeners=[f'unix://{path}'], ip_message_burst=1
+            )
+            clients = []
+            for _ in range(3):
+                clients.append(socket.socket(socket.AF_UNIX))
+                clients[-1].connect(path)
+                server._accept_new_connection(server._server)
+
+            accepted = server._inputs[1:]
+            assert len(accepted) == 3
+            assert all(
+                server._admit_message(sock, 0.0) for sock in accepted
+            )
+            for client in clients:
+                client.close()
+            server._shut_down()
+
+
+class TestGameServerEvents(unittest.TestCase):
+
+    @unittest.mock.patch('socket.socket.bind')
+    @unittest.mock.patch('socket.socket.listen')
+    def setUp(self, _, __):
+        self._bus = EventBus()
+        self._events = []
+        self._bus.subscribe(self._events.append)
+        self._server = GameServer(HOST, PORT, event_bus=self._bus)
+        self._socks = [self._add_client('One'), self._add_client('Two')]
+
+    def _add_client(self, name):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server._inputs.append(sock)
+        self._server._message_queues[sock] = deque()
+        self._server._parse_command(name, sock)
+        return sock
+
+    def _kinds(self):
+        return [event.kind for event in self._events]
+
+    def test_join_and_start(self):
+        assert self._kinds() == ['join', 'join', 'game_start']
+        assert self._events[2].fields == {'players': ['One', 'Two']}
+
+    def test_moves_and_win(self):
+        for column in (1, 2, 1, 2, 1, 2, 1, 2):
+            player = len(self._server._game.moves) % 2
+            self._server._parse_command(
+                f'{("One", "Two")[player]},{column}', self._socks[player]
+            )
+        self._server._parse_command('One,1', self._socks[0])
+
+        moves = [event for event in self._events if event.kind == 'move']
+        assert len(moves) == 9
+        assert moves[0].fields['column'] == 0
+        win = self._events[-2]
+        assert win.kind == 'win'
+        assert win.fields == {'winner': 'One', 'loser': 'Two', 'reason': 'line'}
+        assert self._events[-1].kind == 'game_start'
+        assert self._server._active_player == 1
+
+    def test_draw_starts_next_game_like_a_win(self):
+        with unittest.mock.patch.object(
+            RulesEngine, 'is_draw', return_value=True
+        ):
+            self._server._parse_command('One,1', self._socks[0])
+
+        assert self._kinds()[-2:] == ['draw', 'game_start']
+        assert self._server._game.move_count == 0
+        assert self._server._active_player == 1
+
+    def test_disconnect_abandons_game(self):
+        self._server._parse_command('One,1', self._socks[0])
+        self._server._parse_command('One,disconnect', self._socks[0])
+
+        assert self._kinds()[-2:] == ['disconnect', 'game_abandoned']
+        assert self._events[-1].fields == {'moves': 1}
+
+    def test_stats_include_events(self):
+        assert 'events_published: 3' in self._server._stats_text()
+
+
+@unittest.mock.patch('builtins.print')
+class TestGameServerProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._profiler = Profiler(
+            os.path.join(self._directory.name, 'profile.folded')
+        )
+        self._server = GameServer(
+            HOST, PORT, listeners='tcp://127.0.0.1:0', profiler=self._profiler
+        )
+
+    def tearDown(self):
+        self._profiler.sampler.stop()
+        self._server._shut_down()
+        self._directory.cleanup()
+
+    def test_times_loop_phases(self, _):
+        self._profiler.start()
+        client = socket.create_connection(self._server._server.getsockname())
+        self._server._serve_once(timeout=1)
+        client.send(b'One\n')
+        self._server._serve_once(timeout=1)
+        self._server._serve_once(timeout=1)
+        client.close()
+
+        stats = self._server._metrics.snapshot()
+        for phase in ('select', 'recv', 'parse', 'command', 'send'):
+            assert stats[f'profile_{phase}_laps'] >= 1, phase
+
+    def test_no_laps_while_disabled(self, _):
+        self._server._serve_once(timeout=0)
+
+        assert self._server._metrics.snapshot()['profile_enabled'] == 0
+        assert 'profile_select_laps' not in self._server._metrics.snapshot()
+
+
+@unittest.mock.patch('builtins.print')
+class TestGameServerPipelining(unittest.TestCase):
+
+    def setUp(self):
+        self._server = GameServer(HOST, PORT, listeners='tcp://127.0.0.1:0')
+        self._clients = []
+
+    def tearDown(self):
+        self._server._shut_down()
+        for client in self._clients:
+            client.close()
+
+    def _connect(self):
+        client = socket.create_connection(
+            self._server._server.getsockname(), timeout=5
+        )
+        self._clients.append(client)
+        self._server._serve_once(timeout=1)
+        return client
+
+    def _serve(self, passes=2):
+        for _ in range(passes):
+            self._server._serve_once(timeout=1)
+
+    def test_pipelined_requests_get_replies_by_id(self, _):
+        pipeline = protocol.RequestPipeline(self._connect())
+        request_ids = pipeline.send(['One', 'One,board', 'One,turn'])
+        self._serve()
+
+        replies = pipeline.wait(request_ids)
+        assert replies[0].startswith('Welcome One!')
+        assert replies[1] == 'Game has not started.'
+        assert replies[2].startswith('It is One')
+
+    def test_batch_larger_than_message_limit(self, _):
+        pipeline = protocol.RequestPipeline(self._connect())
+        commands = ['One'] + [f'One,{"x" * 100}'] * 11
+        request_ids = pipeline.send(commands)
+        self._serve()
+
+        replies = pipeline.wait(request_ids)
+        assert sum(map(len, commands)) > self._server._max_message_size
+        assert replies[0].startswith('Welcome One!')
+        assert replies[1:] == ['Invalid command, try again.'] * 11
+
+    def test_line_over_message_limit(self, _):
+        pipeline = protocol.RequestPipeline(self._connect())
+        request_ids = pipeline.send([f'One{"x" * 1100}', 'One'])
+        self._serve()
+
+        reply, = pipeline.wait(request_ids[1:])
+        assert reply.startswith('Welcome One!')
+        assert pipeline.pushes == ['Message too large. Limit is 1024 bytes.']
+
+    def test_pushes_are_separate_from_replies(self, _):
+        first = self._connect()
+        first.send(b'One\n')
+        self._serve()
+        second = protocol.RequestPipeline(self._connect())
+        request_ids = second.send(['Two'])
+        self._serve()
+        second.wait(request_ids)
+
+        first.send(b'One,1\n')
+        request_ids = second.send(['Two,turn'])
+        self._serve()
+
+        reply, = second.wait(request_ids)
+        assert reply.startswith('It is Twos turn.')
+        assert second.pushes[-1].endswith('Your turn!')
+
+    def test_plain_clients_are_unchanged(self, _):
+        client = self._connect()
+        client.send(b'One\n')
+        self._serve()
+
+        assert client.recv(1024).decode().lstrip().startswith('Welcome One!')
+
+    def test_invalid_frame(self, _):
+        client = self._connect()
+        client.send(b'{"id": 1}\n')
+        self._serve()
+
+        pipeline = protocol.RequestPipeline(client)
+        pipeline.receive()
+        assert pipeline.pushes[0].startswith('Invalid request frame')
+
+
+@unittest.mock.patch('builtins.print')
+class TestGameServerCompression(unittest.TestCase):
+
+    def setUp(self):
+        self._server = GameServer(
+            HOST, PORT, listeners='tcp://127.0.0.1:0',
+            transport=Transport(compression=True),
+        )
+        self._clients = []
+
+    def tearDown(self):
+        self._server._shut_down()
+        for client in self._clients:
+            client.close()
+
+    def _connect(self):
+        client = Transport(compression=True).connect(
+            self._server._server.getsockname()
+        )
+        client.settimeout(5)
+        self._clients.append(client)
+        self._server._serve_once(timeout=1)
+        return client
+
+    def test_frames_split_across_reads(self, _):
+        client = self._connect()
+        frame = client.frame(b'One\n')
+
+        client.sendall(frame[:2])
+        self._server._serve_once(timeout=1)
+        client.sendall(frame[2:])
+        self._server._serve_once(timeout=1)
+        self._server._serve_once(timeout=1)
+
+        assert b'Welcome One!' in client.recv(4096)
+
+    def test_bad_frame_closes_only_that_client(self, _):
+        bad = self._connect()
+        good = self._connect()
+
+        bad.sendall(b'?\x00\x00\x00\x01x')
+        self._server._serve_once(timeout=1)
+        good.send(b'One\n')
+        self._server._serve_once(timeout=1)
+        self._server._serve_once(timeout=1)
+
+        assert bad.recv(4096) == b''
+        assert b'Welcome One!' in good.recv(4096)
+        assert len(self._server._message_queues) == 1
+
+    def test_partial_send_kept_for_next_pass(self, _):
+        self._connect()
+        sock, = self._server._message_queues
+        self._server._queue_message(sock, 'Your turn!')
+        written = []
+
+        def write(sock, data):
+            written.append(data[:4])
+            return 4
+
+        with unittest.mock.patch.object(self._server, '_write', write):
+            self._server._send_response(sock)
+            self._server._queue_message(sock, 'board')
+            self._server._send_response(sock)
+
+        frame = sock.frame(b'\nYour turn!')
+        assert written == [frame[:4], frame[4:8]]
+        assert self._server._unsent[sock].startswith(frame[8:])
+        assert self._server._unsent[sock].endswith(sock.frame(b'\nboard'))
+
+
+@unittest.mock.patch('builtins.print')
+class TestGameServerLoad(unittest.TestCase):
+
+    def setUp(self):
+        self._server = GameServer(
+            HOST, PORT, listeners='tcp://127.0.0.1:0', shed_lag=0.1
+        )
+        self._clients = []
+
+    def tearDown(self):
+        self._server._shut_down()
+        for client in self._clients:
+            client.close()
+
+    def _connect(self):
+        client = socket.create_connection(self._server._server.getsockname())
+        client.settimeout(5)
+        self._clients.append(client)
+        self._server._serve_once(timeout=1)
+        return client
+
+    def _overload(self):
+        self._server._load.shedding = True
+
+    def test_measures_lag(self, _):
+        self._server._serve_once(timeout=0)
+        self._server._serve_once(timeout=0)
+
+        stats = self._server._metrics.snapshot()
+        assert stats['load_passes'] == 1
+        assert stats['load_shed_lag_ms'] == 100
+        assert stats['load_shedding'] == 0
+
+    def test_refuses_connections_while_shedding(self, _):
+        self._overload()
+        client = self._connect()
+
+        assert client.recv(1024) == b'Server busy, retry later.'
+        assert client.recv(1024) == b''
+        assert len(self._server._message_queues) == 0
+        assert self._server._metrics.snapshot()['load_shed_connections'] == 1
+
+    def test_refuses_joins_but_not_players(self, _):
+        one = self._connect()
+        waiting = self._connect()
+        one.send(b'One\n')
+        self._server._serve_once(timeout=1)
+        self._overload()
+
+        assert self._server._parse_command('Two', waiting) == (
+            'Server busy, retry later.'
+        )
+        seat, = self._server._sessions
+        assert self._server._parse_command('One,turn', seat) == (
+            'It is Ones turn.'
+        )
+        assert self._server._client_names == ['One', '']
+        assert self._server._metrics.snapshot()['load_shed_joins'] == 1
+
+    def test_recovers(self, _):
+        self._overload()
+        self._server._load.record(0)
+
+        client = self._connect()
+        client.send(b'One\n')
+        self._server._serve_once(timeout=1)
+        self._server._serve_once(timeout=1)
+
+        assert b'Welcome One!' in client.recv(1024)
+
+
+class TestGameServerRules(unittest.TestCase):
+
+    @unittest.mock.patch('socket.socket.bind')
+    @unittest.mock.patch('socket.socket.listen')
+    def setUp(self, _, __):
+        self._server = GameServer(
+            HOST, PORT, rules='gomoku', analyzer=unittest.mock.Mock()
+        )
+        self._socks = [self._add_client('One'), self._add_client('Two')]
+
+    def _add_client(self, name):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server._inputs.append(sock)
+        self._server._message_queues[sock] = deque()
+        self._server._parse_command(name, sock)
+        return sock
+
+    def test_place_move(self):
+        output = self._server._parse_command('One,h8', self._socks[0])
+
+        assert output.startswith('Piece landed in row 7 column 7')
+        assert self._server._parse_command('Two,h8', self._socks[1]) == (
+            'That space is already taken. Please select another space'
+        )
+        assert self._server._parse_command('Two,z1', self._socks[1]) == (
+            'That space is not on the board. Try again.'
+        )
+
+    def test_help_and_hints(self):
+        assert 'e.g. h8' in self._server._help_text()
+        assert self._server._parse_command('One,hint', self._socks[0]) == (
+            'Hints are off.'
+        )
+
+
+class TestGameServerRooms(unittest.TestCase):
+
+    @unittest.mock.patch('socket.socket.bind')
+    @unittest.mock.patch('socket.socket.listen')
+    def setUp(self, _, __):
+        self._coordinator = Coordinator()
+        self._coordinator.register('other', '127.0.0.1:9090')
+        self._server = GameServer(
+            HOST, PORT, coordinator=self._coordinator, node_id='here'
+        )
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+    def _room_owned_by(self, node_id):
+        return next(
+            room for room in (f'room-{index}' for index in range(100))
+            if self._coordinator.owner(room)[0] == node_id
+        )
+
+    def test_registers_with_coordinator(self):
+        assert self._coordinator.nodes()['here'] == f'{HOST}:{PORT}'
+
+    def test_room_on_other_node_redirects(self):
+        room = self._room_owned_by('other')
+
+        assert self._server._parse_command(f'room {room}', self._sock) == (
+            'Redirect 127.0.0.1:9090'
+        )
+        assert self._server._metrics.get('redirects') == 1
+
+    def test_room_on_this_node_joins_here(self):
+        room = self._room_owned_by('here')
+
+        assert self._server._parse_command(f'room {room}', self._sock) == (
+            f'Room {room} is here. Send your name to join.'
+        )
+        assert self._server._parse_command('One', self._sock).startswith(
+            'Welcome One!'
+        )
+
+    def test_unreachable_coordinator_joins_here(self):
+        self._coordinator.owner = unittest.mock.Mock(side_effect=OSError)
+
+        assert self._server._parse_command('room a', self._sock) == (
+            'Room a is here. Send your name to join.'
+        )
+        assert self._server._metrics.get('coordinator_errors') == 1
+
+    def test_drain_unregisters(self):
+        self._server._start_drain()
+
+        assert 'here' not in self._coordinator.nodes()
+
+
+@unittest.mock.patch('builtins.print')
+class TestGameServerDrain(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._handoff_path = os.path.join(self._directory.name, 'handoff')
+        with unittest.mock.patch('builtins.print'):
+            self._server = GameServer(
+                HOST, PORT, listeners='tcp://127.0.0.1:0',
+                handoff_path=self._handoff_path,
+            )
+        self._peers = []
+
+    def tearDown(self):
+        self._server._shut_down()
+        for peer in self._peers:
+            peer.close()
+        self._directory.cleanup()
+
+    def _add_client(self, name):
+        sock, peer = socket.socketpair()
+        self._peers.append(peer)
+        self._server._inputs.append(sock)
+        self._server._message_queues[sock] = deque()
+        self._server._parse_command(name, sock)
+        return sock
+
+    def test_drain_without_game_shuts_down(self, _):
+        sock = self._add_client('One')
+
+        self._server.request_drain()
+        self._server._serve_once(timeout=0)
+
+        assert self._server._inputs == []
+        assert sock.fileno() == -1
+        assert self._peers[0].recv(1024).decode() == (
+            'The server is restarting. Please reconnect.'
+        )
+        assert not os.path.exists(self._handoff_path)
+
+    def test_drain_waits_for_game(self, _):
+        socks = [self._add_client('One'), self._add_client('Two')]
+        self._server._parse_command('One,1', socks[0])
+
+        self._server.request_drain()
+        self._server._serve_once(timeout=0)
+
+        assert self._server._server not in self._server._inputs
+        assert socks[0] in self._server._inputs
+        assert self._server._metrics.snapshot()['drain_game_in_progress'] == 1
+        message = self._peers[1].recv(1024).decode()
+        assert 'restarting after this game' in message
+
+        for column in range(2, 6):
+            self._server._parse_command('Two,9', socks[1])
+            self._server._parse_command(f'One,{column}', socks[0])
+        self._server._serve_once(timeout=0)
+        self._server._serve_once(timeout=0)
+
+        assert self._server._inputs == []
+
+    def test_drain_timeout(self, _):
+        socks = [self._add_client('One'), self._add_client('Two')]
+        self._server._parse_command('One,1', socks[0])
+        self._server._drain_timeout = 0
+
+        self._server.request_drain()
+        self._server._serve_once(timeout=0)
+
+        assert self._server._inputs == []
+
+    def test_hand_off_listeners(self, _):
+        address = self._server._server.getsockname()
+        taken = []
+        thread = threading.Thread(
+            target=lambda: taken.append(receive_listeners(self._handoff_path))
+        )
+        thread.start()
+        while thread.is_alive():
+            self._server._serve_once(timeout=0.1)
+        thread.join()
+
+        (listener,), websocket_listeners = taken[0]
+        assert listener.getsockname() == address
+        assert websocket_listeners == []
+        assert self._server._inputs == []
+        assert self._server._metrics.get('handoffs') == 1
+
+        client = socket.create_connection(address)
+        select.select([listener], [], [], 5)
+        connection, _ = listener.accept()
+        connection.close()
+        client.close()
+        listener.close()
+
+
+class TestGameServerStartup(unittest.TestCase):
+
+    def test_optional_modules_are_not_imported(self):
+        code = 'import sys, server.game_server; print(*sys.modules)'
+        modules = subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True,
+            check=True,
+        ).stdout.split()
+
+        for name in ('ssl', 'concurrent.futures', 'server.analysis'):
+            assert name not in modules
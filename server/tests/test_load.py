@@ -0,0 +1,59 @@
+import unittest
+from unittest import mock
+
+from server.load import LoadMonitor
+
+
+@mock.patch('builtins.print')
+class TestLoadMonitor(unittest.TestCase):
+
+    def test_average_lag(self, _):
+        monitor = LoadMonitor(smoothing=0.5)
+
+        monitor.record(0.2)
+        monitor.record(0.1)
+
+        self.assertAlmostEqual(monitor.lag, 0.1)
+        assert monitor.max_lag == 0.2
+        assert monitor.passes == 2
+
+    def test_sheds_with_hysteresis(self, _):
+        monitor = LoadMonitor(shed_lag=0.1, recover_lag=0.02, smoothing=1)
+
+        assert monitor.record(0.05) is False
+        assert monitor.record(0.1) is True
+        assert monitor.record(0.05) is True  # Under shed_lag, still shedding.
+        assert monitor.record(0.01) is False
+        assert monitor.episodes == 1
+
+    def test_recover_lag_defaults_to_half(self, _):
+        monitor = LoadMonitor(shed_lag=0.1, smoothing=1)
+
+        monitor.record(0.2)
+        assert monitor.record(0.06) is True
+        assert monitor.record(0.04) is False
+
+    def test_never_sheds_when_off(self, _):
+        monitor = LoadMonitor(smoothing=1)
+
+        assert monitor.record(10) is False
+        assert monitor.stats()['lag_ms'] == 10000
+
+    def test_stats(self, _):
+        monitor = LoadMonitor(shed_lag=0.25, recover_lag=0.1, smoothing=1)
+        monitor.record(0.3)
+        monitor.count_shed('connections')
+        monitor.count_shed('joins')
+        monitor.count_shed('joins')
+
+        stats = monitor.stats()
+
+        assert stats['shed_lag_ms'] == 250
+        assert stats['recover_lag_ms'] == 100
+        assert stats['shedding'] == 1
+        assert stats['shed_connections'] == 1
+        assert stats['shed_joins'] == 2
+
+    def test_invalid_smoothing(self, _):
+        with self.assertRaises(ValueError):
+            LoadMonitor(smoothing=0)
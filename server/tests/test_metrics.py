@@ -0,0 +1,24 @@
+import unittest
+
+from server.metrics import Metrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self._metrics = Metrics()
+
+    def test_increment(self):
+        self._metrics.increment('hints')
+        self._metrics.increment('hints', 2)
+
+        assert self._metrics.get('hints') == 3
+        assert self._metrics.get('unknown') == 0
+
+    def test_snapshot_reads_sources(self):
+        values = {'hits': 1}
+        self._metrics.register('cache', lambda: values)
+        self._metrics.increment('commands')
+        values['hits'] = 2
+
+        assert self._metrics.snapshot() == {'cache_hits': 2, 'commands': 1}
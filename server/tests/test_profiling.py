@@ -0,0 +1,83 @@
+import os
+import tempfile
+import time
+import unittest
+
+from server.profiling import PhaseTimer, Profiler, StackSampler
+
+
+def _spin(seconds):
+    deadline = time.process_time() + seconds
+    while time.process_time() < deadline:
+        pass
+
+
+class TestPhaseTimer(unittest.TestCase):
+
+    def test_laps_charge_time_since_last_lap(self):
+        timer = PhaseTimer()
+        timer.lap('ignored')  # No mark yet.
+        timer.mark()
+        time.sleep(0.01)
+        timer.lap('select')
+        timer.lap('recv')
+        timer.lap('recv')
+
+        stats = timer.stats()
+        assert stats['select_ms'] >= 10
+        assert stats['select_laps'] == 1
+        assert stats['recv_laps'] == 2
+        assert 'ignored_ms' not in stats
+        assert timer.report().splitlines()[1].startswith('select')
+
+
+class TestStackSampler(unittest.TestCase):
+
+    def test_samples_collapsed_stacks(self):
+        sampler = StackSampler(interval=0.001)
+        sampler.start()
+        try:
+            _spin(0.1)
+        finally:
+            sampler.stop()
+
+        assert sampler.samples > 0
+        lines = sampler.collapsed().splitlines()
+        assert any('test_profiling.py:_spin' in line for line in lines)
+        stack, count = lines[0].rsplit(' ', 1)
+        assert int(count) > 0 and ';' in stack
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._output = os.path.join(self._directory.name, 'profile.folded')
+        self._profiler = Profiler(self._output, interval=0.001)
+
+    def tearDown(self):
+        self._profiler.sampler.stop()
+        self._directory.cleanup()
+
+    def test_off_until_started(self):
+        self._profiler.begin_pass()
+        self._profiler.lap('select')
+
+        assert self._profiler.stats() == {'enabled': 0, 'samples': 0}
+
+    @unittest.mock.patch('sys.stderr')
+    @unittest.mock.patch('builtins.print')
+    def test_toggle_writes_stacks(self, _, __):
+        self._profiler.request_toggle()
+        self._profiler.begin_pass()
+        assert self._profiler.enabled
+        _spin(0.05)
+        self._profiler.lap('command')
+
+        self._profiler.request_toggle()
+        self._profiler.begin_pass()
+
+        assert not self._profiler.enabled
+        assert self._profiler.stats()['command_laps'] == 1
+        with open(self._output) as output:
+            assert 'test_profiling.py:_spin' in output.read()
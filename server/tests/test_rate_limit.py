@@ -0,0 +1,51 @@
+import unittest
+
+from server.rate_limit import RateLimiter
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self._limiter = RateLimiter(rate=2, burst=3, max_keys=2)
+
+    def test_allow_burst_then_limit(self):
+        allowed = [self._limiter.allow('a', 0) for _ in range(4)]
+
+        assert allowed == [True, True, True, False]
+
+    def test_allow_refills_over_time(self):
+        for _ in range(3):
+            self._limiter.allow('a', 0)
+
+        assert self._limiter.allow('a', 0.5) is True
+        assert self._limiter.allow('a', 0.5) is False
+
+    def test_allow_refill_capped_at_burst(self):
+        self._limiter.allow('a', 0)
+
+        allowed = [self._limiter.allow('a', 100) for _ in range(4)]
+
+        assert allowed == [True, True, True, False]
+
+    def test_keys_limited_separately(self):
+        for _ in range(3):
+            self._limiter.allow('a', 0)
+
+        assert self._limiter.allow('b', 0) is True
+
+    def test_least_recently_used_key_dropped(self):
+        self._limiter.allow('a', 0)
+        self._limiter.allow('b', 0)
+        self._limiter.allow('a', 0)
+
+        self._limiter.allow('c', 0)
+
+        assert len(self._limiter) == 2
+        assert 'b' not in self._limiter._buckets
+
+    def test_forget(self):
+        self._limiter.allow('a', 0)
+
+        self._limiter.forget('a')
+
+        assert len(self._limiter) == 0
@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from server.ratings import (
+    DEFAULT_RATING, RatingStore, expected_score, update_elo
+)
+
+
+class TestElo(unittest.TestCase):
+
+    def test_expected_score_even(self):
+        assert expected_score(1500, 1500) == 0.5
+
+    def test_expected_score_favourite(self):
+        assert round(expected_score(1900, 1500), 2) == 0.91
+
+    def test_update_elo_win(self):
+        rating_a, rating_b = update_elo(1500, 1500, 1, k_factor=32)
+
+        assert rating_a == 1516
+        assert rating_b == 1484
+
+    def test_update_elo_draw_between_equals(self):
+        assert update_elo(1500, 1500, 0.5) == (1500, 1500)
+
+
+class TestRatingStore(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, 'ratings.db')
+        self._store = RatingStore(self._path, leaderboard_size=2)
+
+    def tearDown(self):
+        self._store.close()
+        self._directory.cleanup()
+
+    def test_leaderboard_empty(self):
+        assert self._store.leaderboard() == ()
+
+    def test_record_result(self):
+        self._store.record_result('One', 'Two')
+        self._store.flush()
+
+        assert self._store.leaderboard() == (
+            ('One', DEFAULT_RATING + 16, 1), ('Two', DEFAULT_RATING - 16, 1)
+        )
+
+    def test_leaderboard_size(self):
+        self._store.record_result('One', 'Two')
+        self._store.record_result('Three', 'Four')
+        self._store.record_result('One', 'Three')
+        self._store.flush()
+
+        assert [name for name, _, _ in self._store.leaderboard()] == [
+            'One', 'Three'
+        ]
+
+    def test_records_and_wal_mode(self):
+        self._store.record_result('One', 'Two')
+        self._store.record_result('One', 'Two', draw=True)
+        self._store.flush()
+
+        connection = sqlite3.connect(self._path)
+        mode = connection.execute('PRAGMA journal_mode').fetchone()[0]
+        row = connection.execute(
+            'SELECT games, wins, losses, draws FROM players WHERE name = ?',
+            ('One',)
+        ).fetchone()
+        connection.close()
+
+        assert mode == 'wal'
+        assert row == (2, 1, 0, 1)
+
+    def test_ratings_persist(self):
+        self._store.record_result('One', 'Two')
+        self._store.close()
+
+        self._store = RatingStore(self._path)
+
+        assert self._store.leaderboard()[0][0] == 'One'
@@ -0,0 +1,170 @@
+import random
+import unittest
+
+from server.game_errors import (
+    ColumnFullError, InvalidMoveError, NoMoveError, SpaceTakenError,
+)
+from server.game_logic import (
+    STANDARD_GEOMETRY, Board, GameBoard, PlacementBoard, zobrist_hash,
+)
+from server.rules import RULES, DropRules, get_geometry, make_rules
+
+
+class TestMakeRules(unittest.TestCase):
+
+    def test_every_variant(self):
+        for name in RULES:
+            rules = make_rules(name)
+            assert rules.name == name
+            assert rules.legal_moves()
+            assert rules.render()
+
+    def test_undo_and_draw(self):
+        for name in RULES:
+            rules = make_rules(name)
+            move = rules.legal_moves()[0]
+            rules.play('x', move)
+
+            assert rules.undo()[0] == 'x'
+            assert rules.board.move_count == 0
+            with self.assertRaises(NoMoveError):
+                rules.undo()
+            assert not rules.is_draw()
+
+    def test_full_board_is_draw(self):
+        # Two rows can hold no line of three but a horizontal one.
+        rules = DropRules('tiny', get_geometry(2, 3, 3))
+        for column in (0, 1, 2, 0, 1):
+            win, _, _ = rules.play('xo'[column % 2], column)
+            assert not win and not rules.is_draw()
+
+        assert rules.play('x', 2) == (False, 0, 2)
+        assert rules.is_draw()
+
+    def test_unknown_variant(self):
+        with self.assertRaises(ValueError):
+            make_rules('chess')
+
+    def test_geometries_are_shared(self):
+        assert make_rules('five-in-a-row').board.geometry is STANDARD_GEOMETRY
+        assert (
+            make_rules('gomoku').board.geometry is
+            make_rules('gomoku').board.geometry
+        )
+        assert make_rules('five-in-a-row').supports_hints
+        assert not make_rules('connect-four').supports_hints
+
+
+class TestDropRules(unittest.TestCase):
+
+    def test_connect_four_wins_with_four(self):
+        rules = make_rules('connect-four')
+        for text in ('1', '2', '1', '2', '1', '2'):
+            piece = rules.board.player_pieces[rules.board.move_count % 2]
+            win, _, _ = rules.play(piece, rules.parse_move(text))
+            assert not win
+
+        assert rules.play('x', rules.parse_move('1')) == (True, 2, 0)
+
+    def test_parse_move(self):
+        rules = make_rules('connect-four')
+
+        assert rules.is_move('7') and not rules.is_move('a1')
+        assert rules.parse_move('7') == 6
+        with self.assertRaises(InvalidMoveError):
+            rules.parse_move('8')
+
+    def test_full_column(self):
+        rules = make_rules('connect-four')
+        for index in range(6):
+            rules.play(rules.board.player_pieces[index % 2], 0)
+
+        assert 0 not in rules.legal_moves()
+        with self.assertRaises(ColumnFullError):
+            rules.play('x', 0)
+
+
+class TestPlaceRules(unittest.TestCase):
+
+    def setUp(self):
+        self._rules = make_rules('gomoku')
+
+    def test_parse_move(self):
+        assert self._rules.is_move('h8')
+        assert not self._rules.is_move('8')
+        assert self._rules.parse_move('h8') == (7, 7)
+        assert self._rules.parse_move('a15') == (14, 0)
+        with self.assertRaises(InvalidMoveError):
+            self._rules.parse_move('z1')
+        with self.assertRaises(InvalidMoveError):
+            self._rules.parse_move('a16')
+
+    def test_free_placement_win(self):
+        for column in range(4):
+            self._rules.play('x', (0, column))
+            self._rules.play('o', (5, column))
+
+        assert self._rules.play('x', (0, 4)) == (True, 0, 4)
+        assert self._rules.render().splitlines()[1].startswith(
+            ' 1 x x x x x .'
+        )
+
+    def test_space_taken(self):
+        self._rules.play('x', (3, 3))
+
+        with self.assertRaises(SpaceTakenError):
+            self._rules.play('o', (3, 3))
+        assert (3, 3) not in self._rules.legal_moves()
+        assert len(self._rules.legal_moves()) == 15 * 15 - 1
+
+
+class TestPlacementBoard(unittest.TestCase):
+
+    def test_undo_redo_restore_state(self):
+        geometry = get_geometry(15, 15, 5)
+        board = PlacementBoard(geometry)
+        rng = random.Random(3)
+        played = []
+        for index, (row, column) in enumerate(
+            rng.sample(board.legal_spaces(), 40)
+        ):
+            before = (board.spaces, board.zobrist_hash)
+            board.place_piece(board.player_pieces[index % 2], row, column)
+            played.append(before)
+
+        assert (board.zobrist_hash, board.mirror_hash) == zobrist_hash(
+            board.spaces, geometry=geometry
+        )
+        after = board.spaces
+        for before in reversed(played):
+            board.undo_move()
+            assert (board.spaces, board.zobrist_hash) == before
+        assert board.move_count == 0
+        for _ in played:
+            board.redo_move()
+        assert board.spaces == after
+        with self.assertRaises(NoMoveError):
+            board.redo_move()
+
+    def test_no_dropping(self):
+        board = PlacementBoard(get_geometry(15, 15, 5))
+
+        assert isinstance(board, Board)
+        assert not isinstance(board, GameBoard)
+        assert not hasattr(board, 'insert_piece')
+        assert type(board.copy()) is PlacementBoard
+
+    def test_too_large(self):
+        with self.assertRaises(ValueError):
+            PlacementBoard(get_geometry(17, 17, 5))
+
+
+class TestGameBoardGeometry(unittest.TestCase):
+
+    def test_copy_keeps_geometry(self):
+        board = GameBoard(get_geometry(6, 7, 4))
+        board.insert_piece('x', 6)
+
+        copy = board.copy()
+        assert copy.geometry is board.geometry
+        assert copy.legal_columns() == list(range(7))
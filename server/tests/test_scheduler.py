@@ -0,0 +1,56 @@
+import unittest
+
+from server.scheduler import Scheduler
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self._scheduler = Scheduler()
+        self._calls = []
+
+    def test_run_due_in_deadline_order(self):
+        self._scheduler.call_at(2, self._calls.append, 'second')
+        self._scheduler.call_at(1, self._calls.append, 'first')
+        self._scheduler.call_at(3, self._calls.append, 'later')
+
+        ran = self._scheduler.run_due(2)
+
+        assert ran == 2
+        assert self._calls == ['first', 'second']
+        assert len(self._scheduler) == 1
+
+    def test_cancel(self):
+        timer = self._scheduler.call_at(1, self._calls.append, 'cancelled')
+
+        self._scheduler.cancel(timer)
+        self._scheduler.run_due(5)
+
+        assert self._calls == []
+        assert len(self._scheduler) == 0
+
+    def test_cancel_none(self):
+        self._scheduler.cancel(None)
+
+    def test_time_until_next(self):
+        self._scheduler.call_at(10.5, self._calls.append, 'a')
+
+        assert self._scheduler.time_until_next(10, 1) == 0.5
+        assert self._scheduler.time_until_next(0, 1) == 1
+        assert self._scheduler.time_until_next(11, 1) == 0
+
+    def test_time_until_next_skips_cancelled(self):
+        timer = self._scheduler.call_at(1, self._calls.append, 'a')
+        self._scheduler.cancel(timer)
+
+        assert self._scheduler.time_until_next(0, 5) == 5
+
+    def test_callback_can_schedule(self):
+        def reschedule():
+            self._calls.append('first')
+            self._scheduler.call_at(1, self._calls.append, 'second')
+
+        self._scheduler.call_at(1, reschedule)
+        self._scheduler.run_due(1)
+
+        assert self._calls == ['first', 'second']
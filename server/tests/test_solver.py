@@ -0,0 +1,61 @@
+import unittest
+
+from server.game_logic import GameBoard
+from server.solver import (
+    WIN_SCORE, best_move, heuristic, negamax, other_piece
+)
+
+
+class TestSolver(unittest.TestCase):
+
+    def setUp(self):
+        self._board = GameBoard()
+
+    def test_other_piece(self):
+        assert other_piece('x') == 'o'
+        assert other_piece('o') == 'x'
+
+    def test_best_move_takes_win(self):
+        for column in range(4):
+            self._board.insert_piece('x', column)
+
+        column, score = best_move(self._board, 'x', 2)
+
+        assert column == 4
+        assert score == WIN_SCORE - 5
+
+    def test_best_move_blocks_win(self):
+        for column in range(4):
+            self._board.insert_piece('o', column)
+
+        column, _ = best_move(self._board, 'x', 2)
+
+        assert column == 4
+
+    def test_best_move_does_not_change_board(self):
+        self._board.insert_piece('x', 4)
+        before = self._board.spaces
+
+        best_move(self._board, 'o', 3)
+
+        assert self._board.spaces == before
+
+    def test_best_move_full_board(self):
+        for column in range(9):
+            for _ in range(6):
+                self._board.insert_piece('x' if column % 2 else 'o', column)
+
+        assert best_move(self._board, 'x', 2) == (None, -WIN_SCORE - 1)
+
+    def test_negamax_sees_forced_loss(self):
+        for column in (2, 3, 4, 5):
+            self._board.insert_piece('o', column)
+
+        # x can only block one end, and o wins at the other.
+        assert negamax(self._board, 'x', 2) == -(WIN_SCORE - 6)
+
+    def test_heuristic_is_symmetric(self):
+        self._board.insert_piece('x', 4)
+
+        assert heuristic(self._board, 'x') == -heuristic(self._board, 'o')
+        assert heuristic(self._board, 'x') > 0
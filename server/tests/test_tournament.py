@@ -0,0 +1,119 @@
+import random
+import unittest
+from unittest import mock
+
+from server.game_logic import GameBoard
+from server.tournament import (
+    GreedyStrategy, Standings, make_strategy, play_game,
+    main, round_robin_pairings, run_tournament, swiss_pairings,
+    wilson_interval,
+)
+
+
+class TestTournament(unittest.TestCase):
+
+    def test_wilson_interval(self):
+        low, high = wilson_interval(50, 100)
+
+        assert round(low, 3) == 0.404
+        assert round(high, 3) == 0.596
+
+    def test_wilson_interval_all_wins(self):
+        low, high = wilson_interval(10, 10)
+
+        assert 0.7 < low < 0.8
+        assert high == 1.0
+
+    def test_wilson_interval_no_trials(self):
+        assert wilson_interval(0, 0) == (0.0, 1.0)
+
+    def test_make_strategy_unknown(self):
+        with self.assertRaises(ValueError):
+            make_strategy('nope')
+
+    def test_greedy_takes_win(self):
+        board = GameBoard()
+        for column in range(4):
+            board.insert_piece('o', column)
+
+        column = GreedyStrategy().choose(board, 'o', random.Random(0))
+
+        assert column == 4
+        assert board.move_count == 4
+
+    def test_greedy_blocks_win(self):
+        board = GameBoard()
+        for column in range(4):
+            board.insert_piece('o', column)
+
+        assert GreedyStrategy().choose(board, 'x', random.Random(0)) == 4
+
+    def test_play_game_is_repeatable(self):
+        result = play_game('random', 'greedy', 7)
+
+        assert result[:4] == play_game('random', 'greedy', 7)[:4]
+        assert result[2] in (0.0, 0.5, 1.0)
+
+    def test_round_robin_pairings(self):
+        pairings = round_robin_pairings(['a', 'b', 'c'], 2)
+
+        assert len(pairings) == 12
+        assert pairings.count(('a', 'b')) == 2
+        assert pairings.count(('b', 'a')) == 2
+
+    def test_swiss_pairings_by_score(self):
+        standings = Standings(['a', 'b', 'c', 'd'])
+        standings.add('a', 'd', 1.0, 10, 0)
+        standings.add('b', 'c', 1.0, 10, 0)
+
+        pairings = swiss_pairings(
+            ['a', 'b', 'c', 'd'], standings, {frozenset(('a', 'd')): 1}
+        )
+
+        assert pairings == [('a', 'b'), ('b', 'a'), ('c', 'd'), ('d', 'c')]
+
+    def test_swiss_pairings_odd_number_sits_out_lowest(self):
+        standings = Standings(['a', 'b', 'c'])
+        standings.add('a', 'c', 1.0, 10, 0)
+
+        pairings = swiss_pairings(['a', 'b', 'c'], standings, {})
+
+        assert pairings == [('a', 'b'), ('b', 'a')]
+
+    def test_run_tournament(self):
+        results = []
+
+        standings = run_tournament(
+            ['random', 'alphabeta:1'], rounds=2, workers=1,
+            on_result=lambda standings: results.append(standings.games),
+        )
+
+        assert results == [1, 2, 3, 4]
+        assert sum(standings.records['random']) == 4
+        assert standings.points('alphabeta:1') >= 3
+        assert 'games/s' in standings.report(1.0)
+
+    def test_run_tournament_in_pool(self):
+        standings = run_tournament(
+            ['random', 'greedy'], 'swiss', rounds=2, workers=2
+        )
+
+        assert standings.games == 4
+
+    def test_run_tournament_rejects_duplicate_specs(self):
+        with self.assertRaises(ValueError):
+            run_tournament(['greedy', 'greedy'], workers=1)
+
+    def test_main_rejects_duplicate_specs(self):
+        with mock.patch('sys.stderr'), self.assertRaises(SystemExit):
+            main(['greedy', 'greedy'])
+
+    def test_error_terminates_pool(self):
+        pool = mock.Mock()
+        pool.imap_unordered.side_effect = KeyboardInterrupt
+        with mock.patch('multiprocessing.Pool', return_value=pool):
+            with self.assertRaises(KeyboardInterrupt):
+                run_tournament(['random', 'greedy'], workers=2)
+
+        pool.terminate.assert_called_once()
+        pool.close.assert_not_called()
@@ -0,0 +1,378 @@
+import base64
+import os
+import socket
+import struct
+import threading
+import unittest
+import zlib
+from collections import deque
+from unittest import mock
+
+from common.transport import Transport
+from server import game_server, websocket
+from server.game_server import GameServer
+
+
+class MinimalWebSocketClient:
+    '''Just enough of a WebSocket client to drive the server in tests.'''
+
+    def __init__(self, address, deflate=False):
+        self._sock = socket.create_connection(address, timeout=5)
+        key = base64.b64encode(os.urandom(16)).decode()
+        request = (
+            'GET / HTTP/1.1\r\n'
+            'Host: localhost\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Key: {key}\r\n'
+            'Sec-WebSocket-Version: 13\r\n'
+        )
+        if deflate:
+            request += 'Sec-WebSocket-Extensions: permessage-deflate\r\n'
+        self._sock.sendall(f'{request}\r\n'.encode())
+        response = b''
+        while b'\r\n\r\n' not in response:
+            response += self._recv_exactly(1)
+        self.response = response.decode()
+        self.expected_accept = websocket.accept_key(key)
+
+    def send(self, opcode, payload):
+        self._sock.sendall(websocket.encode_frame(opcode, payload, mask=True))
+
+    def receive(self):
+        first, second = self._recv_exactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length, = struct.unpack('!H', self._recv_exactly(2))
+        elif length == 127:
+            length, = struct.unpack('!Q', self._recv_exactly(8))
+        payload = self._recv_exactly(length)
+        if first & 0x40:
+            payload = zlib.decompressobj(-15).decompress(
+                payload + websocket.DEFLATE_TAIL
+            )
+        return first & 0x0F, payload
+
+    def _recv_exactly(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self._sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError('Server closed the connection.')
+            data += chunk
+        return data
+
+    def close(self):
+        self._sock.close()
+
+
+class TestWebSocketConnection(unittest.TestCase):
+
+    def setUp(self):
+        self._connection = websocket.WebSocketConnection()
+        self._handshake = (
+            b'GET / HTTP/1.1\r\nUpgrade: websocket\r\n'
+            b'Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n\r\n'
+        )
+
+    def test_accept_key(self):
+        # Example from RFC 6455.
+        assert websocket.accept_key('dGhlIHNhbXBsZSBub25jZQ==') == (
+            's3pPLMBiTxaQ9kYGzzhZRbK+xOo='
+        )
+
+    def test_feed_partial_handshake(self):
+        messages, replies = self._connection.feed(self._handshake[:20])
+
+        assert (messages, replies) == ([], [])
+        assert self._connection.handshake_done is False
+
+    def test_feed_handshake_and_frame_together(self):
+        frame = websocket.encode_frame(websocket.TEXT, b'Name', mask=True)
+
+        messages, replies = self._connection.feed(self._handshake + frame)
+
+        assert replies[0].startswith(b'HTTP/1.1 101 Switching Protocols')
+        assert messages == ['Name']
+
+    def test_feed_not_upgrade(self):
+        self.assertRaises(
+            websocket.WebSocketError,
+            self._connection.feed, b'GET / HTTP/1.1\r\n\r\n'
+        )
+
+    def test_feed_split_frame(self):
+        self._connection.feed(self._handshake)
+        frame = websocket.encode_frame(websocket.TEXT, b'board', mask=True)
+
+        assert self._connection.feed(frame[:3]) == ([], [])
+        assert self._connection.feed(frame[3:]) == (['board'], [])
+
+    def test_feed_fragmented_message(self):
+        self._connection.feed(self._handshake)
+        first = bytearray(
+            websocket.encode_frame(websocket.TEXT, b'Na', mask=True)
+        )
+        first[0] &= 0x7F  # Not the final fragment.
+        last = websocket.encode_frame(
+            websocket.CONTINUATION, b'me', mask=True
+        )
+
+        messages, _ = self._connection.feed(bytes(first) + last)
+
+        assert messages == ['Name']
+
+    def test_feed_ping_answered_with_pong(self):
+        self._connection.feed(self._handshake)
+        ping = websocket.encode_frame(websocket.PING, b'hi', mask=True)
+
+        messages, replies = self._connection.feed(ping, now=5.0)
+
+        assert messages == []
+        assert replies == [websocket.encode_frame(websocket.PONG, b'hi')]
+        assert self._connection.last_seen == 5.0
+
+    def test_feed_unmasked_frame(self):
+        self._connection.feed(self._handshake)
+        frame = websocket.encode_frame(websocket.TEXT, b'Name')
+
+        self.assertRaises(
+            websocket.WebSocketError, self._connection.feed, frame
+        )
+
+    def test_feed_message_too_large(self):
+        connection = websocket.WebSocketConnection(max_message_size=4)
+        connection.feed(self._handshake)
+        frame = websocket.encode_frame(websocket.TEXT, b'12345', mask=True)
+
+        with self.assertRaises(websocket.WebSocketError) as context:
+            connection.feed(frame)
+        assert context.exception.close_code == websocket.CLOSE_TOO_BIG
+
+    def test_feed_close(self):
+        self._connection.feed(self._handshake)
+        frame = websocket.encode_frame(
+            websocket.CLOSE, struct.pack('!H', 1000), mask=True
+        )
+
+        _, replies = self._connection.feed(frame)
+
+        assert self._connection.closed is True
+        assert replies[0][0] & 0x0F == websocket.CLOSE
+
+    def test_deflate_round_trip(self):
+        handshake = self._handshake.replace(
+            b'\r\n\r\n',
+            b'\r\nSec-WebSocket-Extensions: permessage-deflate; '
+            b'server_max_window_bits=10\r\n\r\n'
+        )
+        _, replies = self._connection.feed(handshake)
+        assert b'server_max_window_bits=10' in replies[0]
+        message = '[   ] ' * 54
+
+        frame = self._connection.encode_text(message)
+
+        assert frame[0] & 0x40
+        assert len(frame) < len(message)
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        compressed = compressor.compress(message.encode()) + compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+        client_frame = websocket.encode_frame(
+            websocket.TEXT, compressed[:-4], compressed=True, mask=True
+        )
+        assert self._connection.feed(client_frame) == ([message], [])
+
+    def test_feed_invalid_utf8(self):
+        self._connection.feed(self._handshake)
+        frame = websocket.encode_frame(websocket.TEXT, b'\xff\xfe', mask=True)
+
+        with self.assertRaises(websocket.WebSocketError) as context:
+            self._connection.feed(frame)
+        assert context.exception.close_code == (
+            websocket.CLOSE_INVALID_PAYLOAD
+        )
+
+    def test_feed_corrupt_deflate(self):
+        self._connection.feed(self._handshake.replace(
+            b'\r\n\r\n',
+            b'\r\nSec-WebSocket-Extensions: permessage-deflate\r\n\r\n'
+        ))
+        frame = websocket.encode_frame(
+            websocket.TEXT, b'\xff\xff\xff', compressed=True, mask=True
+        )
+
+        with self.assertRaises(websocket.WebSocketError) as context:
+            self._connection.feed(frame)
+        assert context.exception.close_code == (
+            websocket.CLOSE_INVALID_PAYLOAD
+        )
+
+    def test_feed_invalid_window_bits(self):
+        handshake = self._handshake.replace(
+            b'\r\n\r\n',
+            b'\r\nSec-WebSocket-Extensions: permessage-deflate; '
+            b'server_max_window_bits=big\r\n\r\n'
+        )
+
+        with self.assertRaises(websocket.WebSocketError) as context:
+            self._connection.feed(handshake)
+        assert context.exception.close_code == websocket.CLOSE_PROTOCOL_ERROR
+        assert self._connection.handshake_done is False
+
+
+class TestWebSocketGateway(unittest.TestCase):
+
+    def setUp(self):
+        game_server.print = lambda *args, **kwargs: None
+        self._server = GameServer(
+            '127.0.0.1', 0, websocket_listeners='tcp://127.0.0.1:0'
+        )
+        self._address = self._server._websocket_listeners[0].getsockname()
+
+    def tearDown(self):
+        del game_server.print
+        self._server._shut_down()
+
+    def _run_client(self, client_steps):
+        '''Runs the server loop until the client thread is done.'''
+        results = {}
+
+        def run():
+            try:
+                results['value'] = client_steps()
+            except Exception as err:
+                results['error'] = err
+
+        client_thread = threading.Thread(target=run)
+        client_thread.start()
+        while client_thread.is_alive():
+            self._server._serve_once(0.01)
+        if 'error' in results:
+            raise results['error']
+        return results['value']
+
+    def test_play_over_websocket(self):
+        def client_steps():
+            client = MinimalWebSocketClient(self._address, deflate=True)
+            client.send(websocket.TEXT, b'Alice')
+            welcome = client.receive()
+            client.send(websocket.PING, b'keepalive')
+            pong = client.receive()
+            client.send(websocket.TEXT, b'Alice,help')
+            help_text = client.receive()
+            client.close()
+            return client, welcome, pong, help_text
+
+        client, welcome, pong, help_text = self._run_client(client_steps)
+
+        assert client.expected_accept in client.response
+        assert 'permessage-deflate' in client.response
+        assert welcome[0] == websocket.TEXT
+        assert welcome[1].decode().startswith('\nWelcome Alice!')
+        assert pong == (websocket.PONG, b'keepalive')
+        assert b'Commands:' in help_text[1]
+
+    def test_compressing_transport_leaves_websockets_plain(self):
+        self._server._shut_down()
+        self._server = GameServer(
+            '127.0.0.1', 0, transport=Transport(compression=True),
+            websocket_listeners='tcp://127.0.0.1:0',
+        )
+        self._address = self._server._websocket_listeners[0].getsockname()
+
+        def client_steps():
+            client = MinimalWebSocketClient(self._address, deflate=True)
+            client.send(websocket.TEXT, b'Alice')
+            welcome = client.receive()
+            client.close()
+            return client, welcome
+
+        client, welcome = self._run_client(client_steps)
+
+        assert client.expected_accept in client.response
+        assert welcome[1].decode().startswith('\nWelcome Alice!')
+
+    def _open_websocket(self):
+        server_sock, client_sock = socket.socketpair()
+        self.addCleanup(client_sock.close)
+        connection = websocket.WebSocketConnection(now=0)
+        connection.handshake_done = True
+        self._server._inputs.append(server_sock)
+        self._server._message_queues[server_sock] = deque()
+        self._server._websockets[server_sock] = connection
+        return server_sock, client_sock
+
+    def test_control_frames_wait_behind_unsent_frame(self):
+        sock, client_sock = self._open_websocket()
+        tail = websocket.encode_frame(websocket.TEXT, b'Board:')[2:]
+        self._server._unsent[sock] = tail
+        self._server._queue_message(sock, 'Your turn!')
+        self._server._next_websocket_ping = 0
+
+        self._server._read_websocket_data(
+            sock, websocket.encode_frame(websocket.PING, b'p', mask=True)
+        )
+        self._server._ping_websockets(1)
+
+        assert self._server._unsent[sock] == (
+            tail + websocket.encode_frame(websocket.TEXT, b'\nYour turn!') +
+            websocket.encode_frame(websocket.PONG, b'p') +
+            websocket.encode_frame(websocket.PING, b'')
+        )
+        assert sock in self._server._outputs
+        client_sock.setblocking(False)
+        with self.assertRaises(BlockingIOError):
+            client_sock.recv(1)  # Nothing was written around the buffer.
+
+    def test_invalid_utf8_closes_only_that_client(self):
+        def client_steps():
+            bad = MinimalWebSocketClient(self._address)
+            good = MinimalWebSocketClient(self._address)
+            bad.send(websocket.TEXT, b'\xc3\x28')
+            close = bad.receive()
+            good.send(websocket.TEXT, b'Alice')
+            welcome = good.receive()
+            bad.close()
+            good.close()
+            return close, welcome
+
+        close, welcome = self._run_client(client_steps)
+
+        assert close == (
+            websocket.CLOSE,
+            struct.pack('!H', websocket.CLOSE_INVALID_PAYLOAD),
+        )
+        assert welcome[1].decode().startswith('\nWelcome Alice!')
+
+    def test_ping_does_not_reach_game(self):
+        def client_steps():
+            client = MinimalWebSocketClient(self._address)
+            client.send(websocket.PING, b'')
+            pong = client.receive()
+            client.close()
+            return pong
+
+        with mock.patch.object(
+            GameServer, '_read_client_data'
+        ) as patched_read:
+            pong = self._run_client(client_steps)
+
+        assert pong == (websocket.PONG, b'')
+        patched_read.assert_not_called()
+
+    def test_silent_client_disconnected(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        connection = websocket.WebSocketConnection(now=0)
+        connection.handshake_done = True
+        self._server._inputs.append(sock)
+        self._server._message_queues[sock] = deque()
+        self._server._websockets[sock] = connection
+        self._server._next_websocket_ping = 0
+
+        self._server._ping_websockets(
+            3 * self._server._websocket_ping_interval
+        )
+
+        assert sock not in self._server._websockets
+        assert sock not in self._server._inputs
@@ -0,0 +1,368 @@
+'''
+Plays bot strategies against each other on GameBoard directly, spread over
+every core, and reports win rates with confidence intervals. Also a
+sustained CPU benchmark of the game engine.
+
+    python -m server.tournament random greedy alphabeta:2 alphabeta:4
+    python -m server.tournament --format swiss --rounds 7 greedy ...
+'''
+import argparse
+import itertools
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from server.game_logic import GameBoard
+from server.solver import best_move, heuristic, other_piece
+
+
+class RandomStrategy:
+    '''Drops in a random column.'''
+    def choose(self, board, piece, rng):
+        return rng.choice(board.legal_columns())
+
+
+class GreedyStrategy:
+    '''
+    Wins if it can, blocks the opponents win if it can, and otherwise makes
+    the move the heuristic likes best.
+    '''
+    def choose(self, board, piece, rng):
+        columns = board.legal_columns()
+        for player in (piece, other_piece(piece)):
+            for column in columns:
+                win, _, _ = board.insert_piece(player, column)
+                board.undo_move()
+                if win:
+                    return column
+
+        scores = {}
+        for column in columns:
+            board.insert_piece(piece, column)
+            scores[column] = -heuristic(board, other_piece(piece))
+            board.undo_move()
+        best = max(scores.values())
+        return rng.choice([
+            column for column, score in scores.items() if score == best
+        ])
+
+
+class AlphaBetaStrategy:
+    '''Searches a number of moves ahead with alpha-beta.'''
+    def __init__(self, depth):
+        self._depth = depth
+
+    def choose(self, board, piece, rng):
+        return best_move(board, piece, self._depth)[0]
+
+
+def make_strategy(spec):
+    '''
+    Makes a strategy from its name, e.g. random, greedy or alphabeta:4.
+
+    Args:
+        spec (str): Strategy name, and any argument after a colon.
+
+    Returns:
+        Strategy with a choose(board, piece, rng) method.
+
+    Raises:
+        ValueError: If the strategy is unknown.
+    '''
+    name, _, argument = spec.partition(':')
+    if name == 'random':
+        return RandomStrategy()
+    elif name == 'greedy':
+        return GreedyStrategy()
+    elif name == 'alphabeta':
+        return AlphaBetaStrategy(int(argument or 4))
+    raise ValueError(f'Unknown strategy {spec!r}.')
+
+
+def play_game(first, second, seed):
+    '''
+    Plays one game between two strategies. Runs in pool workers, so only
+    takes and returns plain values.
+
+    Args:
+        first (str): Spec of the strategy moving first.
+        second (str): Spec of the strategy moving second.
+        seed (int): Seed for random choices.
+
+    Returns:
+        tuple(str, str, float, int, float): The two specs, the first
+            strategy's score (1 win, 0.5 draw, 0 loss), the number of moves
+            and the CPU seconds used.
+    '''
+    started = time.process_time()
+    rng = random.Random(seed)
+    board = GameBoard()
+    players = (make_strategy(first), make_strategy(second))
+    score = 0.5
+    while not board.is_board_full():
+        turn = board.move_count % 2
+        piece = GameBoard.player_pieces[turn]
+        win, _, _ = board.insert_piece(
+            piece, players[turn].choose(board, piece, rng)
+        )
+        if win:
+            score = 1.0 - turn
+            break
+    return (
+        first, second, score, board.move_count,
+        time.process_time() - started,
+    )
+
+
+def _play_game(args):
+    return play_game(*args)
+
+
+def wilson_interval(successes, trials, z=1.96):
+    '''
+    Returns the Wilson score confidence interval of a proportion. Unlike
+    the normal approximation, it stays within 0 to 1 and behaves for
+    proportions near the ends and few trials.
+
+    Args:
+        successes (float): Number of successes. Draws may count a half.
+        trials (int): Number of trials.
+        z (float): Standard normal quantile, 1.96 for 95% confidence.
+
+    Returns:
+        tuple(float, float): Lower and upper bound.
+    '''
+    if trials == 0:
+        return 0.0, 1.0
+    proportion = successes / trials
+    denominator = 1 + z * z / trials
+    centre = proportion + z * z / (2 * trials)
+    margin = z * math.sqrt(
+        proportion * (1 - proportion) / trials + z * z / (4 * trials * trials)
+    )
+    return (
+        max(0.0, (centre - margin) / denominator),
+        min(1.0, (centre + margin) / denominator),
+    )
+
+
+class Standings:
+    '''
+    Running totals of a tournament, updated as each result arrives.
+
+    Attrs:
+    records: dict(str, list(int))
+        Wins, draws and losses of each strategy.
+
+    games: int
+        Games played.
+
+    moves: int
+        Moves played.
+
+    cpu_time: float
+        CPU seconds used by every game, across all workers.
+    '''
+    def __init__(self, specs):
+        self.records = {spec: [0, 0, 0] for spec in specs}
+        self.games = 0
+        self.moves = 0
+        self.cpu_time = 0.0
+
+    def add(self, first, second, score, moves, cpu_time):
+        '''
+        Adds one result from play_game.
+        '''
+        outcome = {1.0: 0, 0.5: 1, 0.0: 2}[score]
+        self.records[first][outcome] += 1
+        self.records[second][2 - outcome] += 1
+        self.games += 1
+        self.moves += moves
+        self.cpu_time += cpu_time
+
+    def points(self, spec):
+        '''
+        Returns a strategy's score, a win counting 1 and a draw a half.
+        '''
+        wins, draws, _ = self.records[spec]
+        return wins + draws / 2
+
+    def report(self, elapsed):
+        '''
+        Returns a table of results.
+
+        Args:
+            elapsed (float): Wall clock seconds the tournament took.
+
+        Returns:
+            str
+        '''
+        lines = [
+            f'{"strategy":16} {"games":>6} {"wins":>6} {"draws":>6} '
+            f'{"losses":>6} {"score":>6}  95% interval'
+        ]
+        for spec in sorted(self.records, key=self.points, reverse=True):
+            wins, draws, losses = self.records[spec]
+            games = wins + draws + losses
+            low, high = wilson_interval(self.points(spec), games)
+            rate = self.points(spec) / games if games else 0.0
+            lines.append(
+                f'{spec:16} {games:6} {wins:6} {draws:6} {losses:6} '
+                f'{rate:6.3f}  {low:.3f}-{high:.3f}'
+            )
+        lines.append(
+            f'{self.games} games, {self.moves} moves in {elapsed:.2f}s: '
+            f'{self.games / elapsed if elapsed else 0:.1f} games/s, '
+            f'{self.cpu_time:.2f}s CPU'
+        )
+        return '\n'.join(lines)
+
+
+def round_robin_pairings(specs, rounds):
+    '''
+    Pairs every strategy with every other, once with each colour per round.
+
+    Args:
+        specs (list(str)): Strategy specs.
+        rounds (int): Number of times to play each pairing.
+
+    Returns:
+        list(tuple(str, str)): First and second strategy of each game.
+    '''
+    return [
+        pairing
+        for _ in range(rounds)
+        for pairing in itertools.permutations(specs, 2)
+    ]
+
+
+def swiss_pairings(specs, standings, played):
+    '''
+    Pairs strategies for a Swiss round: sorted by score, each is paired
+    with the next one it has played least. With an odd number, the lowest
+    scoring strategy sits the round out.
+
+    Args:
+        specs (list(str)): Strategy specs.
+        standings (Standings): Results so far.
+        played (dict(frozenset, int)): Times each pair has met.
+
+    Returns:
+        list(tuple(str, str)): Pairings, each played once with each colour.
+    '''
+    waiting = sorted(specs, key=standings.points, reverse=True)
+    pairings = []
+    while len(waiting) > 1:
+        spec = waiting.pop(0)
+        opponent = min(
+            waiting, key=lambda other: played.get(frozenset((spec, other)), 0)
+        )
+        waiting.remove(opponent)
+        pairings.extend(((spec, opponent), (opponent, spec)))
+    return pairings
+
+
+def _play_all(pool, workers, pairings, seeds, standings, on_result):
+    games = [
+        (first, second, next(seeds)) for first, second in pairings
+    ]
+    if pool is None:
+        results = map(_play_game, games)
+    else:
+        results = pool.imap_unordered(
+            _play_game, games,
+            chunksize=max(1, len(games) // (4 * workers)),
+        )
+    for result in results:
+        standings.add(*result)
+        on_result(standings)
+
+
+def run_tournament(specs, tournament_format='roundrobin', rounds=1,
+                   workers=None, seed=0, on_result=lambda standings: None):
+    '''
+    Plays a tournament, streaming results back from worker processes.
+
+    Args:
+        specs (list(str)): Strategy specs, e.g. ['random', 'alphabeta:2'].
+        tournament_format (str): 'roundrobin' or 'swiss'.
+        rounds (int): Round robin cycles, or Swiss rounds.
+        workers (int): Worker processes. Defaults to one per core. 1 plays
+            every game in this process.
+        seed (int): Seed for the games random choices.
+        on_result (callable): Called with the standings after each game.
+
+    Returns:
+        Standings: Final results.
+
+    Raises:
+        ValueError: If a spec is unknown, or given twice, as standings are
+            kept by spec.
+    '''
+    if len(set(specs)) != len(specs):
+        raise ValueError('Each strategy spec may only be given once.')
+    for spec in specs:
+        make_strategy(spec)  # Fail before starting any workers.
+    workers = workers or os.cpu_count()
+    standings = Standings(specs)
+    seeds = itertools.count(seed)
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        if tournament_format == 'swiss':
+            played = {}
+            for _ in range(rounds):
+                pairings = swiss_pairings(specs, standings, played)
+                for first, second in pairings[::2]:
+                    pair = frozenset((first, second))
+                    played[pair] = played.get(pair, 0) + 1
+                _play_all(
+                    pool, workers, pairings, seeds, standings, on_result
+                )
+        else:
+            _play_all(
+                pool, workers, round_robin_pairings(specs, rounds), seeds,
+                standings, on_result,
+            )
+    except BaseException:
+        if pool is not None:
+            pool.terminate()  # Do not wait for the games still queued.
+            pool.join()
+        raise
+    if pool is not None:
+        pool.close()
+        pool.join()
+    return standings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='server.tournament')
+    parser.add_argument(
+        'strategies', nargs='+',
+        help='random, greedy or alphabeta:DEPTH',
+    )
+    parser.add_argument(
+        '--format', choices=('roundrobin', 'swiss'), default='roundrobin'
+    )
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    if len(set(args.strategies)) != len(args.strategies):
+        parser.error('each strategy may only be given once')
+
+    def progress(standings):
+        if standings.games % 100 == 0:
+            print(f'{standings.games} games played', flush=True)
+
+    started = time.perf_counter()
+    standings = run_tournament(
+        args.strategies, args.format, args.rounds, args.workers, args.seed,
+        progress,
+    )
+    print(standings.report(time.perf_counter() - started))
+
+
+if __name__ == '__main__':
+    main()
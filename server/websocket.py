@@ -0,0 +1,392 @@
+import base64
+import os
+import struct
+import zlib
+
+
+GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+MAX_HANDSHAKE_SIZE = 8192
+MAX_MESSAGE_SIZE = 65536
+DEFLATE_MIN_SIZE = 64
+DEFLATE_TAIL = b'\x00\x00\xff\xff'
+
+CONTINUATION = 0x0
+TEXT = 0x1
+BINARY = 0x2
+CLOSE = 0x8
+PING = 0x9
+PONG = 0xA
+
+CLOSE_NORMAL = 1000
+CLOSE_PROTOCOL_ERROR = 1002
+CLOSE_INVALID_PAYLOAD = 1007
+CLOSE_TOO_BIG = 1009
+
+
+class WebSocketError(ValueError):
+    '''
+    Raised if a peer breaks the WebSocket protocol.
+
+    Attrs:
+    close_code: int
+        Close code to send before disconnecting.
+    '''
+    def __init__(self, message, close_code=CLOSE_PROTOCOL_ERROR):
+        super().__init__(message)
+        self.close_code = close_code
+
+
+def accept_key(key):
+    '''
+    Works out the Sec-WebSocket-Accept header for a handshake key.
+
+    Args:
+        key (str): The clients Sec-WebSocket-Key.
+
+    Returns:
+        str: Value for Sec-WebSocket-Accept.
+    '''
+    import hashlib  # Only servers with WebSocket listeners need it.
+
+    digest = hashlib.sha1(f'{key}{GUID}'.encode()).digest()
+    return base64.b64encode(digest).decode()
+
+
+def encode_frame(opcode, payload, compressed=False, mask=False):
+    '''
+    Builds a single, final WebSocket frame.
+
+    Args:
+        opcode (int): Frame type, e.g. TEXT or PING.
+        payload (bytes): Frame payload.
+        compressed (bool): Set RSV1, marking a permessage-deflate message.
+        mask (bool): Mask the payload, as clients must.
+
+    Returns:
+        bytes: The encoded frame.
+    '''
+    first = 0x80 | opcode | (0x40 if compressed else 0)
+    mask_bit = 0x80 if mask else 0
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', first, mask_bit | length)
+    elif length < 65536:
+        header = struct.pack('!BBH', first, mask_bit | 126, length)
+    else:
+        header = struct.pack('!BBQ', first, mask_bit | 127, length)
+    if not mask:
+        return header + payload
+    mask_key = os.urandom(4)
+    return header + mask_key + apply_mask(payload, mask_key)
+
+
+def apply_mask(payload, mask_key):
+    '''
+    Masks or unmasks a payload with a 4 byte key.
+
+    Args:
+        payload (bytes): Data to mask.
+        mask_key (bytes): The frames masking key.
+
+    Returns:
+        bytes: The masked data.
+    '''
+    length = len(payload)
+    key = int.from_bytes((mask_key * (length // 4 + 1))[:length], 'big')
+    return (int.from_bytes(payload, 'big') ^ key).to_bytes(length, 'big')
+
+
+def parse_extensions(header):
+    '''
+    Parses a Sec-WebSocket-Extensions header.
+
+    Args:
+        header (str): Header value.
+
+    Returns:
+        dict(str, dict(str, str)): Parameters of each offered extension.
+    '''
+    extensions = {}
+    for offer in header.split(','):
+        name, *params = [part.strip() for part in offer.split(';')]
+        if not name or name in extensions:
+            continue
+        extensions[name] = dict(
+            (key.strip(), value.strip().strip('"'))
+            for key, _, value in (param.partition('=') for param in params)
+        )
+    return extensions
+
+
+class WebSocketConnection:
+    '''
+    Server side WebSocket protocol state for one connection. Turns bytes
+    read from the socket into text messages for the game, and answers
+    control frames itself, so pings never reach the game logic.
+
+    Uses permessage-deflate without context takeover when the client offers
+    it, so no zlib state is held between messages.
+    '''
+    __slots__ = (
+        '_buffer', '_fragments', '_fragment_compressed', 'handshake_done',
+        'closed', 'deflate', '_window_bits', 'last_seen',
+        '_max_message_size',
+    )
+
+    def __init__(self, now=0.0, max_message_size=MAX_MESSAGE_SIZE):
+        '''
+        Args:
+            now (float): Current time.monotonic().
+            max_message_size (int): Largest message accepted, in bytes.
+        '''
+        self._buffer = bytearray()
+        self._fragments = None
+        self._fragment_compressed = False
+        self.handshake_done = False
+        self.closed = False
+        self.deflate = False
+        self._window_bits = 15
+        self.last_seen = now
+        self._max_message_size = max_message_size
+
+    def feed(self, data, now=0.0):
+        '''
+        Processes bytes read from the socket.
+
+        Args:
+            data (bytes): Bytes read.
+            now (float): Current time.monotonic().
+
+        Returns:
+            list(str): Text messages for the game.
+            list(bytes): Bytes to send straight back, e.g. the handshake
+                response or pongs.
+
+        Raises:
+            WebSocketError: If the peer broke the protocol.
+        '''
+        self.last_seen = now
+        self._buffer += data
+        messages = []
+        replies = []
+        if not self.handshake_done:
+            response = self._read_handshake()
+            if response is None:
+                return messages, replies
+            replies.append(response)
+
+        while not self.closed:
+            frame = self._read_frame()
+            if frame is None:
+                break
+            self._handle_frame(*frame, messages, replies)
+        return messages, replies
+
+    def _read_handshake(self):
+        '''
+        Reads the HTTP upgrade request, if all of it has arrived.
+
+        Returns:
+            bytes: The 101 response, or None if more data is needed.
+        '''
+        end = self._buffer.find(b'\r\n\r\n')
+        if end == -1:
+            if len(self._buffer) > MAX_HANDSHAKE_SIZE:
+                raise WebSocketError('Handshake too large')
+            return None
+
+        request = bytes(self._buffer[:end]).decode('latin-1')
+        del self._buffer[:end + 4]
+        request_line, *header_lines = request.split('\r\n')
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if (
+            not request_line.startswith('GET ') or
+            headers.get('upgrade', '').lower() != 'websocket' or
+            'sec-websocket-key' not in headers
+        ):
+            raise WebSocketError('Not a WebSocket upgrade request')
+
+        response = [
+            'HTTP/1.1 101 Switching Protocols',
+            'Upgrade: websocket',
+            'Connection: Upgrade',
+            f'Sec-WebSocket-Accept: {accept_key(headers["sec-websocket-key"])}',
+        ]
+        extensions = parse_extensions(
+            headers.get('sec-websocket-extensions', '')
+        )
+        if 'permessage-deflate' in extensions:
+            response.append(self._accept_deflate(
+                extensions['permessage-deflate']
+            ))
+        self.handshake_done = True
+        return ('\r\n'.join(response) + '\r\n\r\n').encode()
+
+    def _accept_deflate(self, params):
+        '''
+        Accepts a permessage-deflate offer.
+
+        Returns:
+            str: The Sec-WebSocket-Extensions response header.
+        '''
+        self.deflate = True
+        response = (
+            'Sec-WebSocket-Extensions: permessage-deflate; '
+            'server_no_context_takeover; client_no_context_takeover'
+        )
+        window_bits = params.get('server_max_window_bits')
+        if window_bits:
+            # zlib cannot make raw deflate streams with 8 bit windows.
+            try:
+                self._window_bits = max(9, min(15, int(window_bits)))
+            except ValueError:
+                raise WebSocketError(
+                    f'Invalid server_max_window_bits {window_bits!r}'
+                ) from None
+            response = (
+                f'{response}; server_max_window_bits={self._window_bits}'
+            )
+        return response
+
+    def _read_frame(self):
+        '''
+        Takes one complete frame off the buffer.
+
+        Returns:
+            tuple(bool, int, bool, bytes): fin, opcode, rsv1 and unmasked
+                payload, or None if the frame has not fully arrived.
+        '''
+        buffer = self._buffer
+        if len(buffer) < 2:
+            return None
+        first, second = buffer[0], buffer[1]
+        if not second & 0x80:
+            raise WebSocketError('Client frames must be masked')
+        length = second & 0x7F
+        offset = 2
+        if length == 126:
+            if len(buffer) < 4:
+                return None
+            length, = struct.unpack_from('!H', buffer, 2)
+            offset = 4
+        elif length == 127:
+            if len(buffer) < 10:
+                return None
+            length, = struct.unpack_from('!Q', buffer, 2)
+            offset = 10
+        if length > self._max_message_size:
+            raise WebSocketError('Message too large', CLOSE_TOO_BIG)
+        if len(buffer) < offset + 4 + length:
+            return None
+
+        mask_key = bytes(buffer[offset:offset + 4])
+        payload = bytes(buffer[offset + 4:offset + 4 + length])
+        del buffer[:offset + 4 + length]
+        return (
+            bool(first & 0x80), first & 0x0F, bool(first & 0x40),
+            apply_mask(payload, mask_key),
+        )
+
+    def _handle_frame(self, fin, opcode, rsv1, payload, messages, replies):
+        '''
+        Acts on one frame, adding any text message or reply.
+        '''
+        if opcode == PING:
+            replies.append(encode_frame(PONG, payload))
+        elif opcode == PONG:
+            pass  # last_seen is already updated.
+        elif opcode == CLOSE:
+            self.closed = True
+            replies.append(encode_frame(CLOSE, payload[:2]))
+        elif opcode in (TEXT, BINARY):
+            if self._fragments is not None:
+                raise WebSocketError('Expected a continuation frame')
+            self._fragments = [payload]
+            self._fragment_compressed = rsv1
+        elif opcode == CONTINUATION:
+            if self._fragments is None:
+                raise WebSocketError('Unexpected continuation frame')
+            self._fragments.append(payload)
+        else:
+            raise WebSocketError(f'Unknown opcode {opcode}')
+
+        if opcode in (TEXT, BINARY, CONTINUATION) and fin:
+            message = b''.join(self._fragments)
+            if self._fragment_compressed:
+                message = self._inflate(message)
+            self._fragments = None
+            try:
+                messages.append(message.decode())
+            except UnicodeDecodeError:
+                raise WebSocketError(
+                    'Text is not valid UTF-8', CLOSE_INVALID_PAYLOAD
+                ) from None
+        elif self._fragments is not None and (
+            sum(map(len, self._fragments)) > self._max_message_size
+        ):
+            raise WebSocketError('Message too large', CLOSE_TOO_BIG)
+
+    def _inflate(self, payload):
+        '''Decompresses a permessage-deflate message.'''
+        if not self.deflate:
+            raise WebSocketError('Compressed frame without permessage-deflate')
+        inflater = zlib.decompressobj(-15)
+        try:
+            message = inflater.decompress(
+                payload + DEFLATE_TAIL, self._max_message_size + 1
+            )
+        except zlib.error as err:
+            raise WebSocketError(
+                f'Corrupt compressed message: {err}', CLOSE_INVALID_PAYLOAD
+            ) from None
+        if len(message) > self._max_message_size:
+            raise WebSocketError('Message too large', CLOSE_TOO_BIG)
+        return message
+
+    def encode_text(self, message):
+        '''
+        Builds a text frame for the client, compressed if negotiated and
+        worth it.
+
+        Args:
+            message (str): Message to send.
+
+        Returns:
+            bytes: The frame.
+        '''
+        payload = message.encode()
+        if not self.deflate or len(payload) < DEFLATE_MIN_SIZE:
+            return encode_frame(TEXT, payload)
+        deflater = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -self._window_bits
+        )
+        compressed = deflater.compress(payload) + deflater.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+        return encode_frame(TEXT, compressed[:-4], compressed=True)
+
+    def encode_ping(self):
+        '''
+        Builds a keepalive ping frame.
+
+        Returns:
+            bytes: The frame.
+        '''
+        return encode_frame(PING, b'')
+
+    def encode_close(self, code=CLOSE_NORMAL):
+        '''
+        Builds a close frame.
+
+        Args:
+            code (int): Close status code.
+
+        Returns:
+            bytes: The frame.
+        '''
+        self.closed = True
+        return encode_frame(CLOSE, struct.pack('!H', code))